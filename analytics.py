@@ -0,0 +1,259 @@
+"""Agregações de portfólio calculadas no banco (SQL baseado em conjuntos).
+
+Nenhuma função aqui carrega respostas individuais em Python: tudo é agrupado
+e paginado no banco, sobre `survey_maturity`, `survey_answers`,
+`survey_indicators` (valores já numéricos) e `questions`. A exceção é o SQLite,
+que não tem `percentile_cont`: lá os quartis da página são interpolados em
+Python, com a mesma regra. Com `ANSWER_STORAGE=vectors` não há linhas em
+`survey_answers`, e as perguntas que bloqueiam são contadas em Python a partir
+dos vetores.
+"""
+import math
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Integer, and_, case, cast, func, literal, type_coerce
+from sqlalchemy.orm import Query, Session
+
+from answer_codec import WRITE_ROWS, load_answers
+from database import Company, Question, SurveyAnswers, SurveyIndicator, SurveyInfo, SurveyMaturity, is_sqlite
+
+NIVEIS = range(1, 6)
+PERIODOS = ('month', 'quarter', 'year')
+QUARTIS = (0.25, 0.5, 0.75)
+
+def _period_start(db: Session, periodo: str, column):
+    if not is_sqlite(db):
+        return func.date_trunc(periodo, column)
+    if periodo == 'quarter':
+        # mês inicial do trimestre: 1 + 3 * ((mês - 1) // 3)
+        mes = cast(func.strftime('%m', column), Integer)
+        inicio = func.printf('%s-%02d-01 00:00:00', func.strftime('%Y', column), 1 + 3 * ((mes - 1) // 3))
+    else:
+        inicio = func.strftime('%Y-%m-01 00:00:00' if periodo == 'month' else '%Y-01-01 00:00:00', column)
+    return type_coerce(inicio, DateTime)
+
+def _percentile(valores: List[float], q: float) -> Optional[float]:
+    # interpolação linear entre as posições vizinhas, como percentile_cont
+    if not valores:
+        return None
+    posicao = q * (len(valores) - 1)
+    baixo, alto = math.floor(posicao), math.ceil(posicao)
+    return valores[baixo] + (valores[alto] - valores[baixo]) * (posicao - baixo)
+
+def _latest_surveys(db: Session):
+    return db.query(func.max(SurveyInfo.id).label('survey_id')).group_by(SurveyInfo.company_id).subquery()
+
+def _scope(db: Session, query: Query, survey_id_col, company_id_col, atividade: Optional[str],
+           estado: Optional[str], latest_only: bool) -> Query:
+    if latest_only:
+        latest = _latest_surveys(db)
+        query = query.join(latest, latest.c.survey_id == survey_id_col)
+    if atividade or estado:
+        query = query.join(Company, Company.id == company_id_col)
+        if atividade:
+            query = query.filter(Company.atividade == atividade)
+        if estado:
+            query = query.filter(Company.estado == estado)
+    return query
+
+def _page(query: Query, order_by, limit: int, offset: int):
+    total = query.count()
+    rows = query.order_by(*order_by).limit(limit).offset(offset).all()
+    return total, rows
+
+def maturity_distribution(db: Session, eixo: Optional[str] = None, atividade: Optional[str] = None,
+                          estado: Optional[str] = None, latest_only: bool = True,
+                          limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+    """Number of surveys at each maturity level, per eixo and tema (tema '' is the whole eixo)."""
+    niveis = [func.sum(case((SurveyMaturity.nivel == n, 1), else_=0)).label(f'nivel_{n}') for n in NIVEIS]
+    query = db.query(SurveyMaturity.eixo, SurveyMaturity.tema, func.count(SurveyMaturity.id).label('surveys'), *niveis)
+    query = _scope(db, query, SurveyMaturity.survey_id, SurveyMaturity.company_id, atividade, estado, latest_only)
+    if eixo:
+        query = query.filter(SurveyMaturity.eixo == eixo)
+    query = query.group_by(SurveyMaturity.eixo, SurveyMaturity.tema)
+    total, rows = _page(query, (SurveyMaturity.eixo, SurveyMaturity.tema), limit, offset)
+    return {
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'items': [{
+            'eixo': row.eixo,
+            'tema': row.tema,
+            'surveys': row.surveys,
+            'niveis': {n: getattr(row, f'nivel_{n}') for n in NIVEIS},
+        } for row in rows],
+    }
+
+def blocking_questions(db: Session, eixo: Optional[str] = None, por_tema: bool = True, atividade: Optional[str] = None,
+                       estado: Optional[str] = None, latest_only: bool = True,
+                       limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+    """Questions most often answered "Não" at the level right above the one reached.
+
+    A survey at level N in a tema (or eixo) only moves to N+1 when every level
+    N+1 question is "Sim" or "Não Aplicado", so each "Não" there blocks progression.
+    """
+    if not WRITE_ROWS:
+        return _blocking_questions_from_vectors(db, eixo, por_tema, atividade, estado, latest_only, limit, offset)
+    tema_join = SurveyMaturity.tema == Question.tema if por_tema else SurveyMaturity.tema == literal('')
+    blocked = func.count(SurveyAnswers.id).label('surveys')
+    query = db.query(
+        Question.id, Question.eixo_pergunta, Question.tema, Question.nivel, Question.pergunta, blocked
+    ).select_from(SurveyAnswers).join(
+        Question, Question.id == SurveyAnswers.question_id
+    ).join(
+        SurveyMaturity, and_(
+            SurveyMaturity.survey_id == SurveyAnswers.survey_id,
+            SurveyMaturity.eixo == Question.eixo_pergunta,
+            tema_join,
+        )
+    ).filter(
+        Question.tipo == 'Pergunta',
+        SurveyAnswers.answer == '1',
+        Question.nivel == SurveyMaturity.nivel + 1,
+    )
+    query = _scope(db, query, SurveyAnswers.survey_id, SurveyAnswers.company_id, atividade, estado, latest_only)
+    if eixo:
+        query = query.filter(Question.eixo_pergunta == eixo)
+    query = query.group_by(Question.id, Question.eixo_pergunta, Question.tema, Question.nivel, Question.pergunta)
+    total, rows = _page(query, (blocked.desc(), Question.id), limit, offset)
+    return {
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'items': [{
+            'question_id': row.id,
+            'eixo': row.eixo_pergunta,
+            'tema': row.tema,
+            'nivel': row.nivel,
+            'pergunta': row.pergunta,
+            'surveys': row.surveys,
+        } for row in rows],
+    }
+
+VECTOR_BATCH = 500
+
+def _blocking_questions_from_vectors(db: Session, eixo: Optional[str], por_tema: bool, atividade: Optional[str],
+                                     estado: Optional[str], latest_only: bool, limit: int, offset: int) -> Dict[str, Any]:
+    # mesma regra do SQL de blocking_questions, sobre as respostas decodificadas dos vetores
+    query = db.query(SurveyMaturity.survey_id, SurveyMaturity.eixo, SurveyMaturity.tema, SurveyMaturity.nivel)
+    query = _scope(db, query, SurveyMaturity.survey_id, SurveyMaturity.company_id, atividade, estado, latest_only)
+    niveis: Dict[Tuple[int, str, str], int] = {
+        (survey_id, eixo_row, tema): nivel for survey_id, eixo_row, tema, nivel in query
+    }
+    perguntas = db.query(Question).filter(Question.tipo == 'Pergunta')
+    if eixo:
+        perguntas = perguntas.filter(Question.eixo_pergunta == eixo)
+    perguntas = {question.id: question for question in perguntas}
+    survey_ids = sorted({survey_id for survey_id, _, _ in niveis})
+    blocked: Counter = Counter()
+    for i in range(0, len(survey_ids), VECTOR_BATCH):
+        for survey_id, answers in load_answers(db, survey_ids[i:i + VECTOR_BATCH]).items():
+            for question_id, answer in answers.items():
+                question = perguntas.get(question_id)
+                if question is None or answer != '1':
+                    continue
+                nivel = niveis.get((survey_id, question.eixo_pergunta, question.tema if por_tema else ''))
+                if nivel is not None and question.nivel == nivel + 1:
+                    blocked[question_id] += 1
+    rows = sorted(blocked.items(), key=lambda item: (-item[1], item[0]))
+    return {
+        'total': len(rows),
+        'limit': limit,
+        'offset': offset,
+        'items': [{
+            'question_id': question_id,
+            'eixo': perguntas[question_id].eixo_pergunta,
+            'tema': perguntas[question_id].tema,
+            'nivel': perguntas[question_id].nivel,
+            'pergunta': perguntas[question_id].pergunta,
+            'surveys': surveys,
+        } for question_id, surveys in rows[offset:offset + limit]],
+    }
+
+def indicator_trends(db: Session, question_id: Optional[int] = None, eixo: Optional[str] = None, periodo: str = 'month',
+                     atividade: Optional[str] = None, estado: Optional[str] = None,
+                     limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+    """Count, mean, min and max of each indicator per period."""
+    if periodo not in PERIODOS:
+        raise ValueError(f"periodo deve ser um de {PERIODOS}")
+    inicio = _period_start(db, periodo, SurveyInfo.date).label('periodo')
+    valor = SurveyIndicator.value
+    query = db.query(
+        inicio, Question.id, Question.eixo_pergunta, Question.pergunta,
+        func.count(valor).label('surveys'),
+        func.avg(valor).label('media'), func.min(valor).label('minimo'), func.max(valor).label('maximo'),
+    ).select_from(SurveyIndicator).join(
+        Question, Question.id == SurveyIndicator.indicator_id
+    ).join(
+        SurveyInfo, SurveyInfo.id == SurveyIndicator.survey_id
+    )
+    query = _scope(db, query, SurveyIndicator.survey_id, SurveyIndicator.company_id, atividade, estado, latest_only=False)
+    if question_id is not None:
+        query = query.filter(Question.id == question_id)
+    if eixo:
+        query = query.filter(Question.eixo_pergunta == eixo)
+    query = query.group_by(inicio, Question.id, Question.eixo_pergunta, Question.pergunta)
+    total, rows = _page(query, (Question.id, inicio), limit, offset)
+    return {
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'items': [{
+            'periodo': row.periodo.isoformat(),
+            'question_id': row.id,
+            'eixo': row.eixo_pergunta,
+            'item': row.pergunta,
+            'surveys': row.surveys,
+            'media': row.media,
+            'minimo': row.minimo,
+            'maximo': row.maximo,
+        } for row in rows],
+    }
+
+def indicator_distribution(db: Session, question_id: Optional[int] = None, eixo: Optional[str] = None,
+                           atividade: Optional[str] = None, estado: Optional[str] = None, latest_only: bool = True,
+                           limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+    """Peer distribution of each indicator: count, mean, min, max and quartiles."""
+    valor = SurveyIndicator.value
+    sqlite = is_sqlite(db)
+    quartis = [] if sqlite else [func.percentile_cont(q).within_group(valor).label(f'p{int(q * 100)}') for q in QUARTIS]
+    query = db.query(
+        Question.id, Question.eixo_pergunta, Question.pergunta,
+        func.count(valor).label('surveys'),
+        func.avg(valor).label('media'), func.min(valor).label('minimo'), func.max(valor).label('maximo'),
+        *quartis,
+    ).select_from(SurveyIndicator).join(
+        Question, Question.id == SurveyIndicator.indicator_id
+    )
+    query = _scope(db, query, SurveyIndicator.survey_id, SurveyIndicator.company_id, atividade, estado, latest_only)
+    if question_id is not None:
+        query = query.filter(Question.id == question_id)
+    if eixo:
+        query = query.filter(Question.eixo_pergunta == eixo)
+    query = query.group_by(Question.id, Question.eixo_pergunta, Question.pergunta)
+    total, rows = _page(query, (Question.id,), limit, offset)
+    if sqlite:
+        valores: Dict[int, List[float]] = {row.id: [] for row in rows}
+        amostra = db.query(SurveyIndicator.indicator_id, valor).filter(SurveyIndicator.indicator_id.in_(list(valores)))
+        amostra = _scope(db, amostra, SurveyIndicator.survey_id, SurveyIndicator.company_id, atividade, estado, latest_only)
+        for question_id, v in amostra.filter(valor.isnot(None)).order_by(valor):
+            valores[question_id].append(v)
+        quartis_por_id = {question_id: {f'p{int(q * 100)}': _percentile(v, q) for q in QUARTIS} for question_id, v in valores.items()}
+    else:
+        quartis_por_id = {row.id: {f'p{int(q * 100)}': getattr(row, f'p{int(q * 100)}') for q in QUARTIS} for row in rows}
+    return {
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'items': [{
+            'question_id': row.id,
+            'eixo': row.eixo_pergunta,
+            'item': row.pergunta,
+            'surveys': row.surveys,
+            'media': row.media,
+            'minimo': row.minimo,
+            'maximo': row.maximo,
+            'quartis': quartis_por_id[row.id],
+        } for row in rows],
+    }
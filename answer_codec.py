@@ -0,0 +1,243 @@
+"""Respostas de um questionário em vetores compactos, uma linha por eixo.
+
+Em vez de ~180 linhas em `survey_answers` (uma por pergunta, repetindo
+`company_id` e `eixo`), cada questionário vira uma linha por eixo em
+`survey_answer_vectors`:
+
+- `codes`: um byte por pergunta do eixo, na ordem do catálogo (0 sim, 1 não,
+  2 não aplicado, 255 sem resposta);
+- `indicators`: um float64 little-endian por indicador do eixo (NaN sem valor).
+
+A ordem vem de `questions` e é versionada: `catalog_version` aponta para o
+layout gravado em `answer_catalog_versions`, então mudanças no catálogo não
+invalidam vetores antigos.
+
+`ANSWER_STORAGE` escolhe onde os questionários são gravados e lidos:
+`rows` (padrão, só `survey_answers`), `both` (grava os dois, lê os vetores) ou
+`vectors` (só os vetores). Com os vetores, `analytics.blocking_questions` e
+a exportação também leem deles (`load_answers`), voltando a `survey_answers`
+só para questionários ainda sem vetores. Para gerar os vetores dos
+questionários já gravados:
+
+    python answer_codec.py
+"""
+import hashlib
+import json
+import math
+import os
+import struct
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import AnswerCatalogVersion, Company, Question, SessionLocal, SurveyAnswers, SurveyAnswerVector, SurveyInfo
+from indicators import InvalidIndicator, parse_indicator
+from models import Survey, SurveyAmbiental, SurveyGovernanca, SurveySocial
+
+ANSWER_STORAGE = os.environ.get("ANSWER_STORAGE", "rows")
+if ANSWER_STORAGE not in ("rows", "both", "vectors"):
+    raise ValueError(f"ANSWER_STORAGE deve ser rows, both ou vectors, não {ANSWER_STORAGE!r}")
+WRITE_ROWS = ANSWER_STORAGE in ("rows", "both")
+WRITE_VECTORS = ANSWER_STORAGE in ("both", "vectors")
+READ_VECTORS = WRITE_VECTORS
+
+MISSING = 255
+CODES = {"0": 0, "1": 1, "2": 2}
+ANSWERS = {code: answer for answer, code in CODES.items()}
+
+EIXO_MODELS = {
+    "ambiental": SurveyAmbiental,
+    "governanca": SurveyGovernanca,
+    "social": SurveySocial,
+}
+# {question_id: (eixo, campo)} e campos declarados como float nos modelos
+QUESTION_FIELDS: Dict[int, Tuple[str, str]] = {
+    question_id: (eixo, name)
+    for eixo, model in EIXO_MODELS.items() for name, question_id in model._name_mapping.default.items()
+}
+FLOAT_FIELDS = {
+    model._name_mapping.default[name]
+    for model in EIXO_MODELS.values() for name, field in model.model_fields.items() if field.annotation is float
+}
+
+@dataclass(frozen=True)
+class CatalogLayout:
+    """Order of the questions and indicators of each eixo in the vectors."""
+    version: str
+    questions: Dict[str, Tuple[int, ...]]
+    indicators: Dict[str, Tuple[int, ...]]
+
+    @classmethod
+    def from_json(cls, version: str, layout: Dict[str, Dict[str, List[int]]]) -> "CatalogLayout":
+        return cls(
+            version=version,
+            questions={eixo: tuple(ids["questions"]) for eixo, ids in layout.items()},
+            indicators={eixo: tuple(ids["indicators"]) for eixo, ids in layout.items()},
+        )
+
+    @classmethod
+    def from_catalog(cls, catalog: Iterable[Question]) -> "CatalogLayout":
+        layout: Dict[str, Dict[str, List[int]]] = {}
+        for question in sorted(catalog, key=lambda q: q.id):
+            ids = layout.setdefault(question.eixo_pergunta, {"questions": [], "indicators": []})
+            ids["indicators" if question.tipo == "Indicador" else "questions"].append(question.id)
+        digest = hashlib.sha256(json.dumps(layout, sort_keys=True).encode()).hexdigest()[:12]
+        return cls.from_json(digest, layout)
+
+    def to_json(self) -> Dict[str, Dict[str, List[int]]]:
+        return {
+            eixo: {"questions": list(self.questions[eixo]), "indicators": list(self.indicators[eixo])}
+            for eixo in self.questions
+        }
+
+def encode_eixo(layout: CatalogLayout, eixo: str, answers: Dict[int, Any]) -> Tuple[bytes, bytes]:
+    """Pack the answers of one eixo.
+
+    Answers other than "0"/"1"/"2" and non-numeric indicators are stored as missing.
+
+    Returns:
+        tuple: (codes, indicators) as bytes.
+    """
+    codes = bytes(CODES.get(str(answers.get(question_id, "")).strip(), MISSING) for question_id in layout.questions[eixo])
+    values = []
+    for question_id in layout.indicators[eixo]:
+        try:
+            valor = parse_indicator(answers[question_id])
+        except (KeyError, InvalidIndicator):
+            valor = math.nan
+        values.append(valor)
+    return codes, struct.pack(f"<{len(values)}d", *values)
+
+def decode_eixo(layout: CatalogLayout, eixo: str, codes: bytes, indicators: bytes) -> Dict[int, Any]:
+    """{question_id: answer} of one eixo: "0"/"1"/"2" for questions, float for indicators."""
+    answers: Dict[int, Any] = {
+        question_id: ANSWERS[code]
+        for question_id, code in zip(layout.questions[eixo], codes) if code != MISSING
+    }
+    values = struct.unpack(f"<{len(indicators) // 8}d", indicators)
+    for question_id, valor in zip(layout.indicators[eixo], values):
+        if not math.isnan(valor):
+            answers[question_id] = valor
+    return answers
+
+def answer_text(answer: Any) -> Any:
+    """Decoded answer as the text stored in `survey_answers`: indicators without the ".0" of integers."""
+    if isinstance(answer, float):
+        text = repr(answer)
+        return text[:-2] if text.endswith(".0") else text
+    return answer
+
+def _field_value(question_id: int, answer: Any) -> Any:
+    # indicadores declarados como str nos modelos voltam como texto
+    return answer if question_id in FLOAT_FIELDS else answer_text(answer)
+
+def survey_from_answers(meta: Dict[str, Any], answers: Dict[int, Any]) -> Survey:
+    """Build a `Survey` from its metadata and {question_id: answer}."""
+    survey: Dict[str, Any] = {"meta": meta, **{eixo: {} for eixo in EIXO_MODELS}}
+    for question_id, answer in answers.items():
+        if question_id in QUESTION_FIELDS:
+            eixo, name = QUESTION_FIELDS[question_id]
+            survey[eixo][name] = _field_value(question_id, answer)
+    return Survey(**survey)
+
+_layouts: Dict[str, CatalogLayout] = {}
+
+def current_layout(db: Session) -> CatalogLayout:
+    """Layout of the current catalog, registered in `answer_catalog_versions` on first use."""
+    layout = CatalogLayout.from_catalog(db.query(Question).all())
+    if layout.version not in _layouts:
+        if db.get(AnswerCatalogVersion, layout.version) is None:
+            try:
+                with db.begin_nested():
+                    db.add(AnswerCatalogVersion(version=layout.version, layout=layout.to_json()))
+            except IntegrityError:
+                pass  # outro worker registrou a mesma versão
+
+        _layouts[layout.version] = layout
+    return _layouts[layout.version]
+
+def layout_for(db: Session, version: str) -> CatalogLayout:
+    if version not in _layouts:
+        row = db.get(AnswerCatalogVersion, version)
+        if row is None:
+            raise LookupError(f"Versão de catálogo desconhecida: {version}")
+        _layouts[version] = CatalogLayout.from_json(version, row.layout)
+    return _layouts[version]
+
+def store_answer_vectors(db: Session, company_id: int, survey_id: int, answers: Dict[int, Any],
+                         layout: Optional[CatalogLayout] = None):
+    """Add the vector rows of one survey to the session; the caller commits."""
+    layout = layout or current_layout(db)
+    for eixo in layout.questions:
+        codes, indicators = encode_eixo(layout, eixo, answers)
+        db.add(SurveyAnswerVector(
+            survey_id=survey_id, company_id=company_id, eixo=eixo,
+            catalog_version=layout.version, codes=codes, indicators=indicators,
+        ))
+
+def load_survey_answers(db: Session, survey_ids: List[int]) -> Dict[int, Dict[int, Any]]:
+    """{survey_id: {question_id: answer}} read from the vectors (one row per survey and eixo)."""
+    answers: Dict[int, Dict[int, Any]] = {survey_id: {} for survey_id in survey_ids}
+    rows = db.query(SurveyAnswerVector).filter(SurveyAnswerVector.survey_id.in_(survey_ids)).all()
+    for row in rows:
+        layout = layout_for(db, row.catalog_version)
+        answers[row.survey_id].update(decode_eixo(layout, row.eixo, row.codes, row.indicators))
+    return answers
+
+def load_answers(db: Session, survey_ids: List[int]) -> Dict[int, Dict[int, Any]]:
+    """As `load_survey_answers`, reading `survey_answers` for surveys without vectors (not backfilled yet)."""
+    answers = load_survey_answers(db, survey_ids)
+    missing = [survey_id for survey_id, survey in answers.items() if not survey]
+    if missing:
+        rows = db.query(SurveyAnswers.survey_id, SurveyAnswers.question_id, SurveyAnswers.answer).filter(
+            SurveyAnswers.survey_id.in_(missing)
+        )
+        for survey_id, question_id, answer in rows:
+            answers[survey_id][question_id] = answer
+    return answers
+
+def load_company_surveys(db: Session, company: Company) -> Optional[List[Survey]]:
+    """Every survey of a company, oldest first, rebuilt from the vectors.
+
+    Returns None when some survey has no vectors yet (inserted before them and not backfilled).
+    """
+    infos = db.query(SurveyInfo).filter_by(company_id=company.id).order_by(SurveyInfo.id).all()
+    answers = load_survey_answers(db, [info.id for info in infos])
+    if not all(answers.values()):
+        return None
+    return [
+        survey_from_answers({
+            "empresa": company.empresa,
+            "atividade": company.atividade,
+            "estado": company.estado,
+            "cidade": company.cidade,
+            "producaomes": str(info.producaomes),
+            "unidproducao": info.unidproducao,
+            "data": info.date.strftime("%d/%m/%Y"),
+        }, answers[info.id])
+        for info in infos
+    ]
+
+def backfill_answer_vectors(db: Session) -> int:
+    """Encode the surveys that only have `survey_answers` rows; returns how many were encoded."""
+    layout = current_layout(db)
+    encoded = {survey_id for (survey_id,) in db.query(SurveyAnswerVector.survey_id).distinct()}
+    count = 0
+    for survey_id, company_id in db.query(SurveyInfo.id, SurveyInfo.company_id).order_by(SurveyInfo.id):
+        if survey_id in encoded:
+            continue
+        answers = dict(db.query(SurveyAnswers.question_id, SurveyAnswers.answer).filter_by(survey_id=survey_id))
+        if answers:
+            store_answer_vectors(db, company_id, survey_id, answers, layout)
+            db.commit()
+            count += 1
+    return count
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        print(f"{backfill_answer_vectors(db)} questionários codificados")
+    finally:
+        db.close()
@@ -0,0 +1,155 @@
+"""Armazenamento compartilhado dos artefatos gerados (PDFs de relatórios).
+
+Cada arquivo é guardado pelo sha256 do conteúdo (`ab/cd/abcd...`), escrito em
+um arquivo temporário no mesmo diretório e publicado com `os.replace`, então
+nunca se lê um arquivo pela metade. Os metadados ficam no Postgres:
+`artifacts` (tamanho, tipo, último acesso) e `artifact_refs`, que liga uma
+chave lógica (por exemplo, o relatório de uma empresa para um conjunto de
+questionários) ao conteúdo.
+
+Com `ARTIFACT_STORE_DIR` em um volume compartilhado, qualquer worker ou réplica
+serve um relatório gerado por outro. Quando o total passa de
+`ARTIFACT_STORE_MAX_BYTES`, os artefatos acessados há mais tempo são removidos.
+"""
+import abc
+import hashlib
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import Artifact, ArtifactRef
+
+ARTIFACT_STORE_DIR = os.environ.get("ARTIFACT_STORE_DIR", "artifacts")
+ARTIFACT_STORE_MAX_BYTES = int(os.environ.get("ARTIFACT_STORE_MAX_BYTES", str(2 * 1024 ** 3)))
+# artefatos guardados ou consultados há menos tempo que isso não são removidos: quem acabou de
+# recebê-los de put_file/lookup ainda vai abrir o arquivo
+ARTIFACT_EVICT_GRACE_SECONDS = float(os.environ.get("ARTIFACT_EVICT_GRACE_SECONDS", "60"))
+# com nginx na frente: prefixo de uma location `internal` apontando para ARTIFACT_STORE_DIR,
+# e o nginx envia o arquivo com sendfile (X-Accel-Redirect)
+ARTIFACT_ACCEL_PREFIX = os.environ.get("ARTIFACT_ACCEL_PREFIX", "")
+
+HASH_CHUNK = 1024 * 1024
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ArtifactStore(abc.ABC):
+    """Content-addressed artifacts with their metadata in the database."""
+
+    @abc.abstractmethod
+    def path(self, digest: str) -> str:
+        """Where the artifact with this content hash is stored."""
+
+    @abc.abstractmethod
+    def put_file(self, db: Session, src_path: str, content_type: str, ref: Optional[str] = None) -> str:
+        """Store a copy of `src_path`, point `ref` at it and return its path."""
+
+    @abc.abstractmethod
+    def lookup(self, db: Session, ref: str) -> Optional[str]:
+        """Path of the artifact `ref` points to, or None when it is unknown or was evicted."""
+
+class LocalArtifactStore(ArtifactStore):
+    """Artifacts in a directory, ideally on a volume shared by every node."""
+
+    def __init__(self, root: str = ARTIFACT_STORE_DIR, max_bytes: int = ARTIFACT_STORE_MAX_BYTES):
+        """
+        Args:
+            root (str): Store directory.
+            max_bytes (int): Total size above which the least recently used artifacts are evicted.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def accel_redirect(self, path: str) -> Optional[str]:
+        """Internal URI for X-Accel-Redirect, when a proxy serves the store directly."""
+        if not ARTIFACT_ACCEL_PREFIX:
+            return None
+        return ARTIFACT_ACCEL_PREFIX.rstrip("/") + "/" + os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def _write(self, src_path: str, digest: str) -> str:
+        path = self.path(digest)
+        if os.path.exists(path):
+            return path  # mesmo conteúdo já guardado
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(src_path, "rb") as src, open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, HASH_CHUNK)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def put_file(self, db: Session, src_path: str, content_type: str, ref: Optional[str] = None) -> str:
+        digest = file_digest(src_path)
+        path = self._write(src_path, digest)
+        now = datetime.now()
+        if db.get(Artifact, digest) is None:
+            try:
+                with db.begin_nested():
+                    db.add(Artifact(digest=digest, size=os.path.getsize(path), content_type=content_type,
+                                    created_at=now, last_accessed_at=now))
+            except IntegrityError:
+                pass  # outro nó guardou o mesmo conteúdo
+        if ref is not None:
+            db.merge(ArtifactRef(ref=ref, digest=digest, created_at=now))
+        db.commit()
+        self.evict(db, keep=digest)
+        return path
+
+    def lookup(self, db: Session, ref: str) -> Optional[str]:
+        row = db.get(ArtifactRef, ref)
+        if row is None:
+            return None
+        path = self.path(row.digest)
+        if not os.path.exists(path):
+            return None
+        db.query(Artifact).filter_by(digest=row.digest).update({"last_accessed_at": datetime.now()})
+        db.commit()
+        return path
+
+    def evict(self, db: Session, keep: Optional[str] = None) -> int:
+        """Delete the least recently used artifacts until the store fits in `max_bytes`; returns how many.
+
+        Artifacts accessed in the last `ARTIFACT_EVICT_GRACE_SECONDS` are kept.
+        """
+        total = db.query(func.coalesce(func.sum(Artifact.size), 0)).scalar()
+        evicted = 0
+        if total <= self.max_bytes:
+            return evicted
+        recent = datetime.now() - timedelta(seconds=ARTIFACT_EVICT_GRACE_SECONDS)
+        candidates = db.query(Artifact.digest, Artifact.size).filter(Artifact.last_accessed_at < recent)
+        for digest, size in candidates.order_by(Artifact.last_accessed_at).all():
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            db.query(ArtifactRef).filter_by(digest=digest).delete()
+            db.query(Artifact).filter_by(digest=digest).delete()
+            db.commit()
+            # file_response abre o arquivo antes de responder: quem já o abriu continua lendo
+            try:
+                os.remove(self.path(digest))
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        return evicted
+
+ARTIFACTS = LocalArtifactStore()
@@ -0,0 +1,47 @@
+"""Compara dois resultados de `benchmark.main`.
+
+Uso:
+
+    python -m benchmark.compare antes.json depois.json --threshold 0.10
+
+Sai com código 1 se alguma etapa ficou mais lenta que o limite.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+def compare_stages(before: Dict[str, Any], after: Dict[str, Any], threshold: float) -> List[Tuple[str, float, float, float, bool]]:
+    """Compare the median time of each stage present in both results.
+
+    Returns:
+        list of tuple: (stage, median before, median after, ratio, is_regression).
+    """
+    rows = []
+    for stage, stats_after in after['stages'].items():
+        stats_before = before['stages'].get(stage)
+        if stats_before is None or 'median' not in stats_before or 'median' not in stats_after:
+            continue
+        ratio = stats_after['median'] / stats_before['median'] if stats_before['median'] else float('inf')
+        rows.append((stage, stats_before['median'], stats_after['median'], ratio, ratio > 1.0 + threshold))
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compara dois resultados de benchmark')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.10, help='aumento relativo tolerado (0.10 = 10%%)')
+    args = parser.parse_args()
+
+    with open(args.before, 'r', encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, 'r', encoding='utf-8') as f:
+        after = json.load(f)
+
+    print(f"{before['meta']['commit'][:10]} -> {after['meta']['commit'][:10]}")
+    regressions = 0
+    for stage, median_before, median_after, ratio, is_regression in compare_stages(before, after, args.threshold):
+        flag = 'REGRESSÃO' if is_regression else ''
+        print(f"{stage:35s} {median_before*1000:10.2f}ms {median_after*1000:10.2f}ms {ratio:6.2f}x {flag}")
+        regressions += int(is_regression)
+    sys.exit(1 if regressions else 0)
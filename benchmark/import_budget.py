@@ -0,0 +1,71 @@
+"""Verifica o orçamento de tempo de importação do app web.
+
+Importa `main` em um processo novo e falha (código de saída 1) se o pacote de
+relatórios for carregado na inicialização ou se o tempo de importação passar
+do orçamento:
+
+    python -m benchmark.import_budget --budget-ms 800
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# módulos que só devem ser importados na primeira geração de relatório
+HEAVY_MODULES = ['pandas', 'pdfkit', 'matplotlib', 'plotly', 'report_service', 'report_main', 'report.main']
+
+PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import main\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({'seconds': elapsed, 'modules': sorted(sys.modules)}))\n"
+)
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int]]:
+    """Top-level (cumulative microseconds, module) pairs from `python -X importtime` output."""
+    result = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            result.append((match.group(4), int(match.group(2))))
+    return result
+
+def measure(python: str = sys.executable) -> Dict:
+    completed = subprocess.run(
+        [python, '-X', 'importtime', '-c', PROBE], capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"Falha ao importar main:\n{completed.stderr.strip().splitlines()[-1]}")
+    probe = json.loads(completed.stdout.strip().splitlines()[-1])
+    loaded = set(probe['modules'])
+    return {
+        'seconds': probe['seconds'],
+        'heavy_loaded': [m for m in HEAVY_MODULES if m in loaded],
+        'slowest': sorted(parse_importtime(completed.stderr), key=lambda item: -item[1])[:10],
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=800.0, help='Tempo máximo para importar main')
+    parser.add_argument('--repeat', type=int, default=3, help='Usa o menor tempo de N processos')
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    runs = [measure() for _ in range(args.repeat)]
+    best = min(runs, key=lambda run: run['seconds'])
+    print(f"import main: {best['seconds'] * 1000:.0f} ms (orçamento {args.budget_ms:.0f} ms)")
+    for module, micros in best['slowest']:
+        print(f"  {module:<40} {micros / 1000:8.1f} ms")
+    failed = False
+    if best['heavy_loaded']:
+        print(f"Módulos pesados carregados na inicialização: {', '.join(best['heavy_loaded'])}")
+        failed = True
+    if best['seconds'] * 1000 > args.budget_ms:
+        print("Orçamento de importação excedido")
+        failed = True
+    sys.exit(1 if failed else 0)
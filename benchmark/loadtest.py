@@ -0,0 +1,199 @@
+"""Gerador de carga assíncrono para `/submit-survey` e `/report-generation`.
+
+Usa o formato de payload de `starter.py`, preenchido com respostas aleatórias
+válidas de `benchmark.synthetic` para várias empresas sintéticas.
+
+Uso:
+
+    python -m benchmark.loadtest --url http://localhost:8000 --concurrency 8 --duration 60
+    python -m benchmark.loadtest --rate 2 --requests 200 --report-ratio 0.5 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+    print('Instalar httpx: pip install httpx, para usar o gerador de carga.')
+
+from benchmark.synthetic import SyntheticGenerator
+from starter import content as STARTER_CONTENT
+
+SUBMIT_ENDPOINT = "/submit-survey"
+REPORT_ENDPOINT = "/report-generation"
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+def payload_from_template(template: Dict[str, Any], generated: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill the keys of the `starter.py` payload with generated values."""
+    payload = {}
+    for section, fields in template.items():
+        payload[section] = {key: generated[section].get(key, value) for key, value in fields.items()}
+    return payload
+
+class LoadStats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.status: Dict[str, Dict[str, int]] = {}
+
+    def record(self, endpoint: str, latency: float, status: str, ok: bool):
+        self.latencies.setdefault(endpoint, []).append(latency)
+        self.errors[endpoint] = self.errors.get(endpoint, 0) + (0 if ok else 1)
+        status_count = self.status.setdefault(endpoint, {})
+        status_count[status] = status_count.get(status, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'errors': self.errors[endpoint],
+                'error_rate': self.errors[endpoint] / len(latencies),
+                'throughput': len(latencies) / elapsed if elapsed else 0.0,
+                'status': self.status[endpoint],
+                'latency': {
+                    'p50': percentile(latencies, 0.50),
+                    'p90': percentile(latencies, 0.90),
+                    'p95': percentile(latencies, 0.95),
+                    'p99': percentile(latencies, 0.99),
+                    'max': latencies[-1],
+                    'mean': sum(latencies) / len(latencies),
+                },
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        total_errors = sum(self.errors.values())
+        return {
+            'elapsed': elapsed,
+            'requests': total,
+            'errors': total_errors,
+            'error_rate': total_errors / total if total else 0.0,
+            'throughput': total / elapsed if elapsed else 0.0,
+            'endpoints': endpoints,
+        }
+
+class LoadGenerator:
+    def __init__(self, base_url: str, n_companies: int, report_ratio: float, seed: int, timeout: float):
+        self.base_url = base_url.rstrip('/')
+        self.report_ratio = report_ratio
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.generator = SyntheticGenerator(seed=seed)
+        self.companies = self.generator.generate_companies(n_companies)
+        # data do próximo questionário de cada empresa; empresas com questionário enviado podem pedir relatório
+        self.next_date = {company.empresa: datetime(2023, 1, 1) for company in self.companies}
+        self.submitted = set()
+        self.stats = LoadStats()
+
+    def next_request(self):
+        submitted = [c for c in self.companies if c.empresa in self.submitted]
+        if submitted and self.random.random() < self.report_ratio:
+            company = self.random.choice(submitted)
+            meta = self.generator.generate_meta(company, self.next_date[company.empresa] - timedelta(days=1))
+            return "GET", REPORT_ENDPOINT, meta, company
+        company = self.random.choice(self.companies)
+        data = self.next_date[company.empresa]
+        self.next_date[company.empresa] = data + timedelta(days=self.generator.intervalo_dias)
+        payload = payload_from_template(STARTER_CONTENT, self.generator.generate_payload(company, data))
+        return "POST", SUBMIT_ENDPOINT, payload, company
+
+    async def send(self, client, method: str, endpoint: str, payload: Dict[str, Any], company):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, self.base_url + endpoint, json=payload, timeout=self.timeout)
+            ok = response.status_code < 400 and response.headers.get('content-type', '').startswith('application/pdf')
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            ok = False
+            status = type(e).__name__
+        self.stats.record(endpoint, time.perf_counter() - start, status, ok)
+        if ok and endpoint == SUBMIT_ENDPOINT:
+            self.submitted.add(company.empresa)
+
+    async def run_concurrency(self, concurrency: int, total: Optional[int], duration: Optional[float]):
+        """Closed loop: `concurrency` workers, each sending the next request as soon as the previous finishes."""
+        deadline = time.perf_counter() + duration if duration else None
+        remaining = [total]
+
+        def has_budget():
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            if remaining[0] is not None:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+            return True
+
+        async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency)) as client:
+            async def worker():
+                while has_budget():
+                    await self.send(client, *self.next_request())
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def run_rate(self, rate: float, total: Optional[int], duration: Optional[float], max_in_flight: int):
+        """Open loop: start requests at `rate` per second regardless of how fast the server answers."""
+        start = time.perf_counter()
+        in_flight = set()
+        semaphore = asyncio.Semaphore(max_in_flight)
+        async with httpx.AsyncClient(limits=httpx.Limits(max_connections=max_in_flight)) as client:
+            async def limited(request):
+                async with semaphore:
+                    await self.send(client, *request)
+            k = 0
+            while (total is None or k < total) and (duration is None or time.perf_counter() - start < duration):
+                delay = start + k / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                task = asyncio.ensure_future(limited(self.next_request()))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                k += 1
+            if in_flight:
+                await asyncio.gather(*in_flight)
+
+def parse_args(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Gerador de carga para a API ESG')
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--companies', type=int, default=50, help='quantidade de empresas sintéticas')
+    parser.add_argument('--concurrency', type=int, default=4, help='requisições simultâneas (modo laço fechado)')
+    parser.add_argument('--rate', type=float, default=None, help='requisições por segundo (modo laço aberto)')
+    parser.add_argument('--max-in-flight', type=int, default=256, help='limite de requisições abertas no modo --rate')
+    parser.add_argument('--requests', type=int, default=None, help='total de requisições')
+    parser.add_argument('--duration', type=float, default=None, help='duração em segundos')
+    parser.add_argument('--report-ratio', type=float, default=0.3, help='fração de requisições a /report-generation')
+    parser.add_argument('--timeout', type=float, default=300.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help='arquivo JSON de saída (padrão: stdout)')
+    args = parser.parse_args(argv)
+    if args.requests is None and args.duration is None:
+        args.requests = 100
+    return args
+
+if __name__ == "__main__":
+    args = parse_args()
+    load = LoadGenerator(args.url, args.companies, args.report_ratio, args.seed, args.timeout)
+    start = time.perf_counter()
+    if args.rate:
+        asyncio.run(load.run_rate(args.rate, args.requests, args.duration, args.max_in_flight))
+    else:
+        asyncio.run(load.run_concurrency(args.concurrency, args.requests, args.duration))
+    summary = load.stats.summary(time.perf_counter() - start)
+    summary['config'] = {k: v for k, v in vars(args).items() if k != 'output'}
+    output = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
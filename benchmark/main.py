@@ -0,0 +1,166 @@
+"""Benchmark end-to-end do pipeline de relatórios.
+
+Uso (a partir da raiz do repositório):
+
+    python -m benchmark.main --companies 20 --surveys 6 --output bench.json
+    python -m benchmark.main --database-url sqlite:///bench.db --skip-pdf
+
+O resultado é um JSON com o tempo de cada etapa, que pode ser comparado entre
+commits com `python -m benchmark.compare antes.json depois.json`.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmark.synthetic import SyntheticGenerator
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+def time_stage(results: Dict[str, Any], name: str, fn: Callable[[], Any], repeat: int = 1) -> Any:
+    """Run `fn` `repeat` times, store the timings under `name` and return the last result."""
+    runs = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+    results[name] = {
+        "runs": runs,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.mean(runs),
+        "max": max(runs),
+    }
+    return result
+
+def skip_stage(results: Dict[str, Any], name: str, reason: str):
+    results[name] = {"skipped": reason}
+
+def benchmark_charts(results: Dict[str, Any], repeat: int):
+    import pandas as pd
+    from report.generate_html import HAS_PLOTLY, spider_chart, bar_plot, timeseries_chart
+
+    categories = ['Mudanças Climáticas', 'Recursos Hídricos', 'Biodiversidade e serviços ecossistêmicos',
+                  'Economia circular e gestão de resíduos', 'Gestão ambiental e prevenção da poluição']
+    values = [1, 3, 2, 4, 2]
+    dates = pd.date_range(start='2023-01-01', periods=24, freq='MS').tolist()
+    series = [[float(i % 5 + 1) for i in range(24)]]
+
+    for backend, matplot in [('matplotlib', True), ('plotly', False)]:
+        if not matplot and not HAS_PLOTLY:
+            for kind in ('spider', 'bar', 'timeseries'):
+                skip_stage(results, f'chart_{backend}_{kind}', 'plotly não instalado')
+            continue
+        time_stage(results, f'chart_{backend}_spider', lambda: spider_chart(
+            list(categories), list(values), title='', center=True, matplot=matplot), repeat)
+        time_stage(results, f'chart_{backend}_bar', lambda: bar_plot(
+            list(categories), list(values), title='', xlabel='Resultado', ylabel='', center=True, matplot=matplot, horizontal=True), repeat)
+        time_stage(results, f'chart_{backend}_timeseries', lambda: timeseries_chart(
+            [dates], series, legends=['Ambiental'], title='', xlabel='Data', ylabel='Valor', center=True, matplot=matplot), repeat)
+
+def run(args) -> Dict[str, Any]:
+    from database import Base, make_engine
+    from db_manager import insert_survey_data, load_questions_from_csv
+    from report_service import get_all_surveys, build_single_data_from_survey
+    from report.main import combine_multiple_reports, write_html
+    from report_main import iter_report_html, report_generation
+
+    results: Dict[str, Any] = {}
+    generator = SyntheticGenerator(seed=args.seed, csv_path=args.questions)
+
+    engine = make_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        load_questions_from_csv(args.questions, db)
+
+        surveys = list(generator.generate_surveys(args.companies, args.surveys))
+        def insert_all():
+            for survey in surveys:
+                insert_survey_data(survey, db)
+        time_stage(results, 'insert_survey_data', insert_all)
+        results['insert_survey_data']['per_survey'] = results['insert_survey_data']['median'] / max(len(surveys), 1)
+
+        # a ultima empresa gerada tem todos os seus questionarios inseridos
+        meta = surveys[-1].meta
+        list_of_survey, questions_df = time_stage(results, 'get_all_surveys', lambda: get_all_surveys(meta, db), args.repeat)
+    finally:
+        db.close()
+
+    datas = time_stage(results, 'build_single_data_from_survey', lambda: [
+        build_single_data_from_survey(survey, questions_df) for survey in list_of_survey
+    ], args.repeat)
+    results['build_single_data_from_survey']['surveys'] = len(list_of_survey)
+
+    time_stage(results, 'combine_multiple_reports', lambda: combine_multiple_reports(datas), args.repeat)
+    time_stage(results, 'maturity_eixo', lambda: datas[-1].get_aspecto_per_eixo(), args.repeat)
+    time_stage(results, 'maturity_eixo_tema', lambda: datas[-1].get_aspecto_per_eixo_and_tema(), args.repeat)
+
+    benchmark_charts(results, args.repeat)
+
+    report_html = time_stage(results, 'report_generation', lambda: report_generation(datas))
+    # HTML em streaming: tempo até o primeiro pedaço com conteúdo (cabeçalho e seções de texto)
+    time_stage(results, 'report_first_section', lambda: next(islice(iter_report_html(datas), 1, None)), args.repeat)
+    empresa = {'nome_empresa': datas[-1].empresa.nome_empresa, 'data': datas[-1].empresa.data}
+    time_stage(results, 'write_html', lambda: write_html(empresa, report_html), args.repeat)
+    results['report_generation']['html_bytes'] = len(report_html.encode('utf-8'))
+
+    if args.skip_pdf:
+        skip_stage(results, 'pdf_conversion', '--skip-pdf')
+    else:
+        try:
+            import pdfkit
+            pdf_bytes = time_stage(results, 'pdf_conversion', lambda: pdfkit.from_string(report_html, False))
+            results['pdf_conversion']['pdf_bytes'] = len(pdf_bytes)
+        except (ImportError, OSError) as e:
+            skip_stage(results, 'pdf_conversion', str(e))
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'companies': args.companies,
+            'surveys_per_company': args.surveys,
+            'repeat': args.repeat,
+            'database': engine.dialect.name,
+        },
+        'stages': results,
+    }
+
+def parse_args(argv: List[str] = None):
+    from database import SQLALCHEMY_DATABASE_URL
+
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline de relatórios ESG')
+    parser.add_argument('--companies', type=int, default=10, help='quantidade de empresas sintéticas')
+    parser.add_argument('--surveys', type=int, default=6, help='questionários por empresa')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help='repetições das etapas rápidas')
+    parser.add_argument('--database-url', default=SQLALCHEMY_DATABASE_URL)
+    parser.add_argument('--questions', default='questions.csv')
+    parser.add_argument('--skip-pdf', action='store_true')
+    parser.add_argument('--output', default=None, help='arquivo JSON de saída (padrão: stdout)')
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    output = json.dumps(run(args), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
@@ -0,0 +1,157 @@
+import csv
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from models import Survey, SurveyAmbiental, SurveyGovernanca, SurveySocial
+
+ATIVIDADES = ["FrigorificoBovino", "FrigorificoSuinos", "FrigorificoEquinos", "FrigorificoOvinos"]
+LOCALIDADES = [
+    ("ES", "vitória"), ("ES", "vila_velha"), ("ES", "serra"), ("ES", "cariacica"),
+    ("MG", "belo_horizonte"), ("RJ", "rio_de_janeiro"), ("SP", "são_paulo"),
+    ("BA", "salvador"), ("GO", "goiânia"), ("MT", "cuiabá"),
+]
+UNIDPRODUCAO = "Animais abatidos"
+
+# resposta -> 0: sim, 1: nao, 2: nao aplicavel
+RESPOSTA_SIM = "0"
+RESPOSTA_NAO = "1"
+RESPOSTA_NAO_APLICADO = "2"
+
+EIXO_MODELS = {
+    "ambiental": SurveyAmbiental,
+    "governanca": SurveyGovernanca,
+    "social": SurveySocial,
+}
+
+def load_question_catalog(csv_path: str = "questions.csv") -> List[Dict[str, Any]]:
+    """Load the question catalog with the same columns as the `questions` table.
+
+    Args:
+        csv_path (str): Path to the questions CSV used by `db_manager.load_questions_from_csv`.
+
+    Returns:
+        list of dict: One dict per question with id, eixo_pergunta, pergunta, tema, criterio, tipo and nivel.
+    """
+    catalog = []
+    with open(csv_path, "r", encoding="utf-8", errors="replace") as f:
+        for row in csv.DictReader(f):
+            catalog.append({
+                "id": int(row["id_pergunta"]),
+                "eixo_pergunta": str(row["eixo_pergunta"]),
+                "pergunta": str(row["pergunta"]),
+                "tema": str(row["tema"]),
+                "criterio": str(row["criterio"]),
+                "tipo": str(row["tipo"]),
+                "nivel": int(row["nivel"]),
+            })
+    return catalog
+
+class SyntheticCompany:
+    def __init__(self, empresa: str, atividade: str, estado: str, cidade: str, maturidade: float, escala: float):
+        self.empresa = empresa
+        self.atividade = atividade
+        self.estado = estado
+        self.cidade = cidade
+        # maturidade latente em [0, 1], evolui a cada questionario
+        self.maturidade = maturidade
+        # fator de porte da empresa, usado para produção e indicadores
+        self.escala = escala
+
+class SyntheticGenerator:
+    """Seeded generator of realistic companies, surveys and answers.
+
+    Each company has a latent maturity that drifts upwards between surveys. The
+    probability of answering "Sim" to a question decreases with its level, so the
+    generated data produce the whole range of maturity levels instead of a single
+    copied report.
+    """
+    def __init__(self, seed: int = 42, catalog: Optional[List[Dict[str, Any]]] = None, csv_path: str = "questions.csv",
+                 prob_nao_aplicado: float = 0.05, intervalo_dias: int = 30):
+        """
+        Args:
+            seed (int): Seed for the random generator; the same seed yields the same data.
+            catalog (list of dict): Question catalog; loaded from `csv_path` when not given.
+            csv_path (str): Path to the questions CSV.
+            prob_nao_aplicado (float): Probability of a "Não Aplicado" answer.
+            intervalo_dias (int): Days between two surveys of the same company.
+        """
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.catalog = catalog if catalog is not None else load_question_catalog(csv_path)
+        self.catalog_by_id = {q["id"]: q for q in self.catalog}
+        self.prob_nao_aplicado = prob_nao_aplicado
+        self.intervalo_dias = intervalo_dias
+
+    def generate_companies(self, n_companies: int) -> List[SyntheticCompany]:
+        companies = []
+        for i in range(n_companies):
+            estado, cidade = self.random.choice(LOCALIDADES)
+            companies.append(SyntheticCompany(
+                empresa=f"EmpresaSintetica{i:05d}",
+                atividade=self.random.choice(ATIVIDADES),
+                estado=estado,
+                cidade=cidade,
+                maturidade=self.random.betavariate(2, 3),
+                escala=math.exp(self.random.gauss(0, 0.75)),
+            ))
+        return companies
+
+    def _answer_question(self, nivel: int, maturidade: float) -> str:
+        if self.random.random() < self.prob_nao_aplicado:
+            return RESPOSTA_NAO_APLICADO
+        # nivel alcançável ~ maturidade*5; perguntas acima dele tendem a "Não"
+        prob_sim = 1.0 / (1.0 + math.exp(-4.0 * (maturidade * 5.0 - nivel + 0.5)))
+        return RESPOSTA_SIM if self.random.random() < prob_sim else RESPOSTA_NAO
+
+    def _answer_indicator(self, question_id: int, company: SyntheticCompany) -> str:
+        # base deterministica por indicador para manter ordens de grandeza estáveis entre empresas
+        base = 10 ** (1 + (question_id % 4))
+        valor = base * company.escala * math.exp(self.random.gauss(0, 0.2))
+        return f"{valor:.2f}"
+
+    def generate_meta(self, company: SyntheticCompany, data: datetime) -> Dict[str, str]:
+        return {
+            "empresa": company.empresa,
+            "atividade": company.atividade,
+            "estado": company.estado,
+            "cidade": company.cidade,
+            "producaomes": f"{1000 * company.escala * math.exp(self.random.gauss(0, 0.1)):.0f}",
+            "unidproducao": UNIDPRODUCAO,
+            "data": data.strftime("%d/%m/%Y"),
+        }
+
+    def generate_payload(self, company: SyntheticCompany, data: datetime) -> Dict[str, Any]:
+        """Build one survey payload with the same shape posted to `/submit-survey`."""
+        payload = {"meta": self.generate_meta(company, data)}
+        for eixo, model in EIXO_MODELS.items():
+            answers = {}
+            for varname, question_id in model._name_mapping.default.items():
+                question = self.catalog_by_id.get(question_id)
+                if question is not None and question["tipo"] == "Indicador":
+                    answers[varname] = self._answer_indicator(question_id, company)
+                else:
+                    nivel = question["nivel"] if question is not None else 1
+                    answers[varname] = self._answer_question(nivel, company.maturidade)
+            payload[eixo] = answers
+        return payload
+
+    def generate_company_payloads(self, company: SyntheticCompany, n_surveys: int, start: datetime) -> List[Dict[str, Any]]:
+        payloads = []
+        for k in range(n_surveys):
+            payloads.append(self.generate_payload(company, start + timedelta(days=k * self.intervalo_dias)))
+            company.maturidade = min(1.0, company.maturidade + abs(self.random.gauss(0.03, 0.03)))
+        return payloads
+
+    def generate_payloads(self, n_companies: int, surveys_per_company: int,
+                          start: datetime = datetime(2023, 1, 1)) -> Iterator[Dict[str, Any]]:
+        """Yield survey payloads for `n_companies` companies, `surveys_per_company` each."""
+        for company in self.generate_companies(n_companies):
+            for payload in self.generate_company_payloads(company, surveys_per_company, start):
+                yield payload
+
+    def generate_surveys(self, n_companies: int, surveys_per_company: int,
+                         start: datetime = datetime(2023, 1, 1)) -> Iterator[Survey]:
+        for payload in self.generate_payloads(n_companies, surveys_per_company, start):
+            yield Survey(**payload)
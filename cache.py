@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from metrics import CACHE_HITS, CACHE_MISSES
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire after `ttl` seconds."""
+    def __init__(self, name: str, maxsize: int = 256, ttl: float = 60.0):
+        """
+        Args:
+            name (str): Cache name, used as the `cache` label of the hit/miss metrics.
+            maxsize (int): Maximum number of entries kept.
+            ttl (float): Seconds an entry stays valid.
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                CACHE_MISSES.inc(cache=self.name)
+                return default
+            self._entries.move_to_end(key)
+            CACHE_HITS.inc(cache=self.name)
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,241 @@
+"""Exportação em massa das respostas em CSV, Arrow ou Parquet, em streaming.
+
+Uma linha por resposta, com os dados do questionário, da empresa e da
+pergunta. As linhas vêm de um cursor no servidor (`stream_results` +
+`yield_per`) e saem em blocos, então exportar o banco inteiro usa memória
+constante. Com `ANSWER_STORAGE=vectors` as respostas vêm dos vetores
+(`answer_codec.load_answers`), um bloco de questionários por vez. Usado pela
+rota `/export` e pela linha de comando:
+
+    python data_export.py --format parquet --output respostas.parquet --atividade Laticínios
+"""
+import argparse
+import csv
+import io
+import sys
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from answer_codec import WRITE_ROWS, answer_text, load_answers
+from database import Company, Question, SessionLocal, SurveyAnswers, SurveyInfo
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+    # stderr: a linha de comando pode estar escrevendo o CSV em stdout
+    print('Instalar pyarrow: pip install pyarrow, para exportar em Arrow e Parquet.', file=sys.stderr)
+
+BATCH_SIZE = 5000
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+COLUMNS = (
+    ("survey_id", SurveyInfo.id),
+    ("data", SurveyInfo.date),
+    ("company_id", Company.id),
+    ("empresa", Company.empresa),
+    ("atividade", Company.atividade),
+    ("estado", Company.estado),
+    ("cidade", Company.cidade),
+    ("producaomes", SurveyInfo.producaomes),
+    ("unidproducao", SurveyInfo.unidproducao),
+    ("eixo", SurveyAnswers.eixo),
+    ("question_id", SurveyAnswers.question_id),
+    ("tipo", Question.tipo),
+    ("tema", Question.tema),
+    ("criterio", Question.criterio),
+    ("nivel", Question.nivel),
+    ("pergunta", Question.pergunta),
+    ("answer", SurveyAnswers.answer),
+)
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+# colunas do questionário e da empresa, as primeiras de COLUMNS
+SURVEY_COLUMNS = COLUMNS[:9]
+
+class ExportError(ValueError):
+    pass
+
+def _filter(stmt, start: Optional[datetime] = None, end: Optional[datetime] = None,
+            atividade: Optional[str] = None, estado: Optional[str] = None,
+            empresa: Optional[str] = None, company_id: Optional[int] = None):
+    if start is not None:
+        stmt = stmt.where(SurveyInfo.date >= start)
+    if end is not None:
+        stmt = stmt.where(SurveyInfo.date < end)
+    if atividade:
+        stmt = stmt.where(Company.atividade == atividade)
+    if estado:
+        stmt = stmt.where(Company.estado == estado)
+    if empresa:
+        stmt = stmt.where(Company.empresa == empresa)
+    if company_id is not None:
+        stmt = stmt.where(Company.id == company_id)
+    return stmt
+
+def export_statement(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     atividade: Optional[str] = None, estado: Optional[str] = None,
+                     empresa: Optional[str] = None, company_id: Optional[int] = None):
+    """SELECT of the exported rows, filtered by survey date (end exclusive), sector or company."""
+    stmt = (
+        select(*[column.label(name) for name, column in COLUMNS])
+        .select_from(SurveyAnswers)
+        .join(SurveyInfo, SurveyInfo.id == SurveyAnswers.survey_id)
+        .join(Company, Company.id == SurveyAnswers.company_id)
+        .join(Question, Question.id == SurveyAnswers.question_id)
+    )
+    # ordem estável: respostas de um mesmo questionário ficam juntas
+    stmt = _filter(stmt, start, end, atividade, estado, empresa, company_id)
+    return stmt.order_by(SurveyAnswers.survey_id, SurveyAnswers.question_id)
+
+def survey_statement(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     atividade: Optional[str] = None, estado: Optional[str] = None,
+                     empresa: Optional[str] = None, company_id: Optional[int] = None):
+    """SELECT of the survey and company columns of the exported surveys, for the vectors."""
+    stmt = (
+        select(*[column.label(name) for name, column in SURVEY_COLUMNS])
+        .select_from(SurveyInfo)
+        .join(Company, Company.id == SurveyInfo.company_id)
+    )
+    return _filter(stmt, start, end, atividade, estado, empresa, company_id).order_by(SurveyInfo.id)
+
+def iter_batches(batch_size: int = BATCH_SIZE, **filters) -> Iterator[Sequence[tuple]]:
+    """Rows in lists of up to `batch_size`, read through a server-side cursor.
+
+    Opens its own session, because the response body is consumed after the
+    request dependencies are closed.
+    """
+    db = SessionLocal()
+    try:
+        if not WRITE_ROWS:
+            yield from _vector_batches(db, batch_size, **filters)
+            return
+        result = db.execute(
+            export_statement(**filters).execution_options(stream_results=True, yield_per=batch_size)
+        )
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+def _vector_batches(db: Session, batch_size: int, **filters) -> Iterator[Sequence[tuple]]:
+    # um bloco de questionários vira ~batch_size linhas, uma por pergunta do catálogo
+    questions = {question.id: question for question in db.query(Question)}
+    surveys_per_batch = max(1, batch_size // max(1, len(questions)))
+    result = db.execute(
+        survey_statement(**filters).execution_options(stream_results=True, yield_per=surveys_per_batch)
+    )
+    for partition in result.partitions():
+        answers = load_answers(db, [survey.survey_id for survey in partition])
+        rows = []
+        for survey in partition:
+            for question_id, answer in sorted(answers[survey.survey_id].items()):
+                question = questions.get(question_id)
+                if question is not None:
+                    rows.append((*survey, question.eixo_pergunta, question.id, question.tipo, question.tema,
+                                 question.criterio, question.nivel, question.pergunta, answer_text(answer)))
+        if rows:
+            yield rows
+
+def iter_csv(batch_size: int = BATCH_SIZE, **filters) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMN_NAMES)
+    for batch in iter_batches(batch_size, **filters):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def _arrow_schema():
+    return pa.schema([
+        ("survey_id", pa.int64()),
+        ("data", pa.timestamp("us")),
+        ("company_id", pa.int64()),
+        ("empresa", pa.string()),
+        ("atividade", pa.string()),
+        ("estado", pa.string()),
+        ("cidade", pa.string()),
+        ("producaomes", pa.float64()),
+        ("unidproducao", pa.string()),
+        ("eixo", pa.string()),
+        ("question_id", pa.int64()),
+        ("tipo", pa.string()),
+        ("tema", pa.string()),
+        ("criterio", pa.string()),
+        ("nivel", pa.int64()),
+        ("pergunta", pa.string()),
+        ("answer", pa.string()),
+    ])
+
+def _record_batch(schema, rows: Sequence[tuple]):
+    columns: List[list] = [list(values) for values in zip(*rows)]
+    return pa.RecordBatch.from_arrays([pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema)
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate(0)
+    return data
+
+def iter_arrow(batch_size: int = BATCH_SIZE, parquet: bool = False, **filters) -> Iterator[bytes]:
+    """Arrow IPC stream, or Parquet with one row group per batch, yielded as it is written."""
+    schema = _arrow_schema()
+    sink = io.BytesIO()
+    writer = pq.ParquetWriter(sink, schema) if parquet else pa.ipc.new_stream(sink, schema)
+    try:
+        for batch in iter_batches(batch_size, **filters):
+            if parquet:
+                writer.write_batch(_record_batch(schema, batch), row_group_size=len(batch))
+            else:
+                writer.write_batch(_record_batch(schema, batch))
+            yield _drain(sink)
+    finally:
+        writer.close()
+    yield _drain(sink)
+
+def iter_export(format: str, batch_size: int = BATCH_SIZE, **filters) -> Iterator[bytes]:
+    if format not in FORMATS:
+        raise ExportError(f"Formato desconhecido: {format}")
+    if format == "csv":
+        return iter_csv(batch_size, **filters)
+    # verificado aqui, e não no gerador, para a rota responder 400 antes de começar o stream
+    if not HAS_PYARROW:
+        raise ExportError("pyarrow não está instalado")
+    return iter_arrow(batch_size, parquet=format == "parquet", **filters)
+
+def _date(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta as respostas dos questionários.")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--output", default="-", help="arquivo de saída ('-' para stdout)")
+    parser.add_argument("--start", type=_date, help="data inicial (AAAA-MM-DD), inclusiva")
+    parser.add_argument("--end", type=_date, help="data final (AAAA-MM-DD), exclusiva")
+    parser.add_argument("--atividade")
+    parser.add_argument("--estado")
+    parser.add_argument("--empresa")
+    parser.add_argument("--company-id", type=int)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    chunks = iter_export(args.format, args.batch_size, start=args.start, end=args.end, atividade=args.atividade,
+                         estado=args.estado, empresa=args.empresa, company_id=args.company_id)
+    output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
@@ -1,11 +1,55 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
-from sqlalchemy import create_engine
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, Text, JSON, LargeBinary, UniqueConstraint, Index
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship
+from sqlalchemy.pool import StaticPool
+import os
 
-SQLALCHEMY_DATABASE_URL = "postgresql://user:password@db:5432/survey_db"
+# padrão: o Postgres do docker-compose; com `sqlite:///esg.db` o banco roda dentro do
+# processo, sem serviço externo (instalações de um nó só, benchmark e testes)
+SQLALCHEMY_DATABASE_URL = os.environ.get("SQLALCHEMY_DATABASE_URL", "postgresql://user:password@db:5432/survey_db")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),      # leitores não bloqueiam o escritor
+    ("synchronous", "NORMAL"),    # seguro com WAL, sem fsync a cada commit
+    ("foreign_keys", "ON"),
+    ("busy_timeout", "5000"),     # espera o lock de escrita em vez de falhar com "database is locked"
+    ("cache_size", "-65536"),     # 64 MiB
+    ("temp_store", "MEMORY"),
+    ("mmap_size", str(256 * 1024 ** 2)),
+)
+
+def _sqlite_connect(dbapi_connection, connection_record):
+    # o driver sqlite3 abre transações por conta própria e ignora SAVEPOINT;
+    # desligado aqui, quem abre as transações é o SQLAlchemy (evento "begin" abaixo)
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def _sqlite_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+def make_engine(url: str):
+    """Engine for `url`; SQLite connections get WAL, the pragmas above and real transactions."""
+    if make_url(url).get_backend_name() != "sqlite":
+        return create_engine(url)
+    options = {"connect_args": {"check_same_thread": False}}
+    if make_url(url).database in (None, "", ":memory:"):
+        options["poolclass"] = StaticPool  # um único banco em memória, compartilhado pelas threads
+    sqlite_engine = create_engine(url, **options)
+    event.listen(sqlite_engine, "connect", _sqlite_connect)
+    event.listen(sqlite_engine, "begin", _sqlite_begin)
+    return sqlite_engine
+
+def is_sqlite(db: Session) -> bool:
+    """Whether the session is bound to SQLite, for the few queries written differently there."""
+    return db.get_bind().dialect.name == "sqlite"
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -31,18 +75,20 @@ class SurveyInfo(Base):
     __tablename__ = "surveys"
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, nullable=False)
-    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False, index=True)
     producaomes = Column(Float, nullable=False)
     unidproducao = Column(String, nullable=False)
+    # header Idempotency-Key do envio; repetições com a mesma chave não inserem de novo
+    idempotency_key = Column(String, nullable=True, unique=True, index=True)
     
     company = relationship("Company")
     
 class SurveyAnswers(Base):
     __tablename__ = "survey_answers"
     id = Column(Integer, primary_key=True, index=True)
-    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
-    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
-    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False, index=True)
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False, index=True)
     eixo = Column(String, nullable=False)  # Axis the answers belong to
     answer = Column(Text, nullable=False)
 
@@ -50,6 +96,124 @@ class SurveyAnswers(Base):
     question = relationship("Question")
     surveyinfo = relationship("SurveyInfo")
 
+class AnswerCatalogVersion(Base):
+    # ordem das perguntas e indicadores de cada eixo usada nos vetores de respostas
+    __tablename__ = "answer_catalog_versions"
+    version = Column(String, primary_key=True)
+    layout = Column(JSON, nullable=False)  # {eixo: {"questions": [ids], "indicators": [ids]}}
+
+class SurveyAnswerVector(Base):
+    # respostas de um questionário em um eixo, codificadas por answer_codec.py
+    __tablename__ = "survey_answer_vectors"
+    survey_id = Column(Integer, ForeignKey("surveys.id"), primary_key=True)
+    eixo = Column(String, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False, index=True)
+    catalog_version = Column(String, ForeignKey("answer_catalog_versions.version"), nullable=False)
+    codes = Column(LargeBinary, nullable=False)       # um byte por pergunta
+    indicators = Column(LargeBinary, nullable=False)  # float64 little-endian por indicador
+
+class SurveyIndicator(Base):
+    # valor numérico de cada indicador, convertido e validado na inserção
+    __tablename__ = "survey_indicators"
+    __table_args__ = (Index("ix_survey_indicators_indicator_survey", "indicator_id", "survey_id"),)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), primary_key=True)
+    indicator_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False, index=True)
+    value = Column(Float(precision=53), nullable=False)  # double precision
+
+class SurveyMaturity(Base):
+    # nível de maturidade calculado na inserção, por eixo e tema ('' para o eixo inteiro)
+    __tablename__ = "survey_maturity"
+    __table_args__ = (Index("ix_survey_maturity_eixo_tema_nivel", "eixo", "tema", "nivel"),)
+    id = Column(Integer, primary_key=True, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    eixo = Column(String, nullable=False)
+    tema = Column(Text, nullable=False, default="")
+    nivel = Column(Integer, nullable=False)
+
+    surveyinfo = relationship("SurveyInfo")
+
+class SectorIndicatorAggregate(Base):
+    # agregado incremental por setor (atividade/estado) e indicador, mantido a cada questionário
+    __tablename__ = "sector_indicator_aggregates"
+    __table_args__ = (UniqueConstraint("atividade", "estado", "question_id"),)
+    id = Column(Integer, primary_key=True, index=True)
+    atividade = Column(String, nullable=False)
+    estado = Column(String, nullable=False)
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+    buckets = Column(JSON, nullable=False, default=dict)  # histograma logarítmico {bucket: contagem}
+
+    question = relationship("Question")
+
+class SectorMaturityAggregate(Base):
+    # distribuição de níveis de maturidade por setor, eixo e tema ('' para o eixo inteiro)
+    __tablename__ = "sector_maturity_aggregates"
+    __table_args__ = (UniqueConstraint("atividade", "estado", "eixo", "tema"),)
+    id = Column(Integer, primary_key=True, index=True)
+    atividade = Column(String, nullable=False)
+    estado = Column(String, nullable=False)
+    eixo = Column(String, nullable=False)
+    tema = Column(Text, nullable=False, default="")
+    nivel_1 = Column(Integer, nullable=False, default=0)
+    nivel_2 = Column(Integer, nullable=False, default=0)
+    nivel_3 = Column(Integer, nullable=False, default=0)
+    nivel_4 = Column(Integer, nullable=False, default=0)
+    nivel_5 = Column(Integer, nullable=False, default=0)
+
+# JSONB no Postgres permite atualizar rascunhos com `||` sem reescrever o documento no cliente
+# (no SQLite é JSON em texto, e drafts.py faz a mesclagem em Python)
+DraftJSON = JSON().with_variant(JSONB(), "postgresql")
+
+class SurveyDraft(Base):
+    # questionário parcial salvo no servidor, identificado por um token opaco
+    __tablename__ = "survey_drafts"
+    token = Column(String, primary_key=True)
+    meta = Column(DraftJSON, nullable=False, default=dict)     # campos de SurveyMeta
+    answers = Column(DraftJSON, nullable=False, default=dict)  # {question_id: resposta}
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now(), index=True)
+
+class ReportJob(Base):
+    # fila de relatórios: nós web inserem, workers (worker.py) reivindicam com FOR UPDATE SKIP LOCKED
+    __tablename__ = "report_jobs"
+    __table_args__ = (Index("ix_report_jobs_status_run_after", "status", "run_after"),)
+    id = Column(Integer, primary_key=True, index=True)
+    dedup_key = Column(String, nullable=False, index=True)  # hash de meta, seções e eixos
+    meta = Column(DraftJSON, nullable=False)                # campos de SurveyMeta
+    sections = Column(DraftJSON, nullable=True)
+    eixos = Column(DraftJSON, nullable=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, server_default=func.now())
+    locked_by = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    result = Column(String, nullable=True)  # caminho do PDF gerado
+    pdf_bytes = Column(BigInteger, nullable=True)
+    image_count = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+class Artifact(Base):
+    # arquivo gerado, guardado pelo sha256 do conteúdo (artifact_store.py)
+    __tablename__ = "artifacts"
+    digest = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    last_accessed_at = Column(DateTime, nullable=False, server_default=func.now(), index=True)
+
+class ArtifactRef(Base):
+    # chave lógica (por exemplo "report:<empresa>-<questionários>") -> conteúdo
+    __tablename__ = "artifact_refs"
+    ref = Column(String, primary_key=True)
+    digest = Column(String(64), ForeignKey("artifacts.digest", ondelete="CASCADE"), nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
 def get_db():
     db = SessionLocal()
     try:
@@ -1,9 +1,15 @@
 from sqlalchemy.orm import Session
-from models import Survey, SurveyAmbiental, SurveyGovernanca, SurveySocial
-from database import engine, SessionLocal, Base, Question, Company, SurveyInfo, SurveyAnswers
-import pandas as pd
+from models import Survey, SurveyMeta, SurveyAmbiental, SurveyGovernanca, SurveySocial
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from sqlalchemy import exists, inspect, text
+from database import engine, SessionLocal, Base, Question, Company, SurveyInfo, SurveyAnswers, SurveyMaturity
+from answer_codec import WRITE_ROWS, WRITE_VECTORS, backfill_answer_vectors, store_answer_vectors
+from indicators import backfill_survey_indicators, indicator_ids, indicator_values, parse_indicator, store_survey_indicators
+from single_flight import SingleFlight
+from sector_benchmark import lock_company, update_sector_aggregates, load_catalog, survey_answers, survey_contribution
 
 def load_questions_from_csv(csv_path: str, db: Session):
+    import pandas as pd
     df = pd.read_csv(csv_path)
     query = db.query(Question.id, Question.eixo_pergunta, Question.pergunta)
     existing_questions = pd.read_sql(query.statement, db.bind)
@@ -32,49 +38,88 @@ def load_questions_from_csv(csv_path: str, db: Session):
             db.add(question)
             db.commit()
 
-def insert_survey_data(survey_data: Survey, db: Session):
-    
+def insert_survey_data(survey_data: Survey, db: Session, idempotency_key: Optional[str] = None) -> SurveyInfo:
+    return insert_survey_answers(db, survey_data.meta, survey_data.iter_answers(), idempotency_key)
+
+# envios repetidos (mesmo Idempotency-Key ou mesmo rascunho) esperam o primeiro em vez de inserir de novo
+SUBMITS = SingleFlight("submit")
+
+def find_survey_by_idempotency_key(db: Session, idempotency_key: str) -> Optional[SurveyInfo]:
+    return db.query(SurveyInfo).filter_by(idempotency_key=idempotency_key).first()
+
+def insert_once(db: Session, idempotency_key: Optional[str], insert: Callable[[], SurveyInfo]) -> SurveyInfo:
+    """Run `insert` unless a survey with this idempotency key already exists; concurrent repeats wait for the first."""
+    if idempotency_key is None:
+        return insert()
+    result, _ = SUBMITS.do(idempotency_key, lambda: find_survey_by_idempotency_key(db, idempotency_key) or insert())
+    return result
+
+def survey_meta_for(survey_info: SurveyInfo) -> SurveyMeta:
+    """Metadata of a stored survey, in the shape it was submitted."""
+    company = survey_info.company
+    return SurveyMeta(
+        empresa=company.empresa,
+        atividade=company.atividade,
+        estado=company.estado,
+        cidade=company.cidade,
+        producaomes=str(survey_info.producaomes),
+        unidproducao=survey_info.unidproducao,
+        data=survey_info.date.strftime('%d/%m/%Y'),
+    )
+
+def insert_survey_answers(db: Session, meta: SurveyMeta, survey_answers_iter: Iterable[Tuple[str, int, Any]],
+                          idempotency_key: Optional[str] = None) -> SurveyInfo:
+    """Insert a survey from its metadata and (eixo, question_id, answer) tuples.
+
+    Everything, including the company and the idempotency key, is committed in
+    a single transaction at the end.
+
+    Raises:
+        InvalidIndicator: when an indicator or `producaomes` is not a number; nothing is written.
+    """
+    survey_answers_list = list(survey_answers_iter)
+    # valida antes de gravar a empresa e o questionário
+    producaomes = parse_indicator(meta.producaomes)
+    indicadores = indicator_values({question_id: answer for _, question_id, answer in survey_answers_list}, indicator_ids(db))
+
     existing_company = db.query(Company).filter_by(
-        empresa=survey_data.meta.empresa,
-        atividade=survey_data.meta.atividade,
-        estado=survey_data.meta.estado,
-        cidade=survey_data.meta.cidade
+        empresa=meta.empresa,
+        atividade=meta.atividade,
+        estado=meta.estado,
+        cidade=meta.cidade
     ).first()
 
     if not existing_company:
         # Insert company data
         company = Company(
-            empresa=survey_data.meta.empresa,
-            atividade=survey_data.meta.atividade,
-            estado=survey_data.meta.estado,
-            cidade=survey_data.meta.cidade,
+            empresa=meta.empresa,
+            atividade=meta.atividade,
+            estado=meta.estado,
+            cidade=meta.cidade,
         )
         db.add(company)
-        db.commit()
-        db.refresh(company)
+        db.flush()
     else:
         company = existing_company
-        
+    # antes de inserir o questionário: outro questionário da empresa só entra depois do commit deste
+    lock_company(db, company)
+
     survey_info = SurveyInfo(
-        date=survey_data.meta.data,
+        date=meta.data,
         company_id=company.id,
-        producaomes = float(survey_data.meta.producaomes),
-        unidproducao = survey_data.meta.unidproducao
+        producaomes = producaomes,
+        unidproducao = meta.unidproducao,
+        idempotency_key = idempotency_key
     )
-    # Insert survey info
+    # Insert survey info; flush só para obter o id, tudo é gravado no commit do final
     db.add(survey_info)
-    db.commit()
-    db.refresh(survey_info)
+    db.flush()
     
     # Insert survey data
-    for eixo_name, eixo_data in {
-        "ambiental": (survey_data.ambiental, SurveyAmbiental._name_mapping.default),
-        "governanca": (survey_data.governanca, SurveyGovernanca._name_mapping.default),
-        "social": (survey_data.social, SurveySocial._name_mapping.default)
-    }.items():
-        current_data, mapping_data = eixo_data
-        for question, answer in current_data.dict(exclude_none=True).items():
-            question_id = mapping_data[question]
+    answers = {}
+    for eixo_name, question_id, answer in survey_answers_list:
+        answers[question_id] = answer
+        if WRITE_ROWS:
             db.add(
                 SurveyAnswers(
                     company_id=company.id,
@@ -84,12 +129,59 @@ def insert_survey_data(survey_data: Survey, db: Session):
                     answer=answer
                 )
             )
+    if WRITE_VECTORS:
+        store_answer_vectors(db, company.id, survey_info.id, answers)
+    store_survey_indicators(db, company.id, survey_info.id, indicadores)
+    # Update sector aggregates and store maturity levels in the same transaction
+    _, niveis = update_sector_aggregates(db, company, survey_info.id, answers)
+    store_survey_maturity(db, company.id, survey_info.id, niveis)
     db.commit()
+    return survey_info
+
+def store_survey_maturity(db: Session, company_id: int, survey_id: int, niveis: Dict[Tuple[str, str], int]):
+    for (eixo, tema), nivel in niveis.items():
+        db.add(SurveyMaturity(survey_id=survey_id, company_id=company_id, eixo=eixo, tema=tema, nivel=nivel))
+
+def backfill_survey_maturity(db: Session):
+    """Store maturity levels for surveys inserted before `survey_maturity` existed."""
+    catalog = load_catalog(db)
+    missing = db.query(SurveyInfo.id, SurveyInfo.company_id).filter(
+        ~exists().where(SurveyMaturity.survey_id == SurveyInfo.id)
+    ).all()
+    for survey_id, company_id in missing:
+        _, niveis = survey_contribution(survey_answers(db, survey_id), catalog)
+        store_survey_maturity(db, company_id, survey_id, niveis)
+        db.commit()
+
+def create_missing_columns():
+    # create_all does not add new columns to tables that already exist
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def create_missing_indexes():
+    # create_all does not add new indexes to tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 # Usage
 if __name__ == "__main__":
     db = SessionLocal()
     # Create tables
     Base.metadata.create_all(bind=engine)
+    create_missing_columns()
+    create_missing_indexes()
     load_questions_from_csv("questions.csv", db)
+    backfill_survey_maturity(db)
+    if WRITE_VECTORS:
+        backfill_answer_vectors(db)
+    backfill_survey_indicators(db)
     db.close()
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""Rascunhos de questionário salvos no servidor.
+
+Um rascunho guarda `meta` e `answers` ({question_id: resposta}) em JSONB e é
+atualizado com deltas: cada PATCH valida só os campos enviados e faz um único
+`UPDATE ... SET answers = answers || delta`, sem ler nem reescrever o resto
+(no SQLite, a mesclagem é feita em Python, com controle pela versão).
+No envio final o rascunho é promovido a questionário com `insert_survey_answers`.
+"""
+import secrets
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Text, literal, update
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.orm import Session
+
+from database import SurveyDraft, SurveyInfo, is_sqlite
+from db_manager import find_survey_by_idempotency_key, insert_survey_answers, survey_meta_for
+from indicators import InvalidIndicator, parse_indicator
+from models import SurveyAmbiental, SurveyDraftDelta, SurveyGovernanca, SurveyMeta, SurveySocial
+from survey_form import form_schema
+
+EIXOS = {
+    "ambiental": SurveyAmbiental,
+    "governanca": SurveyGovernanca,
+    "social": SurveySocial,
+}
+RESPOSTAS_VALIDAS = {"0", "1", "2"}
+META_FIELDS = set(SurveyMeta.model_fields)
+
+# {eixo: {campo: question_id}} e o inverso {question_id: (eixo, campo)}
+FIELD_IDS: Dict[str, Dict[str, int]] = {eixo: model._name_mapping.default for eixo, model in EIXOS.items()}
+QUESTION_FIELDS: Dict[int, Tuple[str, str]] = {
+    question_id: (eixo, name) for eixo, mapping in FIELD_IDS.items() for name, question_id in mapping.items()
+}
+# indicadores (campos numéricos do formulário) e os que o modelo declara como float
+INDICATOR_IDS = {indicador["id"] for eixo in EIXOS for indicador in form_schema(eixo)["indicadores"]}
+FLOAT_FIELDS = {
+    FIELD_IDS[eixo][name] for eixo, model in EIXOS.items()
+    for name, field in model.model_fields.items() if field.annotation is float
+}
+
+class DraftNotFound(LookupError):
+    pass
+
+class DraftError(ValueError):
+    pass
+
+def create_draft(db: Session, delta: Optional[SurveyDraftDelta] = None) -> SurveyDraft:
+    meta, answers, _ = validate_delta(delta or SurveyDraftDelta())
+    draft = SurveyDraft(token=secrets.token_urlsafe(16), meta=meta, answers=answers, version=1)
+    db.add(draft)
+    db.commit()
+    return draft
+
+def validate_delta(delta: SurveyDraftDelta) -> Tuple[Dict[str, Any], Dict[str, Any], List[str]]:
+    """Check only the fields present in the delta.
+
+    Returns:
+        tuple: (meta changes, {question_id: answer} to set, question_ids to remove), ids as strings.
+    """
+    unknown = set(delta.meta) - META_FIELDS
+    if unknown:
+        raise DraftError(f"Campos de meta desconhecidos: {sorted(unknown)}")
+    meta = dict(delta.meta)
+    set_answers: Dict[str, Any] = {}
+    remove: List[str] = []
+    for eixo, mapping in FIELD_IDS.items():
+        for name, value in getattr(delta, eixo).items():
+            question_id = mapping.get(name)
+            if question_id is None:
+                raise DraftError(f"Campo desconhecido em {eixo}: {name}")
+            if value is None or value == "":
+                remove.append(str(question_id))
+            elif question_id in INDICATOR_IDS:
+                # mesma regra de /submit-survey: vírgula decimal aceita, nan/inf não
+                try:
+                    parse_indicator(value)
+                except InvalidIndicator:
+                    raise DraftError(f"{name}: valor numérico inválido")
+                set_answers[str(question_id)] = str(value)
+            elif str(value) not in RESPOSTAS_VALIDAS:
+                raise DraftError(f"{name}: resposta deve ser 0, 1 ou 2")
+            else:
+                set_answers[str(question_id)] = str(value)
+    return meta, set_answers, remove
+
+def _merge_in_python(db: Session, token: str, meta: Dict[str, Any], set_answers: Dict[str, Any],
+                     remove: List[str]) -> int:
+    # SQLite não tem os operadores de JSONB: lê, mescla e grava só se a versão não mudou no meio
+    while True:
+        draft = db.query(SurveyDraft.meta, SurveyDraft.answers, SurveyDraft.version).filter_by(token=token).first()
+        if draft is None:
+            db.rollback()
+            raise DraftNotFound(token)
+        answers = {k: v for k, v in {**(draft.answers or {}), **set_answers}.items() if k not in remove}
+        updated = db.execute(
+            update(SurveyDraft).where(SurveyDraft.token == token, SurveyDraft.version == draft.version)
+            .values(meta={**(draft.meta or {}), **meta}, answers=answers, version=draft.version + 1)
+        ).rowcount
+        if updated:
+            db.commit()
+            return draft.version + 1
+        db.rollback()
+
+def apply_delta(db: Session, token: str, delta: SurveyDraftDelta) -> int:
+    """Merge a delta into the draft with one UPDATE and return the new version."""
+    meta, set_answers, remove = validate_delta(delta)
+    if is_sqlite(db):
+        return _merge_in_python(db, token, meta, set_answers, remove)
+    answers_expr = SurveyDraft.answers
+    if set_answers:
+        answers_expr = answers_expr.op("||", return_type=JSONB)(literal(set_answers, JSONB))
+    if remove:
+        answers_expr = answers_expr.op("-", return_type=JSONB)(literal(remove, ARRAY(Text)))
+    values = {"answers": answers_expr, "version": SurveyDraft.version + 1}
+    if meta:
+        values["meta"] = SurveyDraft.meta.op("||", return_type=JSONB)(literal(meta, JSONB))
+    version = db.execute(
+        update(SurveyDraft).where(SurveyDraft.token == token).values(**values).returning(SurveyDraft.version)
+    ).scalar()
+    if version is None:
+        db.rollback()
+        raise DraftNotFound(token)
+    db.commit()
+    return version
+
+def get_draft(db: Session, token: str) -> SurveyDraft:
+    draft = db.get(SurveyDraft, token)
+    if draft is None:
+        raise DraftNotFound(token)
+    return draft
+
+def draft_as_survey(draft: SurveyDraft) -> Dict[str, Any]:
+    """Draft in the same shape as the `Survey` payload, to resume it on another device."""
+    survey: Dict[str, Any] = {"token": draft.token, "version": draft.version, "meta": dict(draft.meta or {})}
+    for eixo in EIXOS:
+        survey[eixo] = {}
+    for question_id, answer in (draft.answers or {}).items():
+        eixo, name = QUESTION_FIELDS[int(question_id)]
+        survey[eixo][name] = answer
+    return survey
+
+def promote_draft(db: Session, token: str, meta: Optional[Dict[str, Optional[str]]] = None,
+                  idempotency_key: Optional[str] = None) -> Tuple[SurveyMeta, SurveyInfo]:
+    """Insert the draft as a survey and delete it.
+
+    The answers were validated delta by delta, so only completeness and the
+    metadata are checked here. The survey is stored under the client's
+    `Idempotency-Key` (or `draft:{token}` without one), so a repeated submit, or
+    the client's fallback to `/submit-survey` with the same key, returns the
+    survey inserted the first time.
+    """
+    keys = [key for key in (idempotency_key, f"draft:{token}") if key]
+    for key in keys:
+        existing = find_survey_by_idempotency_key(db, key)
+        if existing is not None:
+            return survey_meta_for(existing), existing
+    draft = db.query(SurveyDraft).filter_by(token=token).with_for_update().first()
+    if draft is None:
+        # outra requisição promoveu o rascunho enquanto esperávamos o lock
+        for key in keys:
+            existing = find_survey_by_idempotency_key(db, key)
+            if existing is not None:
+                return survey_meta_for(existing), existing
+        raise DraftNotFound(token)
+    merged_meta = {**(draft.meta or {}), **{k: v for k, v in (meta or {}).items() if k in META_FIELDS}}
+    try:
+        survey_meta = SurveyMeta(**merged_meta)
+    except ValueError as e:
+        raise DraftError(f"Meta inválido: {e}")
+    answers = {int(question_id): answer for question_id, answer in (draft.answers or {}).items()}
+    missing = [QUESTION_FIELDS[question_id][1] for question_id in sorted(set(QUESTION_FIELDS) - set(answers))]
+    if missing:
+        raise DraftError(f"{len(missing)} campos sem resposta, por exemplo: {missing[:10]}")
+    # o rascunho é apagado no mesmo commit que grava o questionário: o lock vale até o fim da promoção
+    db.query(SurveyDraft).filter_by(token=token).delete()
+    try:
+        survey_info = insert_survey_answers(db, survey_meta, (
+            (QUESTION_FIELDS[question_id][0], question_id,
+             parse_indicator(answer) if question_id in FLOAT_FIELDS else answer)
+            for question_id, answer in sorted(answers.items())
+        ), keys[0])
+    except Exception:
+        db.rollback()
+        raise
+    return survey_meta, survey_info
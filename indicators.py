@@ -0,0 +1,86 @@
+"""Indicadores numéricos validados na inserção e gravados em `survey_indicators`.
+
+Os indicadores chegam como texto (`"12,5"`, `"300"`); aqui eles são
+convertidos uma vez, na inserção, para `double precision`, e as agregações
+(séries temporais, distribuição no setor) rodam direto em SQL numérico, sem
+converter texto em cada consulta. Para preencher a tabela com os
+questionários já gravados:
+
+    python indicators.py
+"""
+import math
+from typing import Any, Dict, Iterable, Set
+
+from sqlalchemy.orm import Session
+
+from database import Question, SessionLocal, SurveyIndicator, SurveyInfo
+
+class InvalidIndicator(ValueError):
+    pass
+
+def parse_indicator(value: Any) -> float:
+    """Numeric value of an indicator answer, accepting a decimal comma.
+
+    Raises:
+        InvalidIndicator: when the value is not a finite number.
+    """
+    if isinstance(value, str):
+        value = value.strip().replace(",", ".")
+    try:
+        valor = float(value)
+    except (TypeError, ValueError):
+        raise InvalidIndicator(f"valor numérico inválido: {value!r}")
+    if not math.isfinite(valor):
+        raise InvalidIndicator(f"valor numérico inválido: {value!r}")
+    return valor
+
+def indicator_ids(db: Session) -> Set[int]:
+    return {question_id for (question_id,) in db.query(Question.id).filter(Question.tipo == "Indicador")}
+
+def indicator_values(answers: Dict[int, Any], ids: Iterable[int]) -> Dict[int, float]:
+    """{indicator_id: value} of a survey; empty answers are skipped, invalid ones raise InvalidIndicator."""
+    values = {}
+    for question_id in ids:
+        answer = answers.get(question_id)
+        if answer is None or (isinstance(answer, str) and not answer.strip()):
+            continue
+        try:
+            values[question_id] = parse_indicator(answer)
+        except InvalidIndicator as e:
+            raise InvalidIndicator(f"indicador {question_id}: {e}")
+    return values
+
+def store_survey_indicators(db: Session, company_id: int, survey_id: int, values: Dict[int, float]):
+    """Add the indicator rows of one survey to the session; the caller commits."""
+    for question_id, valor in sorted(values.items()):
+        db.add(SurveyIndicator(survey_id=survey_id, indicator_id=question_id, company_id=company_id, value=valor))
+
+def backfill_survey_indicators(db: Session) -> int:
+    """Fill `survey_indicators` for surveys inserted before it existed; invalid legacy values are skipped."""
+    # importado aqui: sector_benchmark importa este módulo
+    from sector_benchmark import survey_answers
+    ids = indicator_ids(db)
+    done = {survey_id for (survey_id,) in db.query(SurveyIndicator.survey_id).distinct()}
+    count = 0
+    for survey_id, company_id in db.query(SurveyInfo.id, SurveyInfo.company_id).order_by(SurveyInfo.id):
+        if survey_id in done:
+            continue
+        answers = survey_answers(db, survey_id)
+        values = {}
+        for question_id in ids:
+            try:
+                values.update(indicator_values(answers, [question_id]))
+            except InvalidIndicator:
+                pass
+        if values:
+            store_survey_indicators(db, company_id, survey_id, values)
+            db.commit()
+            count += 1
+    return count
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        print(f"{backfill_survey_indicators(db)} questionários com indicadores gravados")
+    finally:
+        db.close()
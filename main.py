@@ -1,187 +1,162 @@
-from typing import List, Tuple, cast
-import copy
-import pandas as pd
-from fastapi import FastAPI, Depends, Query, HTTPException
+from typing import Dict, List, Optional, Tuple
+import os
+import time
+from fastapi import FastAPI, Body, Depends, Header, Query, HTTPException, Request
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
-import pdfkit
 from contextlib import asynccontextmanager
 
 from database import get_db, Base, engine
-from models import Survey, SurveyMeta, SurveyAmbiental, SurveyGovernanca, SurveySocial, SurveyClass
-from db_manager import insert_survey_data
-from report_main import report_generation
-from report.models import Data, Empresa, Pergunta, Indicador
-from database import Company, Question, SurveyInfo, SurveyAnswers
-from routers import home, survey
+from models import Survey, SurveyMeta
+from db_manager import SUBMITS, insert_once, insert_survey_data
+from metrics import stage_timer, start_request_timing, server_timing_header, REQUEST_SECONDS
+from routers import home, survey, monitoring, analytics, drafts, export, report_jobs, simulator
+from drafts import DraftError, DraftNotFound, promote_draft
+from indicators import InvalidIndicator
+from static_assets import PrecompressedStaticFiles, static_directory, static_url
+from page_cache import PAGE_CACHE
+from streaming import file_response, streaming_html_response
+from artifact_store import ARTIFACTS
 
 import sys
 sys.path.append('/app')
 
+# Workers dedicados a relatórios podem carregar pandas/pdfkit/report já na inicialização
+PRELOAD_REPORTS = os.environ.get("PRELOAD_REPORTS", "0") == "1"
+
+def load_report_service():
+    """Import the reporting stack on first use."""
+    import report_service
+    return report_service
+
 # Create tables on app startup using lifespan
 @asynccontextmanager
 async def lifespan_context(app: FastAPI):
     Base.metadata.create_all(bind=engine)
+    PAGE_CACHE.warm()
+    if PRELOAD_REPORTS:
+        load_report_service()
     yield
     # Add any cleanup code here if needed
 
 app = FastAPI(lifespan=lifespan_context)
 
-# Serve static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Serve static files (fingerprinted and precompressed after `python static_assets.py`)
+app.mount("/static", PrecompressedStaticFiles(directory=static_directory()), name="static")
 
 # Template directory
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_url
 
 # Include Routers
 app.include_router(home.router)
 app.include_router(survey.router)
-
-def get_all_surveys(metadata: SurveyMeta, db: Session) -> Tuple[List[Survey], pd.DataFrame]:
-    existing_company = db.query(Company).filter_by(
-        empresa=metadata.empresa,
-        atividade=metadata.atividade,
-        estado=metadata.estado,
-        cidade=metadata.cidade,
-    ).first()
-
-    if existing_company is None:
-        return [], pd.DataFrame()
-
-    questions = db.query(Question).all()
-    questions_df = pd.DataFrame([s.__dict__ for s in questions])
-    questions_df = questions_df.drop(columns=['_sa_instance_state'])
-
-    survey_data = db.query(SurveyInfo).filter_by(company_id=existing_company.id).all()
-    survey_df = pd.DataFrame([s.__dict__ for s in survey_data])
-    survey_df = survey_df.drop(columns=['_sa_instance_state'])
-
-    survey_answer_data = db.query(SurveyAnswers).filter_by(company_id=int(existing_company.id)).all()
-    survey_answer_df = pd.DataFrame([s.__dict__ for s in survey_answer_data])
-    survey_answer_df = survey_answer_df.drop(columns=['_sa_instance_state'])
-
-    df_amb_names = pd.DataFrame({k:[v] for k,v in SurveyAmbiental._name_mapping.default.items()}).T.reset_index()
-    df_amb_names.columns = ['varname', 'question_id']
-
-    df_soc_names = pd.DataFrame({k:[v] for k,v in SurveySocial._name_mapping.default.items()}).T.reset_index()
-    df_soc_names.columns = ['varname', 'question_id']
-
-    df_gov_names = pd.DataFrame({k:[v] for k,v in SurveyGovernanca._name_mapping.default.items()}).T.reset_index()
-    df_gov_names.columns = ['varname', 'question_id']
-
-    survey_list = []
-    for survey_uni_id in  survey_answer_df.survey_id.unique():
-        survey_df_date = survey_df[survey_df.id == survey_uni_id]
-        survey_answer_df_date = survey_answer_df[survey_answer_df.survey_id == survey_uni_id]
-        survey_answer_governanca_df = survey_answer_df_date[survey_answer_df_date.eixo=='governanca'][['question_id', 'answer']]
-        survey_answer_governanca_df = survey_answer_governanca_df.merge(df_gov_names, on='question_id', how='left')[['varname', 'answer']]
-        survey_answer_ambiental_df = survey_answer_df_date[survey_answer_df_date.eixo=='ambiental'][['question_id', 'answer']]
-        survey_answer_ambiental_df = survey_answer_ambiental_df.merge(df_amb_names, on='question_id', how='left')[['varname', 'answer']]
-        survey_answer_social_df = survey_answer_df_date[survey_answer_df_date.eixo=='social'][['question_id', 'answer']]
-        survey_answer_social_df = survey_answer_social_df.merge(df_soc_names, on='question_id', how='left')[['varname', 'answer']]
-        
-        social_dict = {}
-        for x in survey_answer_social_df.to_dict('records'):
-            social_dict[x['varname']] = x['answer']
-            
-        governance_dict = {}
-        for x in survey_answer_governanca_df.to_dict('records'):
-            governance_dict[x['varname']] = x['answer']
-            
-        ambiental_dict = {}
-        for x in survey_answer_ambiental_df.to_dict('records'):
-            ambiental_dict[x['varname']] = x['answer']
-            
-        survey_dict = {
-            'meta': {
-                'empresa': existing_company.empresa,
-                'atividade': existing_company.atividade,
-                'estado': existing_company.estado,
-                'cidade': existing_company.cidade,
-                'producaomes': str(survey_df_date.producaomes.iloc[0]),
-                'unidproducao': survey_df_date.unidproducao.iloc[0],
-                'data': survey_df_date.date.iloc[0].strftime('%d/%m/%Y')
-            },
-            'social': social_dict,
-            'governanca': governance_dict,
-            'ambiental': ambiental_dict
-        }
-        survey_list.append(Survey(**survey_dict))
-    return survey_list, questions_df
-
-def build_single_data_from_survey(survey: Survey, questio_df: pd.DataFrame) -> Data:
-    perguntas = []
-    indicadores = []
-    pergunta_df = questio_df[questio_df.tipo == 'Pergunta']
-    indicador_df = questio_df[questio_df.tipo == 'Indicador']
-    for eixo, survey_eixo_now in [
-            ('social', survey.social),
-            ('governanca', survey.governanca),
-            ('ambiental', survey.ambiental)
-        ]:
-        survey_eixo_now = cast(SurveyClass, survey_eixo_now)
-        pergunta_df_eixo = pergunta_df[pergunta_df.eixo_pergunta == eixo]
-        indicador_df_eixo = indicador_df[indicador_df.eixo_pergunta == eixo]
-        for _, pergunta_now in pergunta_df_eixo.iterrows():
-            perguntas.append(Pergunta(
-                nivel=int(pergunta_now.nivel),
-                name=str(pergunta_now.pergunta),
-                resposta=str(survey_eixo_now.get_by_id(pergunta_now.id)),
-                eixo=str(eixo.capitalize()),
-                tema=str(pergunta_now.tema),
-                criterio=str(pergunta_now.criterio)
-            ))
-        for _, indicador_now in indicador_df_eixo.iterrows():
-            valor = survey_eixo_now.get_by_id(indicador_now.id)
-            indicadores.append(Indicador(
-                eixo=str(eixo.capitalize()),
-                item=str(indicador_now.pergunta),
-                valor=float(valor) if valor is not None else 0.0  # Tratando o caso de valor None
-            ))
-    data = Data(
-        empresa=Empresa(
-            nome_empresa=survey.meta.empresa,
-            producaomes=survey.meta.producaomes,
-            unidproducao=survey.meta.unidproducao,
-            data=survey.meta.data.strftime('%d/%m/%Y'),
-            localizacao=f'{survey.meta.cidade} - {survey.meta.estado}'
-        ),
-        perguntas=perguntas,
-        indicadores=indicadores
-    )
-    return data
-
-def report_generation_wrapper(list_of_survey: List[Survey], questio_df: pd.DataFrame) -> str:
-    list_of_data = []
-    for survey in list_of_survey:
-        data = build_single_data_from_survey(survey, questio_df)
-        list_of_data.append(data)
-    report_html = report_generation(list_of_data)
-
-    pdf_path = "report.pdf"
-    pdfkit.from_string(report_html, pdf_path)
-    
-    return pdf_path  # Retornando o caminho do arquivo PDF gerado  
-
+app.include_router(monitoring.router)
+app.include_router(analytics.router)
+app.include_router(drafts.router)
+app.include_router(export.router)
+app.include_router(report_jobs.router)
+app.include_router(simulator.router)
+
+def report_response(pdf_path: str, timings: List[Tuple[str, float]], endpoint: str, start: float,
+                    request: Optional[Request] = None, tier: Optional[str] = None) -> Response:
+    elapsed = time.perf_counter() - start
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+    headers = {"Server-Timing": server_timing_header(timings + [('total', elapsed)])}
+    if tier is not None:
+        headers["X-Report-Tier"] = tier
+    return file_response(request, pdf_path, "report.pdf", "application/pdf", headers,
+                         accel_redirect=ARTIFACTS.accel_redirect(pdf_path))
+
+# rotas síncronas: o FastAPI as executa em threadpool, e a espera do single-flight
+# (ou do advisory lock de outro worker) não bloqueia o event loop
 @app.get("/report-generation")
-async def generate_report(metadata: SurveyMeta, db: Session = Depends(get_db)):
-    list_of_survey_data, questio_df = get_all_surveys(metadata, db)
-    if len(list_of_survey_data) == 0:
+def generate_report(request: Request, metadata: SurveyMeta, sections: Optional[List[str]] = Query(None),
+                    eixos: Optional[List[str]] = Query(None), budget: Optional[float] = Query(None, gt=0),
+                    db: Session = Depends(get_db)):
+    """PDF report; `sections` and `eixos` (repeatable) restrict it to part of the document.
+
+    `budget` (seconds, default `REPORT_TIME_BUDGET_SECONDS`) trades chart quality for
+    rendering time; the tier used comes back in `X-Report-Tier`.
+    """
+    start = time.perf_counter()
+    timings = start_request_timing()
+    return survey_report_response(metadata, db, timings, "report-generation", start, sections, eixos, request, budget)
+
+@app.get("/report-html")
+def report_html(request: Request, metadata: SurveyMeta = Depends(), sections: Optional[List[str]] = Query(None),
+                eixos: Optional[List[str]] = Query(None), db: Session = Depends(get_db)):
+    """HTML report streamed section by section (gzip when accepted), instead of a PDF built all at once."""
+    reports = load_report_service()
+    try:
+        chunks = reports.iter_company_report_html(metadata, db, sections, eixos)
+    except reports.UnknownSection as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if chunks is None:
+        return {"message": "No survey data found"}
+    return streaming_html_response(request, chunks)
+
+@app.get("/report-data")
+def get_report_data(metadata: SurveyMeta = Depends(), db: Session = Depends(get_db)):
+    """Report contents as JSON for the charts drawn in the browser (report.html); the PDF stays in /report-generation."""
+    start = time.perf_counter()
+    timings = start_request_timing()
+    reports = load_report_service()
+    data = reports.company_report_data(metadata, db)
+    if data is None:
+        return JSONResponse({"message": "No survey data found"}, status_code=404)
+    elapsed = time.perf_counter() - start
+    REQUEST_SECONDS.observe(elapsed, endpoint="report-data")
+    return JSONResponse(data, headers={
+        "Cache-Control": "private, no-cache",
+        "Server-Timing": server_timing_header(timings + [('total', elapsed)]),
+    })
+
+def survey_report_response(meta: SurveyMeta, db: Session, timings: List[Tuple[str, float]], endpoint: str, start: float,
+                           sections: Optional[List[str]] = None, eixos: Optional[List[str]] = None,
+                           request: Optional[Request] = None, budget: Optional[float] = None):
+    reports = load_report_service()
+    try:
+        pdf_path, tier = reports.generate_report_tiered(
+            meta, db, sections, eixos, budget if budget is not None else reports.REPORT_TIME_BUDGET)
+    except reports.UnknownSection as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if pdf_path is None:
         return {"message": "No survey data found"}
-    pdf_path = report_generation_wrapper(list_of_survey_data, questio_df)
-    return FileResponse(path=pdf_path, filename="report.pdf", media_type="application/pdf")
+    return report_response(pdf_path, timings, endpoint, start, request, tier)
 
 @app.post("/submit-survey")
-async def submit_survey(survey_data: Survey, db: Session = Depends(get_db)):
+def submit_survey(survey_data: Survey, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+                  db: Session = Depends(get_db)):
+    start = time.perf_counter()
+    timings = start_request_timing()
+    try:
+        with stage_timer('insert_survey_data'):
+            insert_once(db, idempotency_key, lambda: insert_survey_data(survey_data, db, idempotency_key))
+        return survey_report_response(survey_data.meta, db, timings, "submit-survey", start)
+    except InvalidIndicator as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+
+@app.post("/drafts/{token}/submit")
+def submit_draft(token: str, meta: Optional[Dict[str, Optional[str]]] = Body(None),
+                 idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"), db: Session = Depends(get_db)):
+    start = time.perf_counter()
+    timings = start_request_timing()
     try:
-        insert_survey_data(survey_data, db)
-        list_of_survey_data, question_df = get_all_surveys(survey_data.meta, db)
-        if len(list_of_survey_data) == 0:
-            return {"message": "No survey data found"}
-        pdf_path = report_generation_wrapper(list_of_survey_data, question_df)
-        return FileResponse(path=pdf_path, filename="report.pdf", media_type="application/pdf")
+        with stage_timer('insert_survey_data'):
+            # promote_draft grava o questionário com a chave do cliente (ou a do token), a mesma que
+            # o fallback para /submit-survey envia, então o questionário nunca é inserido duas vezes
+            (survey_meta, _), _ = SUBMITS.do(f"draft:{token}", lambda: promote_draft(db, token, meta, idempotency_key))
+        return survey_report_response(survey_meta, db, timings, "submit-draft", start)
+    except DraftNotFound:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    except (DraftError, InvalidIndicator) as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -0,0 +1,195 @@
+"""Instrumentação leve do pipeline de relatórios.
+
+Métricas em memória (por processo) expostas no formato texto do Prometheus em
+`/metrics`, e tempos por etapa da requisição atual para o header `Server-Timing`.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(label_names, label_values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}')
+        return lines
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # por combinação de labels: [contagem por bucket..., soma, contagem]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def mean(self, **labels) -> Optional[float]:
+        """Mean of the observed values, or None if nothing was observed."""
+        state = self._values.get(self._key(labels))
+        if not state or not state[-1]:
+            return None
+        return state[-2] / state[-1]
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_format_labels(self.label_names, key, ("le", _format_value(bound)))} {cumulative}')
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, key, ("le", "+Inf"))} {state[-1]}')
+                lines.append(f'{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(state[-2])}')
+                lines.append(f'{self.name}_count{_format_labels(self.label_names, key)} {state[-1]}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'esg_report_stage_seconds', 'Tempo gasto em cada etapa do pipeline de relatórios.', ['stage']))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'esg_report_request_seconds', 'Latência total das requisições de relatório.', ['endpoint']))
+CHART_SECONDS = REGISTRY.register(Histogram(
+    'esg_chart_render_seconds', 'Tempo de renderização de cada gráfico.', ['kind', 'backend']))
+CHARTS_RENDERED = REGISTRY.register(Counter(
+    'esg_charts_rendered_total', 'Quantidade de gráficos renderizados.', ['kind', 'backend']))
+HTML_BYTES = REGISTRY.register(Histogram(
+    'esg_report_html_bytes', 'Tamanho do HTML gerado para o relatório.', buckets=BYTES_BUCKETS))
+PDF_BYTES = REGISTRY.register(Histogram(
+    'esg_report_pdf_bytes', 'Tamanho do PDF gerado para o relatório.', buckets=BYTES_BUCKETS))
+CACHE_HITS = REGISTRY.register(Counter(
+    'esg_cache_hits_total', 'Acertos de cache.', ['cache']))
+CACHE_MISSES = REGISTRY.register(Counter(
+    'esg_cache_misses_total', 'Faltas de cache.', ['cache']))
+SINGLE_FLIGHT_SHARED = REGISTRY.register(Counter(
+    'esg_single_flight_shared_total', 'Chamadas que reaproveitaram uma execução em andamento.', ['flight']))
+REPORT_IMAGES = REGISTRY.register(Histogram(
+    'esg_report_images', 'Quantidade de imagens em cada relatório gerado.', buckets=(0, 5, 10, 20, 50, 100, 200)))
+REPORT_IMAGE_BYTES = REGISTRY.register(Histogram(
+    'esg_report_image_bytes', 'Tamanho das imagens de cada relatório, depois do orçamento.', buckets=BYTES_BUCKETS))
+IMAGES_DOWNSCALED = REGISTRY.register(Counter(
+    'esg_report_images_downscaled_total', 'Imagens reduzidas para caber no orçamento do relatório.'))
+REPORT_TIERS = REGISTRY.register(Counter(
+    'esg_report_tiers_total', 'Relatórios gerados por tier de renderização (o mais barato usado).', ['tier']))
+TIER_FALLBACKS = REGISTRY.register(Counter(
+    'esg_report_tier_fallbacks_total', 'Trocas para um tier mais barato no meio de um relatório, pelo tier de destino.', ['tier']))
+REPORT_JOBS = REGISTRY.register(Counter(
+    'esg_report_jobs_total', 'Trabalhos da fila de relatórios por transição (queued, done, retried, failed).', ['status']))
+
+# tempos (etapa, segundos) da requisição atual, usados no header Server-Timing
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_timings', default=None)
+
+def start_request_timing() -> List[Tuple[str, float]]:
+    """Start collecting stage timings for the current request and return the collector."""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time a block as a pipeline stage.
+
+    The duration goes to the `esg_report_stage_seconds` histogram and, when a
+    request collector is active, to the `Server-Timing` header of the response.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+@contextmanager
+def chart_timer(kind: str, backend: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        CHART_SECONDS.observe(time.perf_counter() - start, kind=kind, backend=backend)
+        CHARTS_RENDERED.inc(kind=kind, backend=backend)
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Format stage timings as a `Server-Timing` header value (durations in ms)."""
+    totals: Dict[str, float] = {}
+    for stage, elapsed in timings:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    return ', '.join(f'{stage};dur={elapsed * 1000:.1f}' for stage, elapsed in totals.items())
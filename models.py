@@ -1,5 +1,5 @@
-from pydantic import BaseModel, field_validator
-from typing import Optional
+from pydantic import BaseModel, field_serializer, field_validator
+from typing import Any, Iterator, Optional, Tuple, Union
 from datetime import datetime
 from typing import Dict
 
@@ -25,6 +25,11 @@ class SurveyMeta(BaseModel):
         except ValueError:
             raise ValueError("Invalid date format")
 
+    @field_serializer("data")
+    def serialize_data(self, value: datetime) -> str:
+        # mesmo formato aceito pelo validador, para o meta guardado em JSON (report_jobs) voltar a ser um SurveyMeta
+        return value.strftime("%d/%m/%Y")
+
 class SurveyClass(BaseModel):
     _name_mapping: Dict[str, int] = {"teste": 1}
     
@@ -511,3 +516,20 @@ class Survey(BaseModel):
     ambiental: SurveyAmbiental
     governanca: SurveyGovernanca
     social: SurveySocial
+
+    def iter_answers(self) -> Iterator[Tuple[str, int, Any]]:
+        """Yield (eixo, question_id, answer) for every answered field."""
+        for eixo_name, (current_data, mapping_data) in {
+            "ambiental": (self.ambiental, SurveyAmbiental._name_mapping.default),
+            "governanca": (self.governanca, SurveyGovernanca._name_mapping.default),
+            "social": (self.social, SurveySocial._name_mapping.default)
+        }.items():
+            for question, answer in current_data.dict(exclude_none=True).items():
+                yield eixo_name, mapping_data[question], answer
+
+class SurveyDraftDelta(BaseModel):
+    """Changed fields of a draft; a None value removes the field."""
+    meta: Dict[str, Optional[str]] = {}
+    ambiental: Dict[str, Optional[Union[str, float]]] = {}
+    governanca: Dict[str, Optional[Union[str, float]]] = {}
+    social: Dict[str, Optional[Union[str, float]]] = {}
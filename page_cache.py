@@ -0,0 +1,126 @@
+"""Páginas HTML renderizadas uma vez e servidas como bytes pré-comprimidos.
+
+Os templates de `templates/` não dependem da requisição (no máximo de um
+contexto fixo, como o pilar do formulário), então cada página é renderizada na
+inicialização, comprimida e servida com ETag; requisições com `If-None-Match`
+recebem 304. A página é renderizada de novo quando muda o template, um template
+que ele inclui, estende ou importa, ou um arquivo de dados declarado com
+`watch` (por exemplo, `survey_form.csv`).
+"""
+import gzip
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.templating import Jinja2Templates
+from jinja2 import meta
+
+from static_assets import ENCODINGS, HAS_BROTLI, accepted_encodings, static_url
+
+if HAS_BROTLI:
+    import brotli
+
+TEMPLATES_DIR = "templates"
+CACHE_CONTROL = "no-cache"
+
+@dataclass
+class CachedPage:
+    files: Tuple[str, ...]  # template e dependências (templates e arquivos de dados)
+    mtimes: Tuple[Optional[float], ...]
+    etag: str
+    bodies: Dict[Optional[str], bytes]
+
+def _mtimes(files: Tuple[str, ...]) -> Tuple[Optional[float], ...]:
+    mtimes = []
+    for path in files:
+        try:
+            mtimes.append(os.stat(path).st_mtime)
+        except FileNotFoundError:
+            mtimes.append(None)  # dependência removida: também muda a assinatura
+    return tuple(mtimes)
+
+class PageCache:
+    """Rendered templates keyed by name and context, re-rendered when the template or one of its dependencies changes."""
+    def __init__(self, directory: str = TEMPLATES_DIR):
+        self.directory = directory
+        self.templates = Jinja2Templates(directory=directory)
+        self.templates.env.globals["static_url"] = static_url
+        self._pages: Dict[Tuple, CachedPage] = {}
+        self._contexts: Dict[str, List[Dict[str, str]]] = {}
+        self._data_files: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, **context: str):
+        """Declare a template rendered with a fixed context (e.g. `pilar`), so `warm` renders it too."""
+        self._contexts.setdefault(name, []).append(context)
+
+    def watch(self, name: str, *paths: str):
+        """Declare data files the template reads (through globals), so changing them re-renders it."""
+        self._data_files.setdefault(name, []).extend(paths)
+
+    def _templates(self, name: str, seen: Set[str]):
+        # o template e os que ele inclui, estende ou importa, com nome literal
+        if name in seen:
+            return
+        seen.add(name)
+        source, _, _ = self.templates.env.loader.get_source(self.templates.env, name)
+        for referenced in meta.find_referenced_templates(self.templates.env.parse(source)):
+            if referenced is not None:
+                self._templates(referenced, seen)
+
+    def _files(self, name: str) -> Tuple[str, ...]:
+        names: Set[str] = set()
+        self._templates(name, names)
+        files = {os.path.join(self.directory, template) for template in names}
+        files.update(path for template in names for path in self._data_files.get(template, []))
+        return tuple(sorted(files))
+
+    def _render(self, name: str, context: Dict[str, str]) -> CachedPage:
+        # assinatura antes de renderizar: uma mudança durante a renderização gera outra na próxima requisição
+        files = self._files(name)
+        mtimes = _mtimes(files)
+        body = self.templates.get_template(name).render(**context).encode("utf-8")
+        bodies = {None: body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if HAS_BROTLI:
+            bodies["br"] = brotli.compress(body, quality=11)
+        # ETag fraco: as versões comprimidas são equivalentes à original
+        etag = 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return CachedPage(files=files, mtimes=mtimes, etag=etag, bodies=bodies)
+
+    def _stale(self, page: Optional[CachedPage]) -> bool:
+        return page is None or _mtimes(page.files) != page.mtimes
+
+    def get(self, name: str, **context: str) -> CachedPage:
+        key = (name, tuple(sorted(context.items())))
+        page = self._pages.get(key)
+        if self._stale(page):
+            with self._lock:
+                page = self._pages.get(key)
+                if self._stale(page):
+                    page = self._render(name, context)
+                    self._pages[key] = page
+        return page
+
+    def warm(self):
+        """Render every `.html` template, with each registered context, ahead of the first request."""
+        for name in self.templates.env.list_templates():
+            if name.endswith(".html"):
+                for context in self._contexts.get(name, [{}]):
+                    self.get(name, **context)
+
+    def response(self, request: Request, name: str, **context: str) -> Response:
+        page = self.get(name, **context)
+        headers = {"ETag": page.etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if page.etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        accepted = accepted_encodings(request.headers)
+        encoding = next((e for e, _ in ENCODINGS if e in accepted and e in page.bodies), None)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(content=page.bodies[encoding], media_type="text/html", headers=headers)
+
+PAGE_CACHE = PageCache()
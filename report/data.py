@@ -0,0 +1,94 @@
+"""Dados do relatório em JSON, para os gráficos serem desenhados no navegador.
+
+Mesmo cálculo do relatório em PDF (níveis por eixo e tema, recomendações,
+indicadores e séries temporais), sem gerar nenhuma imagem. As séries são
+colunares e alinhadas a um único eixo de datas (`series.datas`), um valor por
+questionário, com `null` quando o item não existe naquele questionário.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import report.models as models
+
+def _maturidade(nivel_aspecto: models.EixoMaturidade) -> Dict[str, Any]:
+    return {
+        'eixo': nivel_aspecto.eixo,
+        'nivel': nivel_aspecto.nivel,
+        'titulo': nivel_aspecto.maturidade.titulo,
+        'descricao': nivel_aspecto.maturidade.descricao,
+        'color': nivel_aspecto.maturidade.color,
+    }
+
+def _serie(por_questionario: List[Dict[str, Any]], chave) -> List[Optional[Any]]:
+    return [valores.get(chave) for valores in por_questionario]
+
+def report_data(datas: List[models.Data], benchmark: Optional[dict] = None) -> Dict[str, Any]:
+    """Everything the report shows, as plain JSON-serialisable data.
+
+    Args:
+        datas (list): Surveys of one company, oldest first; the last one is the current report.
+        benchmark (dict): Sector benchmark, as returned by `get_sector_benchmark`.
+    """
+    eixos_por_questionario: List[Dict[str, int]] = []
+    temas_por_questionario: List[Dict[tuple, int]] = []
+    indicadores_por_questionario: List[Dict[tuple, float]] = []
+    for dataobj in datas:
+        niveis_aspectos = dataobj.get_aspecto_per_eixo()
+        temas_df = dataobj.get_aspecto_per_eixo_and_tema()
+        eixos_por_questionario.append({n.eixo: n.nivel for n in niveis_aspectos})
+        temas_por_questionario.append({
+            (eixo, tema): int(nivel) for eixo, tema, nivel in zip(temas_df.eixo, temas_df.tema, temas_df.nivel)
+        })
+        indicadores_por_questionario.append({(i.eixo, i.item): i.valor for i in dataobj.indicadores})
+
+    # último relatório: os níveis já calculados acima, com descrição e recomendações
+    atual = datas[-1]
+    niveis_atuais = [models.EixoMaturidade.from_dict({'eixo': eixo, 'nivel': nivel})
+                     for eixo, nivel in eixos_por_questionario[-1].items()]
+    aspecto_final = niveis_atuais[int(np.argmin([n.nivel for n in niveis_atuais]))]  # menor nível
+
+    eixos = list(dict.fromkeys(eixo for niveis in eixos_por_questionario for eixo in niveis))
+    temas = list(dict.fromkeys(chave for niveis in temas_por_questionario for chave in niveis))
+    itens = list(dict.fromkeys(chave for valores in indicadores_por_questionario for chave in valores))
+
+    series_temas: Dict[str, Dict[str, list]] = {}
+    for eixo, tema in temas:
+        series_temas.setdefault(eixo, {})[tema] = _serie(temas_por_questionario, (eixo, tema))
+    series_indicadores: Dict[str, Dict[str, list]] = {}
+    for eixo, item in itens:
+        series_indicadores.setdefault(eixo, {})[item] = _serie(indicadores_por_questionario, (eixo, item))
+
+    producao = []
+    for dataobj in datas:
+        try:
+            producao.append(float(dataobj.empresa.producaomes))
+        except (TypeError, ValueError):
+            producao.append(None)
+
+    return {
+        'empresa': {
+            'nome_empresa': atual.empresa.nome_empresa,
+            'data': atual.empresa.data,
+            'localizacao': atual.empresa.localizacao,
+            'producaomes': atual.empresa.producaomes,
+            'unidproducao': atual.empresa.unidproducao,
+        },
+        'maturidade': [_maturidade(n) for n in niveis_atuais],
+        'temas': [{'eixo': eixo, 'tema': tema, 'nivel': nivel}
+                  for (eixo, tema), nivel in temas_por_questionario[-1].items()],
+        'recomendacoes': {n.eixo: n.recomendacoes.recomendacoes for n in niveis_atuais},
+        'maturidade_final': {
+            **_maturidade(aspecto_final),
+            'recomendacoes': models.RecommendationLevel.get_all_lvl_description(aspecto_final.nivel),
+        },
+        'indicadores': [{'eixo': i.eixo, 'item': i.item, 'valor': i.valor} for i in atual.indicadores],
+        'series': {
+            'datas': [dataobj.empresa.data for dataobj in datas],
+            'maturidade': {eixo: _serie(eixos_por_questionario, eixo) for eixo in eixos},
+            'temas': series_temas,
+            'indicadores': series_indicadores,
+            'producao': producao,
+        },
+        'benchmark': benchmark,
+    }
@@ -0,0 +1,87 @@
+"""Pool de figuras matplotlib reutilizáveis, sem o estado global do pyplot.
+
+Cada tipo de gráfico (barras, spider polar, série temporal) tem as suas
+figuras Agg, criadas na primeira vez e depois reutilizadas; uma figura é usada
+por uma thread de cada vez e, ao ser devolvida, os eixos são limpos para o
+próximo gráfico.
+"""
+import queue
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Dict, Iterator, Tuple
+
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from report.generate_html import FIGSIZE
+from report.images import IMAGE_DPI, image_tag, svg_tag, vector_charts_enabled
+
+POOL_SIZE = 4
+SUBPLOT_PARAMS = ('left', 'bottom', 'right', 'top', 'wspace', 'hspace')
+
+class FigurePool:
+    """Reusable (Figure, Axes) pairs of one chart type."""
+    def __init__(self, polar: bool = False, figsize: Tuple[float, float] = FIGSIZE, maxsize: int = POOL_SIZE):
+        """
+        Args:
+            polar (bool): Whether the axes use a polar projection (spider charts).
+            figsize (tuple): Figure size in inches.
+            maxsize (int): Maximum number of idle figures kept for reuse.
+        """
+        self.polar = polar
+        self.figsize = figsize
+        self._idle: "queue.LifoQueue[Tuple[Figure, Axes]]" = queue.LifoQueue(maxsize=maxsize)
+        self._subplotpars: Dict[str, float] = {}
+
+    def _new_figure(self) -> Tuple[Figure, Axes]:
+        fig = Figure(figsize=self.figsize)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(projection='polar' if self.polar else None)
+        if not self._subplotpars:
+            self._subplotpars = {key: getattr(fig.subplotpars, key) for key in SUBPLOT_PARAMS}
+        return fig, ax
+
+    def _reset(self, fig: Figure, ax: Axes):
+        ax.clear()
+        # autofmt_xdate altera os parâmetros da figura, não só os eixos
+        fig.subplots_adjust(**self._subplotpars)
+
+    @contextmanager
+    def figure(self) -> Iterator[Tuple[Figure, Axes]]:
+        try:
+            fig, ax = self._idle.get_nowait()
+        except queue.Empty:
+            fig, ax = self._new_figure()
+        try:
+            yield fig, ax
+        finally:
+            self._reset(fig, ax)
+            try:
+                self._idle.put_nowait((fig, ax))
+            except queue.Full:
+                pass
+
+POOLS: Dict[str, FigurePool] = {
+    'bar': FigurePool(),
+    'spider': FigurePool(polar=True),
+    'timeseries': FigurePool(),
+}
+
+def figure(kind: str):
+    """Borrow a cleared figure of the given chart type: `with figure('bar') as (fig, ax): ...`."""
+    return POOLS[kind].figure()
+
+def figure_to_png(fig: Figure) -> bytes:
+    """Render the figure to PNG with the Agg canvas at `REPORT_IMAGE_DPI`."""
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=IMAGE_DPI)
+    return buffer.getvalue()
+
+def figure_tag(fig: Figure) -> str:
+    """`<img>` with the figure, as SVG inside `vector_charts()` and as a raster image otherwise."""
+    if vector_charts_enabled():
+        buffer = BytesIO()
+        fig.savefig(buffer, format='svg', bbox_inches='tight')
+        return svg_tag(buffer.getvalue())
+    return image_tag(figure_to_png(fig))
@@ -1,13 +1,12 @@
-import matplotlib.pyplot as plt
 import base64
-from io import BytesIO
+from importlib.util import find_spec
 import numpy as np
 from textwrap import wrap
-try:
-    import plotly.graph_objects as go
-    HAS_PLOTLY = True
-except ImportError:
-    HAS_PLOTLY = False
+from metrics import chart_timer
+from report.images import BASE_DPI, IMAGE_DPI, image_tag, vector_charts_enabled
+# matplotlib e plotly são importados dentro das funções de gráfico, só quando usados
+HAS_PLOTLY = find_spec('plotly') is not None
+if not HAS_PLOTLY:
     print('Instalar plotly: pip install plotly, para usar as funções de gráficos interativos e kaleido: pip install -U kaleido==0.1.0.post1, para graficos estáticos.')
 
 WRAPSIZE_BARPLOT = 48
@@ -162,6 +161,7 @@ def create_spider_chart(categories, values, title, center=False, static=True):
     Returns:
         str: An HTML div containing the spider chart.
     """
+    import plotly.graph_objects as go
     # Ensure the loop is closed
     categories += categories[:1]
     values += values[:1]
@@ -186,9 +186,8 @@ def create_spider_chart(categories, values, title, center=False, static=True):
     )
     
     if static:
-        img_bytes = fig.to_image(format='png', width=FIGSIZE[0]*100, height=FIGSIZE[1]*100, scale=1)
-        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-        img_html = f'<img src="data:image/png;base64,{img_base64}" alt="{title}">'
+        img_bytes = fig.to_image(format='png', width=FIGSIZE[0]*100, height=FIGSIZE[1]*100, scale=IMAGE_DPI / BASE_DPI)
+        img_html = image_tag(img_bytes, alt=title)
     else:
         img_html = fig.to_html(full_html=False)
     
@@ -207,6 +206,7 @@ def create_spider_chart_matplot(categories, values, title, center=False):
     Returns:
         str: An HTML img tag with the spider chart embedded as base64.
     """
+    from report.figure_pool import figure, figure_tag
     # Number of variables
     N = len(categories)
 
@@ -216,29 +216,23 @@ def create_spider_chart_matplot(categories, values, title, center=False):
     angles += angles[:1]
 
     # Set up the radar chart
-    fig, ax = plt.subplots(figsize=FIGSIZE, subplot_kw=dict(polar=True))
-    ax.set_title(title)
-    
-    # Draw the outline of the spider chart
-    ax.plot(angles, values, 'o-', linewidth=2)
-    ax.fill(angles, values, alpha=0.25)
-
-    # Add the category labels
-    ax.set_thetagrids(np.degrees(angles[:-1]), categories)
-
-    # Set the range of radial axis
-    ax.set_rlabel_position(30)
-    ax.grid(True)
-
-    # Save the figure to a buffer
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight')
-    plt.close(fig)
-    buffer.seek(0)
-    img_data = buffer.getvalue()
-    encoded = base64.b64encode(img_data).decode('utf-8')
+    with figure('spider') as (fig, ax):
+        ax.set_title(title)
+
+        # Draw the outline of the spider chart
+        ax.plot(angles, values, 'o-', linewidth=2)
+        ax.fill(angles, values, alpha=0.25)
+
+        # Add the category labels
+        ax.set_thetagrids(np.degrees(angles[:-1]), categories)
+
+        # Set the range of radial axis
+        ax.set_rlabel_position(30)
+        ax.grid(True)
+
+        img_tag = figure_tag(fig)
    
-    img_html = f'<img src="data:image/png;base64,{encoded}" />\n'
+    img_html = img_tag + '\n'
     
     if center:
         img_html = HTMLBlock(img_html, styles={'text-align': 'center'}).render()
@@ -255,6 +249,7 @@ def create_timeseries_chart(dates, values, legends, title, xlabel, ylabel, cente
     Returns:
         str: An HTML div containing the time series chart.
     """
+    import plotly.graph_objects as go
     fig = go.Figure([
         go.Scatter(x=date_series, y=value_series, name=legend) \
             for date_series, value_series, legend in zip(dates, values, legends)
@@ -264,9 +259,8 @@ def create_timeseries_chart(dates, values, legends, title, xlabel, ylabel, cente
     fig.update_layout(title=title)
     
     if static:
-        img_bytes = fig.to_image(format='png', width=FIGSIZE[0]*100, height=FIGSIZE[1]*100, scale=1)
-        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-        img_html = f'<img src="data:image/png;base64,{img_base64}" alt="{title}">'
+        img_bytes = fig.to_image(format='png', width=FIGSIZE[0]*100, height=FIGSIZE[1]*100, scale=IMAGE_DPI / BASE_DPI)
+        img_html = image_tag(img_bytes, alt=title)
     else:
         img_html = fig.to_html(full_html=False)
     
@@ -285,27 +279,22 @@ def create_timeseries_chart_matplot(dates, values, legends, title, xlabel, ylabe
     Returns:
         str: An HTML img tag with the time series chart embedded as base64.
     """
-    fig, ax = plt.subplots(figsize=FIGSIZE)
-    for date_series, value_series, legend in zip(dates, values, legends):
-        ax.plot(date_series, value_series, linestyle='-', marker='o', label=legend)
-    ax.legend()
-    ax.set_title(title)
-    ax.set_xlabel(xlabel)
-    ax.set_ylabel(ylabel)
-    ax.grid(True)
-
-    # Format x-axis labels
-    fig.autofmt_xdate()
-
-    # Save the figure to a buffer
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight')
-    plt.close(fig)
-    buffer.seek(0)
-    img_data = buffer.getvalue()
-    encoded = base64.b64encode(img_data).decode('utf-8')
-
-    img_html = f'<img src="data:image/png;base64,{encoded}" />\n'
+    from report.figure_pool import figure, figure_tag
+    with figure('timeseries') as (fig, ax):
+        for date_series, value_series, legend in zip(dates, values, legends):
+            ax.plot(date_series, value_series, linestyle='-', marker='o', label=legend)
+        ax.legend()
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.grid(True)
+
+        # Format x-axis labels
+        fig.autofmt_xdate()
+
+        img_tag = figure_tag(fig)
+
+    img_html = img_tag + '\n'
 
     if center:
         img_html = HTMLBlock(img_html, styles={'text-align': 'center'}).render()
@@ -322,40 +311,35 @@ def create_bar_plot_matplot(categories, values, title, xlabel, ylabel, center=Fa
     Returns:
         str: An HTML img tag with the bar plot embedded as base64.
     """
-    fig, ax = plt.subplots(figsize=FIGSIZE)
+    from report.figure_pool import figure, figure_tag
     bar_width = 0.8
     margin_add = 0.05
-    if horizontal:
-        ax.barh(categories, values, color='skyblue', height=bar_width)
-        ax.set_xlabel(xlabel)
-        ax.set_ylabel(ylabel)
-        ax.set_yticks(np.arange(len(categories)))
-        ax.set_yticklabels(categories, wrap=True)
-        ax.tick_params(axis='y', pad=12)
-    else:
-        ax.bar(categories, values, color='skyblue', width=bar_width)
-        ax.set_xlabel(xlabel)
-        ax.set_ylabel(ylabel)
-        ax.set_xticks(np.arange(len(categories)))
-        ax.set_xticklabels(categories, wrap=True)
-    
-    if horizontal:
-        ax.margins(x=margin_add)
-    else:
-        ax.margins(y=margin_add)
-    
-    ax.set_title(title)
-    ax.grid(True)
-
-    # Save the figure to a buffer
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight')
-    plt.close(fig)
-    buffer.seek(0)
-    img_data = buffer.getvalue()
-    encoded = base64.b64encode(img_data).decode('utf-8')
-
-    img_html = f'<img src="data:image/png;base64,{encoded}" />\n'
+    with figure('bar') as (fig, ax):
+        if horizontal:
+            ax.barh(categories, values, color='skyblue', height=bar_width)
+            ax.set_xlabel(xlabel)
+            ax.set_ylabel(ylabel)
+            ax.set_yticks(np.arange(len(categories)))
+            ax.set_yticklabels(categories, wrap=True)
+            ax.tick_params(axis='y', pad=12)
+        else:
+            ax.bar(categories, values, color='skyblue', width=bar_width)
+            ax.set_xlabel(xlabel)
+            ax.set_ylabel(ylabel)
+            ax.set_xticks(np.arange(len(categories)))
+            ax.set_xticklabels(categories, wrap=True)
+
+        if horizontal:
+            ax.margins(x=margin_add)
+        else:
+            ax.margins(y=margin_add)
+
+        ax.set_title(title)
+        ax.grid(True)
+
+        img_tag = figure_tag(fig)
+
+    img_html = img_tag + '\n'
     if center:
         img_html = HTMLBlock(img_html, styles={'text-align': 'center'}).render()
     
@@ -371,6 +355,7 @@ def create_bar_plot(categories, values, title, xlabel, ylabel, center=False, hor
     Returns:
         str: An HTML div containing the bar plot.
     """
+    import plotly.graph_objects as go
     if horizontal:
         fig = go.Figure([go.Bar(y=categories, x=values, orientation='h')])
     else:
@@ -380,9 +365,8 @@ def create_bar_plot(categories, values, title, xlabel, ylabel, center=False, hor
     fig.update_yaxes(title_text=ylabel)
     
     if static:
-        img_bytes = fig.to_image(format='png', width=FIGSIZE[0]*100, height=FIGSIZE[1]*100, scale=1)
-        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-        img_html = f'<img src="data:image/png;base64,{img_base64}" alt="{title}">'
+        img_bytes = fig.to_image(format='png', width=FIGSIZE[0]*100, height=FIGSIZE[1]*100, scale=IMAGE_DPI / BASE_DPI)
+        img_html = image_tag(img_bytes, alt=title)
     else:
         img_html = fig.to_html(full_html=False)
     
@@ -391,32 +375,41 @@ def create_bar_plot(categories, values, title, xlabel, ylabel, center=False, hor
     
     return img_html
 
+def chart_backend(as_matplot: bool) -> str:
+    """Backend label of a chart in the metrics: plotly, matplotlib or svg (matplotlib inside `vector_charts()`)."""
+    if not as_matplot:
+        return 'plotly'
+    return 'svg' if vector_charts_enabled() else 'matplotlib'
+
 def timeseries_chart(dates, values, legends, title, xlabel, ylabel, center=False, matplot=False, static=True):
     as_matplot = matplot or not HAS_PLOTLY
     title_now = wrap_txt(title, html_version=not as_matplot, wrapsize=WRAPSIZE_SPIDER)
     legends_now = wrap_txt_list(legends, html_version=not as_matplot, wrapsize=WRAPSIZE_SPIDER)
-    if as_matplot:
-        return create_timeseries_chart_matplot(dates, values, legends_now, title_now, xlabel, ylabel, center)
-    else:
-        return create_timeseries_chart(dates, values, legends_now, title_now, xlabel, ylabel, center, static=static)
+    with chart_timer('timeseries', chart_backend(as_matplot)):
+        if as_matplot:
+            return create_timeseries_chart_matplot(dates, values, legends_now, title_now, xlabel, ylabel, center)
+        else:
+            return create_timeseries_chart(dates, values, legends_now, title_now, xlabel, ylabel, center, static=static)
 
 def spider_chart(categories, values, title, center=False, matplot=False, static=True):
     as_matplot = matplot or not HAS_PLOTLY
     categories_now = wrap_txt_list(categories, html_version=not as_matplot, wrapsize=WRAPSIZE_SPIDER)
     title_now = wrap_txt(title, html_version=not as_matplot, wrapsize=WRAPSIZE_SPIDER)
-    if as_matplot:
-        return create_spider_chart_matplot(categories_now, values, title_now, center)
-    else:
-        return create_spider_chart(categories_now, values, title_now, center, static=static)
+    with chart_timer('spider', chart_backend(as_matplot)):
+        if as_matplot:
+            return create_spider_chart_matplot(categories_now, values, title_now, center)
+        else:
+            return create_spider_chart(categories_now, values, title_now, center, static=static)
 
 def bar_plot(categories, values, title, xlabel, ylabel, center=False, matplot=False, horizontal=False, static=True):
     as_matplot = matplot or not HAS_PLOTLY
     categories_now = wrap_txt_list(categories, html_version=not as_matplot, wrapsize=WRAPSIZE_BARPLOT)
     title_now = wrap_txt(title, html_version=not as_matplot, wrapsize=WRAPSIZE_BARPLOT)
-    if as_matplot:
-        return create_bar_plot_matplot(categories_now, values, title_now, xlabel, ylabel, center, horizontal)
-    else:
-        return create_bar_plot(categories_now, values, title_now, xlabel, ylabel, center, horizontal, static=static)
+    with chart_timer('bar', chart_backend(as_matplot)):
+        if as_matplot:
+            return create_bar_plot_matplot(categories_now, values, title_now, xlabel, ylabel, center, horizontal)
+        else:
+            return create_bar_plot(categories_now, values, title_now, xlabel, ylabel, center, horizontal, static=static)
 
 def embed_local_image(image_path, center=False):
     """Embed a local image into an HTML string.
@@ -0,0 +1,169 @@
+"""Peso das imagens do relatório: resolução, formato e orçamento de bytes.
+
+Os gráficos estáticos são rasterizados em `REPORT_IMAGE_DPI` (100 é o tamanho
+de sempre) e exibidos com a largura que teriam em 100 dpi, então o DPI muda a
+nitidez e o peso, não o layout. `REPORT_IMAGE_FORMAT` escolhe a codificação:
+
+- `png`: o PNG do matplotlib/kaleido, sem alteração;
+- `png8`: PNG com paleta de 256 cores; gráficos têm poucas cores e ficam bem menores;
+- `jpeg` / `webp`: com perdas, qualidade `REPORT_IMAGE_QUALITY`, fundo branco.
+  O wkhtmltopdf de algumas distribuições não lê WebP; nesse caso use `jpeg`.
+
+Quando as imagens de um relatório passam de `REPORT_IMAGE_BUDGET_BYTES`,
+`fit_image_budget` reduz a resolução de todas na mesma proporção até caber.
+Todos os formatos, exceto `png`, e a redução precisam do Pillow.
+
+Dentro de `vector_charts(True)` os gráficos do matplotlib saem em SVG, sem
+rasterizar (usado pelos tiers mais baratos de `report_main.TIERS`).
+"""
+import base64
+import math
+import os
+import re
+import struct
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Iterator, Optional, Tuple
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+    print('Instalar Pillow: pip install Pillow, para converter e reduzir as imagens do relatório.')
+
+BASE_DPI = 100
+IMAGE_DPI = int(os.environ.get('REPORT_IMAGE_DPI', str(BASE_DPI)))
+IMAGE_FORMAT = os.environ.get('REPORT_IMAGE_FORMAT', 'png').lower()
+IMAGE_QUALITY = int(os.environ.get('REPORT_IMAGE_QUALITY', '80'))
+IMAGE_BUDGET_BYTES = int(os.environ.get('REPORT_IMAGE_BUDGET_BYTES', '0'))  # 0 = sem orçamento
+# abaixo disso o texto dos gráficos fica ilegível, mesmo estourando o orçamento
+IMAGE_MIN_WIDTH = int(os.environ.get('REPORT_IMAGE_MIN_WIDTH', '320'))
+BUDGET_PASSES = 4
+
+MIME_TYPES = {'png': 'image/png', 'png8': 'image/png', 'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+if IMAGE_FORMAT not in MIME_TYPES:
+    raise ValueError(f'REPORT_IMAGE_FORMAT inválido: {IMAGE_FORMAT} (use {", ".join(MIME_TYPES)})')
+if IMAGE_FORMAT != 'png' and not HAS_PIL:
+    IMAGE_FORMAT = 'png'
+
+# entra na chave dos PDFs de seção em cache: mudar a configuração gera as seções de novo
+IMAGE_SETTINGS = f'{IMAGE_DPI}:{IMAGE_FORMAT}:{IMAGE_QUALITY}:{IMAGE_BUDGET_BYTES}:{IMAGE_MIN_WIDTH}'
+
+_vector_charts: ContextVar[bool] = ContextVar('vector_charts', default=False)
+
+DATA_IMG = re.compile(r'<img\b([^>]*?)src="data:([\w/+.-]+);base64,([^"]+)"([^>]*)>')
+
+@dataclass
+class ImageStats:
+    """Images embedded in one HTML document."""
+    count: int = 0
+    bytes: int = 0
+    downscaled: int = 0
+
+def png_size(png: bytes) -> Tuple[int, int]:
+    """(width, height) read from the PNG header, without decoding the image."""
+    return struct.unpack('>II', png[16:24])
+
+def _flatten(image: 'Image.Image') -> 'Image.Image':
+    # JPEG e a paleta do png8 não têm transparência: compõe sobre fundo branco
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        fundo = Image.new('RGB', image.size, 'white')
+        fundo.paste(image, mask=image.getchannel('A'))
+        return fundo
+    return image.convert('RGB')
+
+def encode_image(image: 'Image.Image', fmt: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY) -> bytes:
+    """Encode a Pillow image in one of `MIME_TYPES`."""
+    buffer = BytesIO()
+    if fmt == 'png':
+        image.save(buffer, format='PNG', optimize=True)
+    elif fmt == 'png8':
+        _flatten(image).quantize(colors=256).save(buffer, format='PNG', optimize=True)
+    elif fmt == 'jpeg':
+        _flatten(image).save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        _flatten(image).save(buffer, format='WEBP', quality=quality, method=6)
+    return buffer.getvalue()
+
+def image_tag(png: bytes, alt: Optional[str] = None, dpi: int = IMAGE_DPI) -> str:
+    """`<img>` with a rendered chart in the configured format, displayed at its 100 dpi width.
+
+    Args:
+        png (bytes): Chart rendered as PNG at `dpi`.
+        alt (str): Alternative text.
+        dpi (int): Resolution the chart was rendered at.
+    """
+    width, _ = png_size(png)
+    data = png if IMAGE_FORMAT == 'png' else encode_image(Image.open(BytesIO(png)))
+    encoded = base64.b64encode(data).decode('utf-8')
+    alt_attr = f' alt="{alt}"' if alt is not None else ''
+    return f'<img src="data:{MIME_TYPES[IMAGE_FORMAT]};base64,{encoded}" width="{round(width * BASE_DPI / dpi)}"{alt_attr}>'
+
+@contextmanager
+def vector_charts(enabled: bool = True) -> Iterator[None]:
+    """Render the matplotlib charts of the block as SVG instead of raster images."""
+    token = _vector_charts.set(enabled)
+    try:
+        yield
+    finally:
+        _vector_charts.reset(token)
+
+def vector_charts_enabled() -> bool:
+    return _vector_charts.get()
+
+def svg_tag(svg: bytes) -> str:
+    """`<img>` with an SVG chart; it keeps the size written in the SVG itself."""
+    return f'<img src="data:image/svg+xml;base64,{base64.b64encode(svg).decode("utf-8")}">'
+
+def _decoded_size(encoded: str) -> int:
+    return len(encoded) * 3 // 4 - encoded[-2:].count('=')
+
+def image_stats(html: str) -> ImageStats:
+    """Number and decoded size of the data URI images in `html`."""
+    sizes = [_decoded_size(match.group(3)) for match in DATA_IMG.finditer(html)]
+    return ImageStats(count=len(sizes), bytes=sum(sizes))
+
+def _downscale(match: 're.Match', scale: float, stats: ImageStats) -> str:
+    antes, mime, encoded, depois = match.groups()
+    try:
+        image = Image.open(BytesIO(base64.b64decode(encoded)))
+        image.load()
+    except (OSError, ValueError):
+        return match.group(0)  # SVG ou formato que o Pillow não lê: fica como está
+    width, height = image.size
+    scale = max(scale, min(1.0, IMAGE_MIN_WIDTH / width))
+    if scale >= 1.0:
+        return match.group(0)
+    image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+    encoded = base64.b64encode(encode_image(image)).decode('utf-8')
+    stats.downscaled += 1
+    if 'width=' not in antes + depois:
+        depois = f' width="{width}"' + depois  # mantém o tamanho na página
+    return f'<img{antes}src="data:{MIME_TYPES[IMAGE_FORMAT]};base64,{encoded}"{depois}>'
+
+def fit_image_budget(html: str, budget: int = IMAGE_BUDGET_BYTES) -> Tuple[str, ImageStats]:
+    """Downscale the images embedded in `html` until they add up to at most `budget` bytes.
+
+    Every image is scaled by the same factor, always from the original, and
+    never below `IMAGE_MIN_WIDTH` pixels wide, so the budget is best effort.
+
+    Returns:
+        tuple: The HTML and the stats of its final images.
+    """
+    stats = image_stats(html)
+    if budget <= 0 or stats.bytes <= budget or not HAS_PIL:
+        return html, stats
+    scale = 1.0
+    for _ in range(BUDGET_PASSES):
+        # o tamanho codificado cresce com a área, mais ou menos
+        scale *= math.sqrt(budget / stats.bytes) * 0.95
+        final = ImageStats()
+        fitted = DATA_IMG.sub(lambda match: _downscale(match, scale, final), html)
+        stats = ImageStats(count=stats.count, bytes=image_stats(fitted).bytes, downscaled=final.downscaled)
+        if stats.bytes <= budget or not stats.downscaled:
+            break
+    return fitted, stats
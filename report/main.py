@@ -85,6 +85,28 @@ def conteudo_indicadores(dataobj: models.Data, matplot: bool = True, horizontal:
             html_contents += [bar_plot(eixo_df.item.tolist(), eixo_df.valor.tolist(), title='', xlabel='Resultado', ylabel='', center=True, matplot=matplot, horizontal=horizontal)]
     return HTMLDiv().add_contents(html_contents)
 
+def conteudo_benchmark_setorial(benchmark: dict) -> HTMLDiv:
+    setor = benchmark['setor']
+    html_contents = [
+        create_header(f"Comparação com o Setor", 2),
+        create_paragraph(f"Empresas da mesma atividade ({setor['atividade']}) e estado ({setor['estado']})."),
+    ]
+    if benchmark['indicadores']:
+        table = HTMLTable()
+        table.add_headers(['Aspecto', 'Indicador', 'Valor', 'Média do setor', 'Percentil no setor', 'Empresas'])
+        table.add_rows([[
+            i['eixo'].capitalize(), i['item'], f"{i['valor']:.2f}", f"{i['media']:.2f}", f"{i['percentil']:.0f}%", i['empresas']
+        ] for i in benchmark['indicadores']])
+        html_contents += [create_paragraph(f"Indicadores", bold=True), table.render()]
+    if benchmark['maturidade']:
+        table = HTMLTable()
+        table.add_headers(['Aspecto', 'Tema', 'Nível da empresa'] + [f'Nível {n} no setor' for n in range(1, 6)] + ['Empresas'])
+        table.add_rows([[
+            m['eixo'].capitalize(), m['tema'] or 'Geral', m['nivel']
+        ] + [f"{p:.0f}%" for p in m['distribuicao']] + [m['empresas']] for m in benchmark['maturidade']])
+        html_contents += [create_paragraph(f"Maturidade", bold=True), table.render()]
+    return HTMLDiv().add_contents(html_contents)
+
 def conteudo_producao_no_tempo(producao: pd.DataFrame, unidproducao: str, matplot: bool = True) -> HTMLDiv:
     dates = producao.date.tolist()
     values = producao.producao.tolist()
@@ -98,24 +120,11 @@ def conteudo_producao_no_tempo(producao: pd.DataFrame, unidproducao: str, matplo
         maturidade_html = HTMLDiv()
     return maturidade_html
    
-def conteudo_indicadores_no_tempo(niveis_aspectos: pd.DataFrame, niveis_aspectos_tema: pd.DataFrame, indicadores_df: pd.DataFrame, matplot: bool = True, split_maturidade_charts: bool = False, split_indicadores_charts: bool = False):
-    eixos = niveis_aspectos.eixo.unique().tolist()
-    dates = []
-    values = []
-    
+def conteudo_temas_no_tempo(niveis_aspectos: pd.DataFrame, niveis_aspectos_tema: pd.DataFrame, matplot: bool = True, split_maturidade_charts: bool = False) -> HTMLDiv:
     maturidade_temas = []
-    tema_indicadores = []
-    for eixo in eixos:
-        eixo_df = niveis_aspectos[niveis_aspectos['eixo']==eixo]
+    for eixo in niveis_aspectos.eixo.unique().tolist():
         eixo_tema_df = niveis_aspectos_tema[niveis_aspectos_tema['eixo']==eixo]
-        indicadores_tema_df = indicadores_df[indicadores_df['eixo']==eixo]
-        values.append(eixo_df.nivel.tolist())
-        dates.append(eixo_df.data.tolist())
-        
         temas = eixo_tema_df.tema.unique()
-        indicadores = indicadores_tema_df.item.unique()
-        indicador_dates = []
-        indicador_values = []
         tema_dates = []
         tema_values = []
         
@@ -129,6 +138,20 @@ def conteudo_indicadores_no_tempo(niveis_aspectos: pd.DataFrame, niveis_aspectos
                 timeseries_html = timeseries_chart(tema_dates, tema_values, legends=[tema.capitalize()], title="", xlabel='Data', ylabel='Valor', center=True, matplot=matplot)
                 maturidade_temas.append(timeseries_html)
         
+        if not split_maturidade_charts:
+            maturidade_temas.append(timeseries_chart(
+                tema_dates, tema_values, legends=[tema.capitalize() for tema in temas], title="", xlabel='Data', ylabel='Valor', center=True, matplot=matplot
+            ))
+    return HTMLDiv().add_contents(maturidade_temas)
+
+def conteudo_indicadores_eixos_no_tempo(niveis_aspectos: pd.DataFrame, indicadores_df: pd.DataFrame, matplot: bool = True, split_indicadores_charts: bool = False) -> HTMLDiv:
+    tema_indicadores = []
+    for eixo in niveis_aspectos.eixo.unique().tolist():
+        indicadores_tema_df = indicadores_df[indicadores_df['eixo']==eixo]
+        indicadores = indicadores_tema_df.item.unique()
+        indicador_dates = []
+        indicador_values = []
+        
         tema_indicadores.append(create_header(f"Indicadores {eixo.capitalize()} no tempo", 2, center=True))
         for indicador in indicadores:
             indicadores_tema_no_eixo_df = indicadores_tema_df[indicadores_tema_df.item==indicador]
@@ -139,26 +162,39 @@ def conteudo_indicadores_no_tempo(niveis_aspectos: pd.DataFrame, niveis_aspectos
                 indicadores_timeseries_html = timeseries_chart(indicador_dates, indicador_values, legends=[indicador.capitalize()], title="", xlabel='Data', ylabel='Valor', center=True, matplot=matplot)
                 tema_indicadores.append(indicadores_timeseries_html)
         
-        if not split_maturidade_charts:
-            maturidade_temas.append(timeseries_chart(
-                tema_dates, tema_values, legends=[tema.capitalize() for tema in temas], title="", xlabel='Data', ylabel='Valor', center=True, matplot=matplot
-            ))
-        
         if not split_indicadores_charts:
             tema_indicadores.append(timeseries_chart(
                 indicador_dates, indicador_values, legends=[indicador.capitalize() for indicador in indicadores], title="", xlabel='Data', ylabel='Valor', center=True, matplot=matplot
             ))
+    return HTMLDiv().add_contents(tema_indicadores)
 
-    maturidade_temas_html = HTMLDiv().add_contents(maturidade_temas)
-    indicadores_html = HTMLDiv().add_contents(tema_indicadores)
-    maturidade_html = HTMLDiv().add_contents([
+def conteudo_maturidade_no_tempo(niveis_aspectos: pd.DataFrame, matplot: bool = True) -> HTMLDiv:
+    eixos = niveis_aspectos.eixo.unique().tolist()
+    dates = []
+    values = []
+    for eixo in eixos:
+        eixo_df = niveis_aspectos[niveis_aspectos['eixo']==eixo]
+        values.append(eixo_df.nivel.tolist())
+        dates.append(eixo_df.data.tolist())
+    return HTMLDiv().add_contents([
         create_header(f"Maturidade no tempo", 2, center=True),
         timeseries_chart(dates, values, legends=[i.capitalize() for i in eixos], title="", xlabel='Data', ylabel='Valor', center=True, matplot=matplot),
     ])
+
+def conteudo_indicadores_no_tempo(niveis_aspectos: pd.DataFrame, niveis_aspectos_tema: pd.DataFrame, indicadores_df: pd.DataFrame, matplot: bool = True, split_maturidade_charts: bool = False, split_indicadores_charts: bool = False):
+    maturidade_temas_html = conteudo_temas_no_tempo(niveis_aspectos, niveis_aspectos_tema, matplot=matplot, split_maturidade_charts=split_maturidade_charts)
+    indicadores_html = conteudo_indicadores_eixos_no_tempo(niveis_aspectos, indicadores_df, matplot=matplot, split_indicadores_charts=split_indicadores_charts)
+    maturidade_html = conteudo_maturidade_no_tempo(niveis_aspectos, matplot=matplot)
     return maturidade_html, maturidade_temas_html, indicadores_html
    
-def write_html(data, conteudo, arquivo='report.html') -> str:
-    string_html = f'''
+HTML_TAIL = '''
+    </body>
+    </html>
+    '''
+
+def html_head(data) -> str:
+    """Document start up to `<body>`, so the report can be sent in pieces."""
+    return f'''
     <html>
     <head>
         <meta charset="UTF-8">
@@ -176,16 +212,16 @@ def write_html(data, conteudo, arquivo='report.html') -> str:
             </style>
         </head>
     <body>
-    {conteudo}
-    </body>
-    </html>
     '''
+
+def write_html(data, conteudo, arquivo='report.html') -> str:
+    string_html = html_head(data) + conteudo + HTML_TAIL
     # # Save the HTML content to a file
     # with open(arquivo, 'w', encoding='utf-8') as f:
     #     f.write(string_html)
     return string_html
 
-def combine_multiple_reports(dataobjs: List[models.Data]):
+def indicadores_no_tempo(dataobjs: List[models.Data]) -> pd.DataFrame:
     indicadores_df = []
     for dataobj in dataobjs:
         indicador_df = pd.DataFrame([i.model_dump() for i in dataobj.indicadores])
@@ -193,17 +229,26 @@ def combine_multiple_reports(dataobjs: List[models.Data]):
         indicadores_df.append(indicador_df)
     indicadores_df = pd.concat(indicadores_df)
     indicadores_df['data'] = pd.to_datetime(indicadores_df['data'], format='%d/%m/%Y')
-    
+    return indicadores_df
+
+def niveis_no_tempo(dataobjs: List[models.Data]) -> pd.DataFrame:
     niveis_aspectos = pd.concat([pd.DataFrame(
         [{'eixo': k.eixo, 'nivel': k.nivel, 'data': k.data} for k in report_i.get_aspecto_per_eixo(add_date=True)]
     ) for report_i in dataobjs])
     niveis_aspectos['data'] = pd.to_datetime(niveis_aspectos['data'], format='%d/%m/%Y')
-    niveis_aspectos_tema = pd.concat([report_i.get_aspecto_per_eixo_and_tema(add_date=True) for report_i in dataobjs])
+    return niveis_aspectos
 
+def temas_no_tempo(dataobjs: List[models.Data]) -> pd.DataFrame:
+    return pd.concat([report_i.get_aspecto_per_eixo_and_tema(add_date=True) for report_i in dataobjs])
+
+def producao_no_tempo(dataobjs: List[models.Data]) -> pd.DataFrame:
     producao_df = pd.DataFrame([{'producao': i.empresa.producaomes, 'date': i.empresa.data} for i in dataobjs])
     producao_df['producao'] = pd.to_numeric(producao_df['producao'], errors='coerce')
     producao_df['date'] = pd.to_datetime(producao_df['date'], format='%d/%m/%Y')
-    return niveis_aspectos, niveis_aspectos_tema, indicadores_df, producao_df
+    return producao_df
+
+def combine_multiple_reports(dataobjs: List[models.Data]):
+    return niveis_no_tempo(dataobjs), temas_no_tempo(dataobjs), indicadores_no_tempo(dataobjs), producao_no_tempo(dataobjs)
 
 if __name__ == "__main__":
     
@@ -0,0 +1,158 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+NIVEL_MAXIMO = 5
+# resposta -> 0: sim, 1: nao, 2: nao aplicavel
+RESPOSTAS_APROVADAS = {0, 2}
+
+def resposta_aprovada(resposta) -> bool:
+    return int(resposta) in RESPOSTAS_APROVADAS
+
+def nivel_from_niveis_aprovados(niveis_aprovados: Set[int]) -> int:
+    """Maturity level reached given the set of approved levels.
+
+    Same rule as `Data.get_aspecto_per_eixo`: the company stays at the level
+    right before the first level (from 2 on) that is not approved; a level
+    without questions counts as not approved.
+    """
+    for nivel in range(2, NIVEL_MAXIMO + 1):
+        if nivel not in niveis_aprovados:
+            return nivel - 1
+    return NIVEL_MAXIMO
+
+def niveis_aprovados(respostas_por_nivel: Dict[int, Iterable]) -> Set[int]:
+    """Levels whose questions are all answered "Sim" or "Não Aplicado" (level 1 is always approved)."""
+    return {
+        nivel for nivel, respostas in respostas_por_nivel.items()
+        if nivel == 1 or all(resposta_aprovada(r) for r in respostas)
+    }
+
+def score_perguntas(perguntas: Iterable[Tuple[str, str, int, object]]) -> Tuple[Dict[str, int], Dict[Tuple[str, str], int]]:
+    """Compute maturity levels per eixo and per (eixo, tema) without pandas.
+
+    Args:
+        perguntas (iterable of tuple): (eixo, tema, nivel, resposta) for each answered question.
+
+    Returns:
+        tuple: ({eixo: nivel}, {(eixo, tema): nivel}). Groups without any approved
+        level are left out, as in the pandas implementation.
+    """
+    por_eixo: Dict[str, Dict[int, list]] = {}
+    por_tema: Dict[Tuple[str, str], Dict[int, list]] = {}
+    for eixo, tema, nivel, resposta in perguntas:
+        por_eixo.setdefault(eixo, {}).setdefault(int(nivel), []).append(resposta)
+        por_tema.setdefault((eixo, tema), {}).setdefault(int(nivel), []).append(resposta)
+
+    def levels(grupos):
+        resultado = {}
+        for chave, respostas_por_nivel in grupos.items():
+            aprovados = niveis_aprovados(respostas_por_nivel)
+            if aprovados:
+                resultado[chave] = nivel_from_niveis_aprovados(aprovados)
+        return resultado
+
+    return levels(por_eixo), levels(por_tema)
+
+# grupo: (eixo, '') para o eixo, (eixo, tema) para o tema, como em `survey_contribution`
+Grupo = Tuple[str, str]
+
+class ScoringState:
+    """Maturity levels of one survey that follow single answer changes.
+
+    For each eixo and (eixo, tema), and each level, keeps how many questions are
+    approved ("Sim" or "Não Aplicado"), which are "Não" and which are unanswered.
+    Changing one answer only touches the counters of its eixo and its tema, so
+    a level is recomputed by looking at five levels, not at the whole survey.
+    """
+
+    def __init__(self, catalogo: Dict[int, Tuple[str, str, int]], respostas: Dict[int, object]):
+        """
+        Args:
+            catalogo (dict): {question_id: (eixo, tema, nivel)} of every maturity question.
+            respostas (dict): {question_id: resposta} of the survey; other questions are unanswered.
+        """
+        self.catalogo = catalogo
+        self.respostas: Dict[int, str] = {}
+        self.aprovadas: Dict[Tuple[Grupo, int], int] = {}
+        self.nao: Dict[Tuple[Grupo, int], Set[int]] = {}
+        self.sem_resposta: Dict[Tuple[Grupo, int], Set[int]] = {}
+        for question_id in catalogo:
+            for chave in self._chaves(question_id):
+                self.sem_resposta.setdefault(chave, set()).add(question_id)
+        for question_id, resposta in respostas.items():
+            if question_id in catalogo and str(resposta).strip() in ('0', '1', '2'):
+                self.set_resposta(question_id, str(resposta).strip())
+
+    def copy(self) -> 'ScoringState':
+        state = ScoringState.__new__(ScoringState)
+        state.catalogo = self.catalogo
+        state.respostas = dict(self.respostas)
+        state.aprovadas = dict(self.aprovadas)
+        state.nao = {chave: set(ids) for chave, ids in self.nao.items()}
+        state.sem_resposta = {chave: set(ids) for chave, ids in self.sem_resposta.items()}
+        return state
+
+    def _chaves(self, question_id: int) -> Tuple[Tuple[Grupo, int], Tuple[Grupo, int]]:
+        eixo, tema, nivel = self.catalogo[question_id]
+        return ((eixo, ''), int(nivel)), ((eixo, tema), int(nivel))
+
+    def todos_grupos(self) -> Set[Grupo]:
+        """Every eixo and (eixo, tema) with at least one question in the catalog."""
+        return {grupo for grupo, _ in self.sem_resposta}
+
+    def set_resposta(self, question_id: int, resposta: Optional[str]):
+        """Answer ('0', '1' or '2') or unanswer (None) one question."""
+        anterior = self.respostas.pop(question_id, None)
+        if resposta is not None:
+            self.respostas[question_id] = resposta
+        for chave in self._chaves(question_id):
+            if anterior is None:
+                self.sem_resposta[chave].discard(question_id)
+            elif resposta_aprovada(anterior):
+                self.aprovadas[chave] -= 1
+            else:
+                self.nao[chave].discard(question_id)
+            if resposta is None:
+                self.sem_resposta[chave].add(question_id)
+            elif resposta_aprovada(resposta):
+                self.aprovadas[chave] = self.aprovadas.get(chave, 0) + 1
+            else:
+                self.nao.setdefault(chave, set()).add(question_id)
+
+    def _aprovado(self, grupo: Grupo, nivel: int) -> bool:
+        nao = self.nao.get((grupo, nivel))
+        presente = self.aprovadas.get((grupo, nivel), 0) > 0 or bool(nao)
+        return presente and (nivel == 1 or not nao)
+
+    def nivel(self, grupo: Grupo) -> Optional[int]:
+        """Level of the group, or None when no level is approved (left out by `score_perguntas`)."""
+        aprovados = {nivel for nivel in range(1, NIVEL_MAXIMO + 1) if self._aprovado(grupo, nivel)}
+        return nivel_from_niveis_aprovados(aprovados) if aprovados else None
+
+    def niveis(self) -> Dict[Grupo, int]:
+        """{grupo: nivel} of every group with a level, as `score_perguntas` returns them."""
+        return {grupo: nivel for grupo in self.todos_grupos() if (nivel := self.nivel(grupo)) is not None}
+
+    def proximo_nivel(self, grupo: Grupo) -> Optional[Tuple[int, List[int]]]:
+        """Next level of the group and the fewest questions that must be answered "Sim" to reach it.
+
+        Every "Não" of a blocking level must change; a blocking level without
+        answers needs one of its unanswered questions. None at the top level, or
+        when a blocking level has no question that could approve it.
+        """
+        atual = self.nivel(grupo) or 0
+        if atual >= NIVEL_MAXIMO:
+            return None
+        alvo = atual + 1
+        perguntas: List[int] = []
+        for nivel in (range(2, alvo + 1) if alvo > 1 else (1,)):
+            if self._aprovado(grupo, nivel):
+                continue
+            nao = self.nao.get((grupo, nivel))
+            if nao:
+                perguntas += sorted(nao)
+                continue
+            sem_resposta = self.sem_resposta.get((grupo, nivel))
+            if not sem_resposta:
+                return None
+            perguntas.append(min(sem_resposta))
+        return alvo, perguntas
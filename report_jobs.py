@@ -0,0 +1,147 @@
+"""Fila durável de relatórios na tabela `report_jobs` do Postgres.
+
+Os nós web só enfileiram (`enqueue_report_job`); qualquer quantidade de
+workers (`python worker.py`, em qualquer máquina com acesso ao banco) reivindica
+trabalhos com `SELECT ... FOR UPDATE SKIP LOCKED`, sem broker.
+
+No SQLite (`make_engine`) o `FOR UPDATE SKIP LOCKED` some da consulta, e o
+`UPDATE ... RETURNING` continua atômico porque há um único escritor.
+
+Um trabalho em execução renova `heartbeat_at`. Se o worker morrer, o trabalho
+volta a ser reivindicável depois de `REPORT_JOB_VISIBILITY_SECONDS` sem
+heartbeat. Falhas são repetidas com backoff exponencial até `max_attempts`.
+"""
+import hashlib
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from database import ReportJob, is_sqlite
+from metrics import REPORT_JOBS
+
+REPORT_JOB_VISIBILITY_SECONDS = float(os.environ.get("REPORT_JOB_VISIBILITY_SECONDS", "120"))
+REPORT_JOB_MAX_ATTEMPTS = int(os.environ.get("REPORT_JOB_MAX_ATTEMPTS", "5"))
+REPORT_JOB_BACKOFF_SECONDS = float(os.environ.get("REPORT_JOB_BACKOFF_SECONDS", "10"))
+REPORT_JOB_BACKOFF_MAX_SECONDS = float(os.environ.get("REPORT_JOB_BACKOFF_MAX_SECONDS", "600"))
+
+PENDING = ("queued", "running")
+
+def _now(db: Session):
+    # Postgres: relógio do banco, o mesmo para todos os hosts. SQLite (um nó só) não
+    # sabe subtrair intervalos de CURRENT_TIMESTAMP, então o horário vem do Python, em UTC sem fuso
+    # (as colunas são DateTime sem timezone)
+    return datetime.now(timezone.utc).replace(tzinfo=None) if is_sqlite(db) else func.now()
+
+def dedup_key(meta: Dict[str, Any], sections: Optional[List[str]] = None, eixos: Optional[List[str]] = None) -> str:
+    payload = json.dumps([meta, sorted(sections or []), sorted(e.lower() for e in eixos or [])], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def enqueue_report_job(db: Session, meta: Dict[str, Any], sections: Optional[List[str]] = None,
+                       eixos: Optional[List[str]] = None) -> ReportJob:
+    """Queue a report, or return the pending job for the same metadata and selection."""
+    key = dedup_key(meta, sections, eixos)
+    job = db.query(ReportJob).filter(ReportJob.dedup_key == key, ReportJob.status.in_(PENDING)).first()
+    if job is not None:
+        return job
+    job = ReportJob(dedup_key=key, meta=meta, sections=sections or None, eixos=eixos or None,
+                    status="queued", attempts=0, max_attempts=REPORT_JOB_MAX_ATTEMPTS, run_after=_now(db))
+    db.add(job)
+    db.commit()
+    REPORT_JOBS.inc(status="queued")
+    return job
+
+def claim_report_job(db: Session, worker_id: str) -> Optional[ReportJob]:
+    """Take the oldest runnable job (queued and due, or running with an expired heartbeat).
+
+    Concurrent workers skip the rows locked by each other, so each job is claimed once.
+    """
+    now = _now(db)
+    expired = now - timedelta(seconds=REPORT_JOB_VISIBILITY_SECONDS)
+    # um trabalho que derruba o worker em toda tentativa para de ser reivindicado
+    reaped = db.execute(
+        update(ReportJob)
+        .where(ReportJob.status == "running", ReportJob.heartbeat_at < expired,
+               ReportJob.attempts >= ReportJob.max_attempts)
+        .values(status="failed", error="heartbeat expirado na última tentativa", locked_by=None, finished_at=now)
+    ).rowcount
+    if reaped:
+        REPORT_JOBS.inc(reaped, status="failed")
+    runnable = (
+        select(ReportJob.id)
+        .where(or_(
+            and_(ReportJob.status == "queued", ReportJob.run_after <= now),
+            and_(ReportJob.status == "running", ReportJob.heartbeat_at < expired,
+                 ReportJob.attempts < ReportJob.max_attempts),
+        ))
+        .order_by(ReportJob.run_after, ReportJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    job_id = db.execute(
+        update(ReportJob)
+        .where(ReportJob.id == runnable)
+        .values(status="running", locked_by=worker_id, heartbeat_at=now, attempts=ReportJob.attempts + 1)
+        .returning(ReportJob.id)
+    ).scalar()
+    db.commit()
+    if job_id is None:
+        return None
+    return db.get(ReportJob, job_id)
+
+def heartbeat(db: Session, job_id: int, worker_id: str) -> bool:
+    """Renew the claim; False when the job was taken over by another worker."""
+    renewed = db.execute(
+        update(ReportJob)
+        .where(ReportJob.id == job_id, ReportJob.locked_by == worker_id, ReportJob.status == "running")
+        .values(heartbeat_at=_now(db))
+    ).rowcount
+    db.commit()
+    return renewed == 1
+
+def complete_report_job(db: Session, job_id: int, worker_id: str, result: Optional[str],
+                        pdf_bytes: Optional[int] = None, image_count: Optional[int] = None) -> bool:
+    done = db.execute(
+        update(ReportJob)
+        .where(ReportJob.id == job_id, ReportJob.locked_by == worker_id)
+        .values(status="done", result=result, pdf_bytes=pdf_bytes, image_count=image_count,
+                error=None, finished_at=_now(db))
+    ).rowcount
+    db.commit()
+    if done:
+        REPORT_JOBS.inc(status="done")
+    return done == 1
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(REPORT_JOB_BACKOFF_MAX_SECONDS, REPORT_JOB_BACKOFF_SECONDS * 2 ** (attempts - 1)))
+
+def fail_report_job(db: Session, job: ReportJob, worker_id: str, error: str, retry: bool = True) -> str:
+    """Requeue the job with backoff, or mark it failed after its last attempt; returns the new status."""
+    status = "queued" if retry and job.attempts < job.max_attempts else "failed"
+    values: Dict[str, Any] = {"status": status, "error": error, "locked_by": None}
+    if status == "queued":
+        values["run_after"] = _now(db) + timedelta(seconds=backoff_seconds(job.attempts))
+    else:
+        values["finished_at"] = _now(db)
+    db.execute(update(ReportJob).where(ReportJob.id == job.id, ReportJob.locked_by == worker_id).values(**values))
+    db.commit()
+    REPORT_JOBS.inc(status="retried" if status == "queued" else "failed")
+    return status
+
+def job_status(job: ReportJob) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error,
+        "pdf_bytes": job.pdf_bytes,
+        "image_count": job.image_count,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
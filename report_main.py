@@ -1,3 +1,19 @@
+"""Montagem do relatório HTML a partir de um grafo declarado de dependências.
+
+Cada seção declara os produtos de dados de que precisa, e cada produto os
+produtos de que depende. Para um subconjunto de seções, só os produtos
+alcançáveis a partir delas são calculados (uma vez cada, sob demanda), então
+pedir só o resumo não calcula as séries temporais nem desenha seus gráficos.
+
+As seções leem apenas os seus produtos, então o hash desses produtos (mais o
+código do pacote `report`) identifica o HTML da seção: é a chave usada para
+guardar o PDF de cada seção em cache (`SecaoRelatorio.chave`).
+
+Com um orçamento de tempo (`TierPlan`), cada seção com gráficos é desenhada no
+tier mais rico cujo custo estimado (média medida por gráfico) ainda cabe no
+tempo que resta: plotly, matplotlib, SVG, um gráfico por eixo e, por fim,
+séries com menos datas.
+"""
 from report.main import (
     conteudo_header,
     conteudo_resumo_maturidade,
@@ -5,55 +21,332 @@ from report.main import (
     conteudo_maturidade_final,
     conteudo_spiders,
     conteudo_indicadores,
-    combine_multiple_reports,
-    conteudo_indicadores_no_tempo,
+    niveis_no_tempo,
+    temas_no_tempo,
+    indicadores_no_tempo,
+    producao_no_tempo,
+    conteudo_temas_no_tempo,
+    conteudo_maturidade_no_tempo,
+    conteudo_indicadores_eixos_no_tempo,
     conteudo_producao_no_tempo,
-    write_html
+    conteudo_benchmark_setorial,
+    html_head,
+    HTML_TAIL
 )
+from report.generate_html import HTMLDiv
+from report.images import IMAGE_BUDGET_BYTES, IMAGE_SETTINGS, vector_charts
 from report.models import Data
-from typing import List
+from metrics import stage_timer, CHART_SECONDS, TIER_FALLBACKS
+from dataclasses import dataclass
+from pydantic import BaseModel
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+import hashlib
+import json
+import sys
+import time
+import numpy as np
+import pandas as pd
 
-def report_generation(datas: List[Data]):
+EIXOS = ('ambiental', 'governanca', 'social')
 
-    # ultimo relatório
-    dataobj = datas[-1]
-    # dataobj = Data.from_dict(data)
-    niveis_aspectos = dataobj.get_aspecto_per_eixo()
-    niveis_aspectos_tema_dataframe = dataobj.get_aspecto_per_eixo_and_tema()
-    
-    # conteudo de ultimo relatório    
-    comeco = conteudo_header(dataobj)
-    resumo_maturidade = conteudo_resumo_maturidade(dataobj, niveis_aspectos)
-    resumo_recomendacoes = conteudo_recomendacoes(dataobj, niveis_aspectos)
-    resumo_maturidade_final = conteudo_maturidade_final(dataobj, niveis_aspectos)
-    resumo_spiders = conteudo_spiders(dataobj, niveis_aspectos, niveis_aspectos_tema_dataframe, matplot=False)
-    resumo_indicadores = conteudo_indicadores(dataobj, horizontal=True, matplot=False, split_indicadores_charts=True)
-    
-    # pegar series temporais
-    # dataobjs = [Data.from_dict(i) for i in datas]
-    dataobjs = datas
-    niveis_aspectos, niveis_aspectos_tema, indicadores_df, producao_df = combine_multiple_reports(dataobjs)
-    maturidade_html, tema_indicadores_html, indicadores_html = conteudo_indicadores_no_tempo(
-        niveis_aspectos, niveis_aspectos_tema, indicadores_df, matplot=False,
-        split_maturidade_charts=True, split_indicadores_charts=True
-    )
+@dataclass
+class ReportInputs:
+    """What the products are computed from: the surveys (oldest first) and the sector benchmark."""
+    datas: List[Data]
+    benchmark: Optional[dict] = None
+
+    @property
+    def atual(self) -> Data:
+        return self.datas[-1]
+
+# produtos de dados: nome -> (produtos de que depende, função(inputs, *dependências))
+PRODUTOS: Dict[str, Tuple[Tuple[str, ...], Callable[..., Any]]] = {
+    'atual': ((), lambda r: r.atual),
+    'maturidade': ((), lambda r: r.atual.get_aspecto_per_eixo()),
+    'maturidade_temas': ((), lambda r: r.atual.get_aspecto_per_eixo_and_tema()),
+    'serie_maturidade': ((), lambda r: niveis_no_tempo(r.datas)),
+    'serie_temas': ((), lambda r: temas_no_tempo(r.datas)),
+    'serie_indicadores': ((), lambda r: indicadores_no_tempo(r.datas)),
+    'serie_producao': ((), lambda r: producao_no_tempo(r.datas)),
+    'benchmark': ((), lambda r: r.benchmark),
+}
+
+@dataclass(frozen=True)
+class RenderTier:
+    """How the charts of a section are drawn, from the richest to the cheapest."""
+    nome: str
+    matplot: bool                     # matplotlib em vez de plotly/kaleido
+    svg: bool                         # matplotlib em SVG, sem rasterizar
+    split: bool                       # um gráfico por tema/indicador em vez de um por eixo
+    max_pontos: Optional[int] = None  # questionários por série temporal
+
+TIERS: Tuple[RenderTier, ...] = (
+    RenderTier('full', matplot=False, svg=False, split=True),
+    RenderTier('matplotlib', matplot=True, svg=False, split=True),
+    RenderTier('svg', matplot=True, svg=True, split=True),
+    RenderTier('combined', matplot=True, svg=True, split=False),
+    RenderTier('downsampled', matplot=True, svg=True, split=False, max_pontos=12),
+)
+FULL = TIERS[0]
+
+# seções na ordem do documento: nome -> (produtos de que depende, função(tier, *produtos) -> HTMLDiv).
+# As funções de resumo recebem o Data mas só usam os níveis; passar None mantém a
+# seção independente do questionário inteiro, e o PDF dela reaproveitável.
+SECOES: Dict[str, Tuple[Tuple[str, ...], Callable[..., HTMLDiv]]] = {
+    'header': (('atual',), lambda _, d: conteudo_header(d)),
+    'resumo_maturidade': (('maturidade',), lambda _, n: conteudo_resumo_maturidade(None, n)),
+    'recomendacoes': (('maturidade',), lambda _, n: conteudo_recomendacoes(None, n)),
+    'producao': (('serie_producao', 'atual'), lambda tier, p, d: conteudo_producao_no_tempo(p, d.empresa.unidproducao, matplot=tier.matplot)),
+    'indicadores': (('atual',), lambda tier, d: conteudo_indicadores(d, horizontal=True, matplot=tier.matplot, split_indicadores_charts=tier.split)),
+    'benchmark': (('benchmark',), lambda _, b: conteudo_benchmark_setorial(b) if b else HTMLDiv()),
+    'maturidade_final': (('maturidade',), lambda _, n: conteudo_maturidade_final(None, n)),
+    'spiders': (('maturidade', 'maturidade_temas'), lambda tier, n, t: conteudo_spiders(None, n, t, matplot=tier.matplot)),
+    'temas_no_tempo': (('serie_maturidade', 'serie_temas'), lambda tier, n, t: conteudo_temas_no_tempo(n, t, matplot=tier.matplot, split_maturidade_charts=tier.split)),
+    'maturidade_no_tempo': (('serie_maturidade',), lambda tier, n: conteudo_maturidade_no_tempo(n, matplot=tier.matplot)),
+    'indicadores_no_tempo': (('serie_maturidade', 'serie_indicadores'), lambda tier, n, i: conteudo_indicadores_eixos_no_tempo(n, i, matplot=tier.matplot, split_indicadores_charts=tier.split)),
+}
 
-    producao_html = conteudo_producao_no_tempo(
-        producao_df, dataobj.empresa.unidproducao, matplot=False
+def _eixos(r: ReportInputs) -> int:
+    return len({p.eixo.lower() for p in r.atual.perguntas})
+
+def _temas(r: ReportInputs) -> int:
+    return len({(p.eixo.lower(), p.tema) for p in r.atual.perguntas})
+
+def _indicadores(r: ReportInputs) -> int:
+    return len(r.atual.indicadores)
+
+# gráficos que cada seção desenha: nome -> função(tier, inputs) -> {tipo de gráfico: quantidade}
+GRAFICOS: Dict[str, Callable[[RenderTier, ReportInputs], Dict[str, int]]] = {
+    'producao': lambda tier, r: {'timeseries': 1},
+    'indicadores': lambda tier, r: {'bar': _indicadores(r) if tier.split else len({i.eixo for i in r.atual.indicadores})},
+    'spiders': lambda tier, r: {'spider': _eixos(r)},
+    'temas_no_tempo': lambda tier, r: {'timeseries': _temas(r) if tier.split else _eixos(r)},
+    'maturidade_no_tempo': lambda tier, r: {'timeseries': 1},
+    'indicadores_no_tempo': lambda tier, r: {'timeseries': _indicadores(r) if tier.split else _eixos(r)},
+}
+
+# segundos por gráfico antes de haver medições em esg_chart_render_seconds
+DEFAULT_CHART_SECONDS = {'plotly': 0.6, 'matplotlib': 0.12, 'svg': 0.1}
+
+def chart_seconds(kind: str, tier: RenderTier) -> float:
+    """Mean measured time of one chart of this kind in the tier's backend."""
+    backend = ('svg' if tier.svg else 'matplotlib') if tier.matplot else 'plotly'
+    measured = CHART_SECONDS.mean(kind=kind, backend=backend)
+    return measured if measured is not None else DEFAULT_CHART_SECONDS[backend]
+
+def chart_count(nome: str, tier: RenderTier, inputs: ReportInputs) -> int:
+    """Number of charts the section draws in the tier."""
+    return sum(GRAFICOS[nome](tier, inputs).values()) if nome in GRAFICOS else 0
+
+def image_budget(nome: str, tier: RenderTier, inputs: ReportInputs, budget: int = IMAGE_BUDGET_BYTES) -> int:
+    """Share of the report image budget for one section, in proportion to its charts; 0 means no budget.
+
+    The total counts every section of the complete report, not only the
+    selected ones, so a cached section PDF serves any selection.
+    """
+    total = sum(chart_count(outra, FULL, inputs) for outra in SECOES)
+    if budget <= 0 or total == 0:
+        return 0
+    return budget * chart_count(nome, tier, inputs) // total
+
+def estimate_seconds(nomes: Iterable[str], tier: RenderTier, inputs: ReportInputs) -> float:
+    """Expected time to draw the charts of the sections in the given tier."""
+    return sum(
+        quantidade * chart_seconds(kind, tier)
+        for nome in nomes if nome in GRAFICOS
+        for kind, quantidade in GRAFICOS[nome](tier, inputs).items()
     )
 
-    html_content = ''
-    html_content += comeco.render()
-    html_content += resumo_maturidade.render()
-    html_content += resumo_recomendacoes.render()
-    html_content += producao_html.render()
-    html_content += resumo_indicadores.render()
-    html_content += resumo_maturidade_final.render()
-    html_content += resumo_spiders.render()
-    html_content += tema_indicadores_html.render()
-    html_content += maturidade_html.render()
-    html_content += indicadores_html.render()
-    return write_html({'nome_empresa': dataobj.empresa.nome_empresa, "data": dataobj.empresa.data}, html_content)
+def downsample_history(valor: Any, max_pontos: Optional[int]) -> Any:
+    """Keep at most `max_pontos` evenly spaced dates (first and last included) of a time series product."""
+    if max_pontos is None or not isinstance(valor, pd.DataFrame):
+        return valor
+    coluna = 'data' if 'data' in valor.columns else 'date' if 'date' in valor.columns else None
+    if coluna is None:
+        return valor
+    datas = valor[coluna].drop_duplicates().sort_values()
+    if len(datas) <= max_pontos:
+        return valor
+    manter = datas.iloc[np.linspace(0, len(datas) - 1, max_pontos).round().astype(int)]
+    return valor[valor[coluna].isin(manter)]
+
+class TierPlan:
+    """Picks the tier of each section so that the report fits in a time budget.
+
+    Before each section the charts still to draw are priced with the measured
+    per-chart means (`esg_chart_render_seconds`); when they no longer fit in the
+    time left, the plan moves to the next cheaper tier and never back.
+    """
+
+    def __init__(self, budget: Optional[float] = None):
+        """
+        Args:
+            budget (float): Seconds for rendering the sections; None renders everything in the full tier.
+        """
+        self.budget = budget
+        self.deadline = None if budget is None else time.perf_counter() + budget
+        self.indice = 0
+        self.iniciado = False
+
+    @property
+    def tier(self) -> RenderTier:
+        """Cheapest tier used so far, which is the one the report is labelled with."""
+        return TIERS[self.indice]
+
+    def escolher(self, restantes: Sequence[str], inputs: ReportInputs) -> RenderTier:
+        if self.deadline is not None:
+            sobra = self.deadline - time.perf_counter()
+            anterior = self.indice
+            while self.indice < len(TIERS) - 1 and estimate_seconds(restantes, TIERS[self.indice], inputs) > sobra:
+                self.indice += 1
+            if self.iniciado and self.indice != anterior:
+                TIER_FALLBACKS.inc(tier=self.tier.nome)
+        self.iniciado = True
+        return self.tier
+
+def _code_digest() -> bytes:
+    # mudanças no código que gera o HTML invalidam os PDFs de seções em cache
+    digest = hashlib.sha256()
+    for modulo in ('report.main', 'report.generate_html', 'report.images', 'report.models', __name__):
+        with open(sys.modules[modulo].__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.digest()
+
+CODE_DIGEST = _code_digest()
+
+def fingerprint(valor: Any) -> bytes:
+    """Stable bytes for a product value, for hashing."""
+    if isinstance(valor, pd.DataFrame):
+        return repr(list(valor.columns)).encode() + pd.util.hash_pandas_object(valor, index=False).values.tobytes()
+    if isinstance(valor, BaseModel):
+        return valor.model_dump_json().encode()
+    if isinstance(valor, (list, tuple)):
+        return b'[' + b','.join(fingerprint(v) for v in valor) + b']'
+    return json.dumps(valor, sort_keys=True, default=str).encode()
+
+@dataclass
+class SecaoRelatorio:
+    """One selected section with the values of its products, the tier to draw it in and its image budget."""
+    nome: str
+    valores: List[Any]
+    tier: RenderTier = FULL
+    orcamento_imagens: int = 0
+
+    def render(self) -> str:
+        valores = [downsample_history(valor, self.tier.max_pontos) for valor in self.valores]
+        with stage_timer(f'section_{self.nome}'), vector_charts(self.tier.svg):
+            return SECOES[self.nome][1](self.tier, *valores).render()
+
+    def chave(self) -> str:
+        """Hash of everything the section HTML depends on."""
+        digest = hashlib.sha256(CODE_DIGEST)
+        digest.update(IMAGE_SETTINGS.encode())
+        digest.update(self.nome.encode())
+        if self.nome in GRAFICOS:
+            digest.update(f'{self.tier.nome}:{self.orcamento_imagens}'.encode())
+        for valor in self.valores:
+            digest.update(b'\0' + fingerprint(valor))
+        return digest.hexdigest()
+
+class UnknownSection(ValueError):
+    pass
+
+def select_sections(sections: Optional[Iterable[str]] = None) -> List[str]:
+    """Requested sections in document order; every section when none is given."""
+    if not sections:
+        return list(SECOES)
+    pedidas = set(sections)
+    desconhecidas = pedidas - set(SECOES)
+    if desconhecidas:
+        raise UnknownSection(f"Seções desconhecidas: {sorted(desconhecidas)}; disponíveis: {list(SECOES)}")
+    return [nome for nome in SECOES if nome in pedidas]
+
+def select_eixos(eixos: Optional[Iterable[str]] = None) -> List[str]:
+    if not eixos:
+        return list(EIXOS)
+    pedidos = {eixo.lower() for eixo in eixos}
+    desconhecidos = pedidos - set(EIXOS)
+    if desconhecidos:
+        raise UnknownSection(f"Eixos desconhecidos: {sorted(desconhecidos)}; disponíveis: {list(EIXOS)}")
+    return [eixo for eixo in EIXOS if eixo in pedidos]
+
+def required_products(sections: Optional[Iterable[str]] = None) -> Set[str]:
+    """Every data product the sections need, directly or through other products."""
+    pendentes = [dep for nome in select_sections(sections) for dep in SECOES[nome][0]]
+    necessarios: Set[str] = set()
+    while pendentes:
+        nome = pendentes.pop()
+        if nome not in necessarios:
+            necessarios.add(nome)
+            pendentes.extend(PRODUTOS[nome][0])
+    return necessarios
+
+def filter_eixos(datas: List[Data], eixos: Sequence[str]) -> List[Data]:
+    """Surveys restricted to the questions and indicators of the given eixos."""
+    if set(eixos) == set(EIXOS):
+        return datas
+    return [
+        data.model_copy(update={
+            'perguntas': [p for p in data.perguntas if p.eixo.lower() in eixos],
+            'indicadores': [i for i in data.indicadores if i.eixo.lower() in eixos],
+        })
+        for data in datas
+    ]
+
+def iter_report_sections(datas: List[Data], benchmark: Optional[dict] = None,
+                         sections: Optional[Iterable[str]] = None, eixos: Optional[Iterable[str]] = None,
+                         plano: Optional[TierPlan] = None) -> Iterator[SecaoRelatorio]:
+    """Selected sections in document order, each with its products already computed.
+
+    Products are computed the first time a section needs them, so a section
+    can be rendered (or looked up by `chave()`) before the next one is resolved.
+
+    Args:
+        datas (list): Surveys of one company, oldest first; the last one is the current report.
+        benchmark (dict): Sector benchmark, as returned by `get_sector_benchmark`.
+        sections (list): Names from `SECOES` to render; all of them by default.
+        eixos (list): Eixos to include; all of them by default.
+        plano (TierPlan): Time budget that picks each section's tier; every section is full without one.
+    """
+    nomes = select_sections(sections)
+    inputs = ReportInputs(filter_eixos(datas, select_eixos(eixos)), benchmark)
+    produtos: Dict[str, Any] = {}
+
+    def produto(nome: str) -> Any:
+        if nome not in produtos:
+            deps, calcular = PRODUTOS[nome]
+            valores = [produto(dep) for dep in deps]
+            with stage_timer(nome):
+                produtos[nome] = calcular(inputs, *valores)
+        return produtos[nome]
+
+    for i, nome in enumerate(nomes):
+        tier = plano.escolher(nomes[i:], inputs) if plano is not None else FULL
+        yield SecaoRelatorio(nome, [produto(dep) for dep in SECOES[nome][0]], tier, image_budget(nome, tier, inputs))
+
+def report_head(datas: List[Data]) -> str:
+    return html_head({'nome_empresa': datas[-1].empresa.nome_empresa, "data": datas[-1].empresa.data})
+
+def iter_report_html(datas: List[Data], benchmark: Optional[dict] = None,
+                     sections: Optional[Iterable[str]] = None, eixos: Optional[Iterable[str]] = None,
+                     plano: Optional[TierPlan] = None) -> Iterator[str]:
+    """Report HTML in pieces, in document order.
+
+    Each section is yielded as soon as it is rendered, so the caller can
+    stream it without holding the whole document. Arguments as in `iter_report_sections`.
+    """
+    yield report_head(datas)
+    for secao in iter_report_sections(datas, benchmark, sections, eixos, plano):
+        yield secao.render()
+    yield HTML_TAIL
+
+def report_generation(datas: List[Data], benchmark: Optional[dict] = None,
+                      sections: Optional[Iterable[str]] = None, eixos: Optional[Iterable[str]] = None,
+                      budget: Optional[float] = None, plano: Optional[TierPlan] = None) -> str:
+    """Whole report HTML; with a `budget` in seconds, cheaper tiers are used as needed to fit in it."""
+    if plano is None and budget is not None:
+        plano = TierPlan(budget)
+    return ''.join(iter_report_html(datas, benchmark, sections, eixos, plano))
 
 if __name__ == "__main__":
     
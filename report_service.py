@@ -0,0 +1,462 @@
+"""Geração do relatório a partir dos questionários salvos no banco.
+
+Este módulo carrega pandas, pdfkit e o pacote `report` (com matplotlib/plotly).
+`main.py` só o importa na primeira requisição de relatório, para que workers
+que servem apenas páginas e arquivos estáticos não paguem esse custo.
+
+Requisições simultâneas para a mesma empresa e o mesmo conjunto de
+questionários compartilham uma única geração do PDF (`generate_report_once`).
+
+Com pypdf instalado, o PDF é montado a partir de um PDF por seção, guardados
+em `SECTION_CACHE_DIR` pela chave de conteúdo da seção: depois de um novo
+questionário só as seções cujos dados mudaram são convertidas de novo. Quando
+o cache passa de `SECTION_CACHE_MAX_BYTES`, os PDFs usados há mais tempo (mtime)
+são removidos.
+
+As imagens do relatório seguem `report/images.py` (DPI, formato e orçamento
+`REPORT_IMAGE_BUDGET_BYTES`); no modo por seções o orçamento é dividido
+entre as seções na proporção dos seus gráficos (`report_main.image_budget`).
+
+Com `REPORT_TIME_BUDGET_SECONDS` (ou `budget` na requisição), a renderização
+troca para tiers mais baratos (`report_main.TierPlan`) para caber no tempo. Um
+PDF degradado não fica no artifact store sob a chave do relatório completo.
+"""
+from typing import Iterator, List, Optional, Tuple, cast
+import hashlib
+import os
+import tempfile
+import time
+import pandas as pd
+import pdfkit
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Survey, SurveyMeta, SurveyAmbiental, SurveyGovernanca, SurveySocial, SurveyClass
+from answer_codec import READ_VECTORS, load_company_surveys
+from sector_benchmark import get_sector_benchmark
+from indicators import InvalidIndicator, parse_indicator
+from report_main import (
+    FULL, TIERS, TierPlan, UnknownSection, iter_report_html, iter_report_sections, report_generation, required_products, select_eixos, select_sections
+)
+from report.main import html_head, HTML_TAIL
+from report.models import Data, Empresa, Pergunta, Indicador
+from report.data import report_data
+from report.images import fit_image_budget
+from database import Company, Question, SurveyInfo, SurveyAnswers
+from metrics import (
+    stage_timer, CACHE_HITS, CACHE_MISSES, HTML_BYTES, IMAGES_DOWNSCALED, PDF_BYTES, REPORT_IMAGE_BYTES, REPORT_IMAGES, REPORT_TIERS
+)
+from cache import TTLCache
+from single_flight import SingleFlight
+from artifact_store import ARTIFACTS
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    HAS_PYPDF = True
+except ImportError:
+    HAS_PYPDF = False
+    print('Instalar pypdf: pip install pypdf, para montar o PDF a partir das seções em cache.')
+
+REPORTS_DIR = os.environ.get("REPORTS_DIR", "reports")
+SECTION_CACHE_DIR = os.environ.get("SECTION_CACHE_DIR", os.path.join(REPORTS_DIR, "sections"))
+SECTION_PDFS = HAS_PYPDF and os.environ.get("SECTION_PDFS", "1") == "1"
+SECTION_CACHE_MAX_BYTES = int(os.environ.get("SECTION_CACHE_MAX_BYTES", str(512 * 1024 ** 2)))
+# PDFs usados há menos tempo que isso ficam: podem estar entre section_pdf e a montagem do relatório
+SECTION_CACHE_GRACE_SECONDS = 60
+# cabeçalho neutro: o PDF de uma seção pode ser reaproveitado por outra empresa com os mesmos dados
+SECTION_HEAD = html_head({'nome_empresa': '', 'data': ''})
+REPORTS = SingleFlight("report")
+# segundos para renderizar um relatório pedido pela API; sem valor, sempre o tier completo
+REPORT_TIME_BUDGET = float(os.environ.get("REPORT_TIME_BUDGET_SECONDS", "0")) or None
+REPORT_DATA_CACHE_TTL = float(os.environ.get("REPORT_DATA_CACHE_TTL", "60"))
+report_data_cache = TTLCache("report-data", maxsize=256, ttl=REPORT_DATA_CACHE_TTL)
+
+def get_all_surveys(metadata: SurveyMeta, db: Session) -> Tuple[List[Survey], pd.DataFrame]:
+    existing_company = db.query(Company).filter_by(
+        empresa=metadata.empresa,
+        atividade=metadata.atividade,
+        estado=metadata.estado,
+        cidade=metadata.cidade,
+    ).first()
+
+    if existing_company is None:
+        return [], pd.DataFrame()
+
+    questions = db.query(Question).all()
+    questions_df = pd.DataFrame([s.__dict__ for s in questions])
+    questions_df = questions_df.drop(columns=['_sa_instance_state'])
+
+    if READ_VECTORS:
+        # uma linha por questionário e eixo, em vez de uma por resposta
+        survey_list = load_company_surveys(db, existing_company)
+        if survey_list is not None:
+            return survey_list, questions_df
+
+    survey_data = db.query(SurveyInfo).filter_by(company_id=existing_company.id).all()
+    survey_df = pd.DataFrame([s.__dict__ for s in survey_data])
+    survey_df = survey_df.drop(columns=['_sa_instance_state'])
+
+    survey_answer_data = db.query(SurveyAnswers).filter_by(company_id=int(existing_company.id)).all()
+    survey_answer_df = pd.DataFrame([s.__dict__ for s in survey_answer_data])
+    survey_answer_df = survey_answer_df.drop(columns=['_sa_instance_state'])
+
+    df_amb_names = pd.DataFrame({k:[v] for k,v in SurveyAmbiental._name_mapping.default.items()}).T.reset_index()
+    df_amb_names.columns = ['varname', 'question_id']
+
+    df_soc_names = pd.DataFrame({k:[v] for k,v in SurveySocial._name_mapping.default.items()}).T.reset_index()
+    df_soc_names.columns = ['varname', 'question_id']
+
+    df_gov_names = pd.DataFrame({k:[v] for k,v in SurveyGovernanca._name_mapping.default.items()}).T.reset_index()
+    df_gov_names.columns = ['varname', 'question_id']
+
+    survey_list = []
+    for survey_uni_id in  survey_answer_df.survey_id.unique():
+        survey_df_date = survey_df[survey_df.id == survey_uni_id]
+        survey_answer_df_date = survey_answer_df[survey_answer_df.survey_id == survey_uni_id]
+        survey_answer_governanca_df = survey_answer_df_date[survey_answer_df_date.eixo=='governanca'][['question_id', 'answer']]
+        survey_answer_governanca_df = survey_answer_governanca_df.merge(df_gov_names, on='question_id', how='left')[['varname', 'answer']]
+        survey_answer_ambiental_df = survey_answer_df_date[survey_answer_df_date.eixo=='ambiental'][['question_id', 'answer']]
+        survey_answer_ambiental_df = survey_answer_ambiental_df.merge(df_amb_names, on='question_id', how='left')[['varname', 'answer']]
+        survey_answer_social_df = survey_answer_df_date[survey_answer_df_date.eixo=='social'][['question_id', 'answer']]
+        survey_answer_social_df = survey_answer_social_df.merge(df_soc_names, on='question_id', how='left')[['varname', 'answer']]
+        
+        social_dict = {}
+        for x in survey_answer_social_df.to_dict('records'):
+            social_dict[x['varname']] = x['answer']
+            
+        governance_dict = {}
+        for x in survey_answer_governanca_df.to_dict('records'):
+            governance_dict[x['varname']] = x['answer']
+            
+        ambiental_dict = {}
+        for x in survey_answer_ambiental_df.to_dict('records'):
+            ambiental_dict[x['varname']] = x['answer']
+            
+        survey_dict = {
+            'meta': {
+                'empresa': existing_company.empresa,
+                'atividade': existing_company.atividade,
+                'estado': existing_company.estado,
+                'cidade': existing_company.cidade,
+                'producaomes': str(survey_df_date.producaomes.iloc[0]),
+                'unidproducao': survey_df_date.unidproducao.iloc[0],
+                'data': survey_df_date.date.iloc[0].strftime('%d/%m/%Y')
+            },
+            'social': social_dict,
+            'governanca': governance_dict,
+            'ambiental': ambiental_dict
+        }
+        survey_list.append(Survey(**survey_dict))
+    return survey_list, questions_df
+
+def build_single_data_from_survey(survey: Survey, questio_df: pd.DataFrame) -> Data:
+    perguntas = []
+    indicadores = []
+    pergunta_df = questio_df[questio_df.tipo == 'Pergunta']
+    indicador_df = questio_df[questio_df.tipo == 'Indicador']
+    for eixo, survey_eixo_now in [
+            ('social', survey.social),
+            ('governanca', survey.governanca),
+            ('ambiental', survey.ambiental)
+        ]:
+        survey_eixo_now = cast(SurveyClass, survey_eixo_now)
+        pergunta_df_eixo = pergunta_df[pergunta_df.eixo_pergunta == eixo]
+        indicador_df_eixo = indicador_df[indicador_df.eixo_pergunta == eixo]
+        for _, pergunta_now in pergunta_df_eixo.iterrows():
+            perguntas.append(Pergunta(
+                nivel=int(pergunta_now.nivel),
+                name=str(pergunta_now.pergunta),
+                resposta=str(survey_eixo_now.get_by_id(pergunta_now.id)),
+                eixo=str(eixo.capitalize()),
+                tema=str(pergunta_now.tema),
+                criterio=str(pergunta_now.criterio)
+            ))
+        for _, indicador_now in indicador_df_eixo.iterrows():
+            valor = survey_eixo_now.get_by_id(indicador_now.id)
+            try:
+                # mesma regra da inserção: aceita vírgula decimal ("12,5")
+                valor = parse_indicator(valor) if valor is not None else 0.0
+            except InvalidIndicator:
+                valor = 0.0  # em branco, ou inválido em questionários anteriores à validação
+            indicadores.append(Indicador(
+                eixo=str(eixo.capitalize()),
+                item=str(indicador_now.pergunta),
+                valor=valor
+            ))
+    data = Data(
+        empresa=Empresa(
+            nome_empresa=survey.meta.empresa,
+            producaomes=survey.meta.producaomes,
+            unidproducao=survey.meta.unidproducao,
+            data=survey.meta.data.strftime('%d/%m/%Y'),
+            localizacao=f'{survey.meta.cidade} - {survey.meta.estado}'
+        ),
+        perguntas=perguntas,
+        indicadores=indicadores
+    )
+    return data
+
+def sector_benchmark_for(survey: Survey, db: Session) -> dict:
+    answers = {question_id: answer for _, question_id, answer in survey.iter_answers()}
+    with stage_timer('sector_benchmark'):
+        return get_sector_benchmark(db, survey.meta.atividade, survey.meta.estado, answers)
+
+def report_generation_wrapper(list_of_survey: List[Survey], questio_df: pd.DataFrame, benchmark: dict = None,
+                              pdf_path: str = "report.pdf", sections: Optional[List[str]] = None,
+                              eixos: Optional[List[str]] = None, plano: Optional[TierPlan] = None) -> str:
+    list_of_data = []
+    with stage_timer('build_data'):
+        for survey in list_of_survey:
+            data = build_single_data_from_survey(survey, questio_df)
+            list_of_data.append(data)
+    # grava em arquivo temporário para não expor um PDF pela metade a quem já o está servindo
+    tmp_path = f"{pdf_path}.{os.getpid()}.tmp"
+    if SECTION_PDFS:
+        assemble_section_pdfs(list_of_data, benchmark, tmp_path, sections, eixos, plano)
+        image_count = pdf_image_count(tmp_path)
+    else:
+        report_html = report_generation(list_of_data, benchmark=benchmark, sections=sections, eixos=eixos, plano=plano)
+        report_html, image_stats = fit_image_budget(report_html)
+        REPORT_IMAGE_BYTES.observe(image_stats.bytes)
+        IMAGES_DOWNSCALED.inc(image_stats.downscaled)
+        image_count = image_stats.count
+        HTML_BYTES.observe(len(report_html.encode('utf-8')))
+        with stage_timer('pdf_conversion'):
+            pdfkit.from_string(report_html, tmp_path)
+    os.replace(tmp_path, pdf_path)
+    PDF_BYTES.observe(os.path.getsize(pdf_path))
+    if image_count is not None:
+        REPORT_IMAGES.observe(image_count)
+    REPORT_TIERS.inc(tier=(plano.tier if plano is not None else FULL).nome)
+    
+    return pdf_path  # Retornando o caminho do arquivo PDF gerado
+
+def section_pdf(secao) -> Optional[str]:
+    """Path of the cached PDF of one section, converting it only on a cache miss; None for an empty section."""
+    path = os.path.join(SECTION_CACHE_DIR, f"{secao.chave()}.pdf")
+    if os.path.exists(path):
+        CACHE_HITS.inc(cache="section-pdf")
+        os.utime(path)  # mtime = último uso, para limpar os menos usados
+        return path
+    CACHE_MISSES.inc(cache="section-pdf")
+    section_html = secao.render()
+    if not section_html.strip():
+        return None  # por exemplo, benchmark sem dados do setor: não vira uma página em branco
+    section_html, image_stats = fit_image_budget(section_html, secao.orcamento_imagens)
+    IMAGES_DOWNSCALED.inc(image_stats.downscaled)
+    fd, tmp_path = tempfile.mkstemp(dir=SECTION_CACHE_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        with stage_timer(f'pdf_section_{secao.nome}'):
+            pdfkit.from_string(SECTION_HEAD + section_html + HTML_TAIL, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    prune_section_cache()
+    return path
+
+def prune_section_cache(max_bytes: int = SECTION_CACHE_MAX_BYTES) -> int:
+    """Delete the least recently used section PDFs until the cache fits in `max_bytes`; returns how many."""
+    entries = []
+    with os.scandir(SECTION_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".pdf"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # removido por outro worker
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    recent = time.time() - SECTION_CACHE_GRACE_SECONDS
+    removed = 0
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes or mtime >= recent:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+def pdf_image_count(pdf_path: str) -> Optional[int]:
+    """Number of images drawn in the PDF, or None without pypdf."""
+    if not HAS_PYPDF:
+        return None
+    return sum(len(page.images) for page in PdfReader(pdf_path).pages)
+
+def report_size(pdf_path: str) -> Tuple[int, Optional[int]]:
+    """(size in bytes, number of images) of a generated report."""
+    return os.path.getsize(pdf_path), pdf_image_count(pdf_path)
+
+def assemble_section_pdfs(datas: List[Data], benchmark: Optional[dict], pdf_path: str,
+                          sections: Optional[List[str]] = None, eixos: Optional[List[str]] = None,
+                          plano: Optional[TierPlan] = None) -> str:
+    """Write the report as the concatenation of the per-section PDFs; each section starts on a new page."""
+    os.makedirs(SECTION_CACHE_DIR, exist_ok=True)
+    paths = [section_pdf(secao) for secao in iter_report_sections(datas, benchmark, sections, eixos, plano)]
+    with stage_timer('pdf_merge'):
+        writer = PdfWriter()
+        for path in paths:
+            if path is not None:
+                writer.append(path)
+        writer.add_metadata({"/Title": f"Relatório ESG {datas[-1].empresa.nome_empresa} - {datas[-1].empresa.data}"})
+        with open(pdf_path, "wb") as f:
+            writer.write(f)
+    return pdf_path
+
+def benchmark_for_sections(survey: Survey, db: Session, sections: Optional[List[str]] = None) -> Optional[dict]:
+    """Sector benchmark, only when one of the sections depends on it."""
+    if 'benchmark' not in required_products(sections):
+        return None
+    return sector_benchmark_for(survey, db)
+
+def iter_company_report_html(metadata: SurveyMeta, db: Session, sections: Optional[List[str]] = None,
+                             eixos: Optional[List[str]] = None) -> Optional[Iterator[str]]:
+    """HTML report of a company as a stream of chunks, or None when it has no surveys.
+
+    The surveys and the sector benchmark are read before returning, so the
+    chunks no longer need the database session.
+    """
+    # valida antes de começar o stream, para a rota ainda poder responder 422
+    select_sections(sections), select_eixos(eixos)
+    with stage_timer('get_all_surveys'):
+        list_of_survey_data, question_df = get_all_surveys(metadata, db)
+    if len(list_of_survey_data) == 0:
+        return None
+    benchmark = benchmark_for_sections(list_of_survey_data[-1], db, sections)
+    with stage_timer('build_data'):
+        datas = [build_single_data_from_survey(survey, question_df) for survey in list_of_survey_data]
+    return iter_report_html(datas, benchmark, sections, eixos)
+
+def sector_version(db: Session, company: Company) -> int:
+    """Latest survey id in the company's sector; it changes whenever the sector aggregates do."""
+    return db.query(func.coalesce(func.max(SurveyInfo.id), 0)).join(Company, Company.id == SurveyInfo.company_id).filter(
+        Company.atividade == company.atividade, Company.estado == company.estado
+    ).scalar()
+
+def report_key(metadata: SurveyMeta, db: Session, with_sector: bool = True) -> Optional[Tuple[int, str]]:
+    """(company id, digest of its survey ids), or None when there is nothing to report.
+
+    With `with_sector`, the digest also covers `sector_version`, so a report
+    with the sector benchmark is not reused after peers submit new surveys.
+    """
+    company = db.query(Company).filter_by(
+        empresa=metadata.empresa,
+        atividade=metadata.atividade,
+        estado=metadata.estado,
+        cidade=metadata.cidade,
+    ).first()
+    if company is None:
+        return None
+    survey_ids = [survey_id for (survey_id,) in db.query(SurveyInfo.id).filter_by(company_id=company.id).order_by(SurveyInfo.id)]
+    if not survey_ids:
+        return None
+    conteudo = ",".join(map(str, survey_ids))
+    if with_sector:
+        conteudo += f";setor:{sector_version(db, company)}"
+    return company.id, hashlib.sha256(conteudo.encode()).hexdigest()[:16]
+
+def selection_suffix(sections: Optional[List[str]] = None, eixos: Optional[List[str]] = None) -> str:
+    """'' for the full report, otherwise a short digest of the selected sections and eixos."""
+    sections, eixos = select_sections(sections), select_eixos(eixos)
+    if sections == select_sections() and eixos == select_eixos():
+        return ""
+    return "-" + hashlib.sha256(f"{','.join(sections)};{','.join(eixos)}".encode()).hexdigest()[:8]
+
+def lookup_report(db: Session, ref: str, budget: Optional[float] = None) -> Tuple[Optional[str], Optional[str]]:
+    """(path, tier name) of a stored report; with a budget, degraded tiers also count, best first."""
+    tiers = TIERS if budget is not None else [FULL]
+    for tier in tiers:
+        path = ARTIFACTS.lookup(db, ref if tier == FULL else f"{ref}@{tier.nome}")
+        if path is not None:
+            return path, tier.nome
+    return None, None
+
+def generate_report_tiered(metadata: SurveyMeta, db: Session, sections: Optional[List[str]] = None,
+                           eixos: Optional[List[str]] = None, budget: Optional[float] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Generate the company report, sharing the work with concurrent identical requests.
+
+    Args:
+        sections (list): Sections to render (see `report_main.SECOES`); all of them by default.
+        eixos (list): Eixos to include; all of them by default.
+        budget (float): Seconds for rendering; cheaper tiers are used to fit in it. No limit by default.
+
+    The PDF is kept in the shared artifact store, so any node serves it
+    afterwards without rendering it again. A degraded PDF is stored under its
+    own ref: requests without a budget still look for (or render) the full one,
+    and requests with a budget are served the best stored tier.
+
+    Returns:
+        tuple: Path of the PDF in the artifact store and its tier name, or (None, None) when the company has no surveys.
+    """
+    suffix = selection_suffix(sections, eixos)
+    key = report_key(metadata, db, with_sector='benchmark' in required_products(sections))
+    if key is None:
+        return None, None
+    company_id, digest = key
+    ref = f"report:{company_id}-{digest}{suffix}"
+    existing, tier = lookup_report(db, ref, budget)
+    if existing is not None:
+        return existing, tier
+
+    def build() -> Tuple[Optional[str], Optional[str]]:
+        # outro worker pode ter gerado este PDF enquanto esperávamos o advisory lock
+        existing, tier = lookup_report(db, ref, budget)
+        if existing is not None:
+            return existing, tier
+        with stage_timer('get_all_surveys'):
+            list_of_survey_data, question_df = get_all_surveys(metadata, db)
+        if len(list_of_survey_data) == 0:
+            return None, None
+        benchmark = benchmark_for_sections(list_of_survey_data[-1], db, sections)
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        pdf_path = os.path.join(REPORTS_DIR, f"{company_id}-{digest}{suffix}.{os.getpid()}.pdf")
+        plano = TierPlan(budget) if budget is not None else None
+        report_generation_wrapper(list_of_survey_data, question_df, benchmark, pdf_path, sections, eixos, plano)
+        tier = plano.tier if plano is not None else FULL
+        try:
+            with stage_timer('artifact_store'):
+                stored_ref = ref if tier == FULL else f"{ref}@{tier.nome}"
+                return ARTIFACTS.put_file(db, pdf_path, "application/pdf", stored_ref), tier.nome
+        finally:
+            os.remove(pdf_path)
+
+    # só requisições com o mesmo orçamento compartilham a geração: quem não tem orçamento (a fila)
+    # não recebe o PDF degradado de uma requisição com orçamento, nem um orçamento folgado o de um apertado
+    (pdf_path, tier), _ = REPORTS.do((*key, suffix, budget), build)
+    return pdf_path, tier
+
+def generate_report_once(metadata: SurveyMeta, db: Session, sections: Optional[List[str]] = None,
+                         eixos: Optional[List[str]] = None) -> Optional[str]:
+    """Full-quality report PDF, as in `generate_report_tiered` without a time budget.
+
+    Returns:
+        str: Path of the PDF in the artifact store, or None when the company has no surveys.
+    """
+    pdf_path, _ = generate_report_tiered(metadata, db, sections, eixos)
+    return pdf_path
+
+def company_report_data(metadata: SurveyMeta, db: Session) -> Optional[dict]:
+    """Report contents as JSON-ready data (no charts rendered), or None when the company has no surveys.
+
+    Cached per company and survey set, like the PDF.
+    """
+    key = report_key(metadata, db)
+    if key is None:
+        return None
+
+    def compute() -> Optional[dict]:
+        with stage_timer('get_all_surveys'):
+            list_of_survey_data, question_df = get_all_surveys(metadata, db)
+        if len(list_of_survey_data) == 0:
+            return None
+        benchmark = sector_benchmark_for(list_of_survey_data[-1], db)
+        with stage_timer('build_data'):
+            datas = [build_single_data_from_survey(survey, question_df) for survey in list_of_survey_data]
+        with stage_timer('report_data'):
+            return report_data(datas, benchmark)
+
+    return report_data_cache.get_or_compute(key, compute)
@@ -0,0 +1,89 @@
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+from analytics import PERIODOS, blocking_questions, indicator_distribution, indicator_trends, maturity_distribution
+from cache import TTLCache
+from database import get_db
+
+ANALYTICS_CACHE_TTL = float(os.environ.get("ANALYTICS_CACHE_TTL", "300"))
+
+router = APIRouter(prefix="/analytics")
+
+analytics_cache = TTLCache("analytics", maxsize=512, ttl=ANALYTICS_CACHE_TTL)
+
+def cached_response(key, compute):
+    result = analytics_cache.get_or_compute(key, compute)
+    return JSONResponse(result, headers={"Cache-Control": f"private, max-age={int(ANALYTICS_CACHE_TTL)}"})
+
+# rotas síncronas: o FastAPI executa em threadpool e as consultas não bloqueiam o event loop
+@router.get("/maturity-distribution")
+def get_maturity_distribution(
+    eixo: Optional[str] = None,
+    atividade: Optional[str] = None,
+    estado: Optional[str] = None,
+    latest_only: bool = True,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    key = ("maturity-distribution", eixo, atividade, estado, latest_only, limit, offset)
+    return cached_response(key, lambda: maturity_distribution(
+        db, eixo=eixo, atividade=atividade, estado=estado, latest_only=latest_only, limit=limit, offset=offset
+    ))
+
+@router.get("/blocking-questions")
+def get_blocking_questions(
+    eixo: Optional[str] = None,
+    por_tema: bool = True,
+    atividade: Optional[str] = None,
+    estado: Optional[str] = None,
+    latest_only: bool = True,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    key = ("blocking-questions", eixo, por_tema, atividade, estado, latest_only, limit, offset)
+    return cached_response(key, lambda: blocking_questions(
+        db, eixo=eixo, por_tema=por_tema, atividade=atividade, estado=estado,
+        latest_only=latest_only, limit=limit, offset=offset
+    ))
+
+@router.get("/indicator-trends")
+def get_indicator_trends(
+    question_id: Optional[int] = None,
+    eixo: Optional[str] = None,
+    periodo: str = "month",
+    atividade: Optional[str] = None,
+    estado: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    if periodo not in PERIODOS:
+        raise HTTPException(status_code=422, detail=f"periodo deve ser um de {PERIODOS}")
+    key = ("indicator-trends", question_id, eixo, periodo, atividade, estado, limit, offset)
+    return cached_response(key, lambda: indicator_trends(
+        db, question_id=question_id, eixo=eixo, periodo=periodo, atividade=atividade,
+        estado=estado, limit=limit, offset=offset
+    ))
+
+@router.get("/indicator-distribution")
+def get_indicator_distribution(
+    question_id: Optional[int] = None,
+    eixo: Optional[str] = None,
+    atividade: Optional[str] = None,
+    estado: Optional[str] = None,
+    latest_only: bool = True,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    key = ("indicator-distribution", question_id, eixo, atividade, estado, latest_only, limit, offset)
+    return cached_response(key, lambda: indicator_distribution(
+        db, question_id=question_id, eixo=eixo, atividade=atividade, estado=estado,
+        latest_only=latest_only, limit=limit, offset=offset
+    ))
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from database import get_db
+from drafts import DraftError, DraftNotFound, apply_delta, create_draft, draft_as_survey, get_draft
+from models import SurveyDraftDelta
+
+router = APIRouter(prefix="/drafts")
+
+# o envio final (POST /drafts/{token}/submit) fica em main.py, junto da geração do relatório
+
+@router.post("")
+def post_draft(delta: SurveyDraftDelta = SurveyDraftDelta(), db: Session = Depends(get_db)):
+    try:
+        draft = create_draft(db, delta)
+    except DraftError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"token": draft.token, "version": draft.version}
+
+@router.get("/{token}")
+def read_draft(token: str, db: Session = Depends(get_db)):
+    try:
+        return draft_as_survey(get_draft(db, token))
+    except DraftNotFound:
+        raise HTTPException(status_code=404, detail="Draft not found")
+
+@router.patch("/{token}")
+def patch_draft(token: str, delta: SurveyDraftDelta, db: Session = Depends(get_db)):
+    try:
+        version = apply_delta(db, token, delta)
+    except DraftNotFound:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    except DraftError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"token": token, "version": version}
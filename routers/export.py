@@ -0,0 +1,34 @@
+from datetime import date, datetime, time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from data_export import BATCH_SIZE, FORMATS, ExportError, iter_export
+
+router = APIRouter()
+
+def _start_of(day: Optional[date]) -> Optional[datetime]:
+    return datetime.combine(day, time.min) if day is not None else None
+
+# o gerador é síncrono: o Starlette o consome em threadpool, sem bloquear o event loop
+@router.get("/export")
+def export_answers(
+    format: str = Query("csv", pattern="^(csv|arrow|parquet)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    atividade: Optional[str] = None,
+    estado: Optional[str] = None,
+    empresa: Optional[str] = None,
+    company_id: Optional[int] = None,
+    batch_size: int = Query(BATCH_SIZE, ge=100, le=50000),
+):
+    try:
+        chunks = iter_export(format, batch_size, start=_start_of(start), end=_start_of(end), atividade=atividade,
+                             estado=estado, empresa=empresa, company_id=company_id)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type, extension = FORMATS[format]
+    return StreamingResponse(chunks, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="survey_answers.{extension}"',
+    })
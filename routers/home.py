@@ -1,14 +1,18 @@
 from fastapi import APIRouter, Request
-from fastapi.templating import Jinja2Templates
 
-router = APIRouter()
+from page_cache import PAGE_CACHE
 
-templates = Jinja2Templates(directory="templates")
+router = APIRouter()
 
 @router.get("/")
 async def get_home(request: Request):
-    return templates.TemplateResponse("home.html", {"request": request})
+    return PAGE_CACHE.response(request, "home.html")
 
 @router.get("/home.html")
 async def get_home(request: Request):
-    return templates.TemplateResponse("home.html", {"request": request})
+    return PAGE_CACHE.response(request, "home.html")
+
+@router.get("/report.html")
+async def get_report(request: Request):
+    # página estática: os dados vêm de /report-data e os gráficos são desenhados no navegador
+    return PAGE_CACHE.response(request, "report.html")
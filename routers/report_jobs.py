@@ -0,0 +1,47 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from artifact_store import ARTIFACTS
+from database import ReportJob, get_db
+from models import SurveyMeta
+from report_jobs import enqueue_report_job, job_status
+from streaming import file_response
+
+router = APIRouter(prefix="/report-jobs")
+
+# só enfileira e consulta: a geração roda em worker.py, fora do servidor web
+
+@router.post("")
+def post_report_job(metadata: SurveyMeta, sections: Optional[List[str]] = Query(None),
+                    eixos: Optional[List[str]] = Query(None), db: Session = Depends(get_db)):
+    job = enqueue_report_job(db, metadata.model_dump(), sections, eixos)
+    return JSONResponse(jsonable_encoder(job_status(job)), status_code=202,
+                        headers={"Location": f"/report-jobs/{job.id}"})
+
+def _get_job(db: Session, job_id: int) -> ReportJob:
+    job = db.get(ReportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+@router.get("/{job_id}")
+def read_report_job(job_id: int, db: Session = Depends(get_db)):
+    return job_status(_get_job(db, job_id))
+
+@router.get("/{job_id}/pdf")
+def read_report_job_pdf(job_id: int, request: Request, db: Session = Depends(get_db)):
+    job = _get_job(db, job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Report job is {job.status}")
+    if job.result is None:
+        return {"message": "No survey data found"}
+    try:
+        return file_response(request, job.result, "report.pdf", "application/pdf",
+                             accel_redirect=ARTIFACTS.accel_redirect(job.result))
+    except FileNotFoundError:
+        # removido do artifact store por falta de espaço: é preciso enfileirar de novo
+        raise HTTPException(status_code=410, detail="Report was evicted, enqueue it again")
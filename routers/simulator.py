@@ -0,0 +1,21 @@
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import SurveyMeta
+from simulator import InvalidFlip, simulate
+
+router = APIRouter(prefix="/simulator")
+
+@router.post("")
+def post_simulation(metadata: SurveyMeta, flips: Dict[int, Optional[str]] = Body({}), db: Session = Depends(get_db)):
+    """Levels of the company's latest survey with `flips` ({question_id: "0" | "1" | "2" | null}) applied."""
+    try:
+        result = simulate(db, metadata, flips)
+    except InvalidFlip as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if result is None:
+        return {"message": "No survey data found"}
+    return result
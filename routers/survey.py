@@ -1,34 +1,41 @@
 from fastapi import APIRouter, Request
-from fastapi.templating import Jinja2Templates
+
+from page_cache import PAGE_CACHE
+from survey_form import DATA_FILES, PILARES, form_schema
 
 router = APIRouter()
 
-templates = Jinja2Templates(directory="templates")
+# um único template para os três pilares, montado a partir de survey_form.form_schema
+PILAR_TEMPLATE = "survey/survey_pilar.html"
+PAGE_CACHE.templates.env.globals["survey_form_schema"] = form_schema
+PAGE_CACHE.watch(PILAR_TEMPLATE, *DATA_FILES)
+for pilar in PILARES:
+    PAGE_CACHE.register(PILAR_TEMPLATE, pilar=pilar)
 
 @router.get("/survey/survey_begin.html")
 async def get_survey_begin(request: Request):
-    return templates.TemplateResponse("survey/survey_begin.html", {"request": request})
+    return PAGE_CACHE.response(request, "survey/survey_begin.html")
 
 @router.get("/survey/survey_consent.html")
 async def get_survey_consent(request: Request):
-    return templates.TemplateResponse("survey/survey_consent.html", {"request": request})
+    return PAGE_CACHE.response(request, "survey/survey_consent.html")
 
 @router.get("/survey/survey_end.html")
 async def get_survey_end(request: Request):
-    return templates.TemplateResponse("survey/survey_end.html", {"request": request})
+    return PAGE_CACHE.response(request, "survey/survey_end.html")
 
 @router.get("/survey/survey_PilarAmbiental.html")
 async def get_survey_PilarAmbiental(request: Request):
-    return templates.TemplateResponse("survey/survey_PilarAmbiental.html", {"request": request})
+    return PAGE_CACHE.response(request, PILAR_TEMPLATE, pilar="ambiental")
 
 @router.get("/survey/survey_PilarGovernanca.html")
 async def get_survey_PilarGovernanca(request: Request):
-    return templates.TemplateResponse("survey/survey_PilarGovernanca.html", {"request": request})
+    return PAGE_CACHE.response(request, PILAR_TEMPLATE, pilar="governanca")
 
 @router.get("/survey/survey_PilarSocial.html")
 async def get_survey_PilarSocial(request: Request):
-    return templates.TemplateResponse("survey/survey_PilarSocial.html", {"request": request})
+    return PAGE_CACHE.response(request, PILAR_TEMPLATE, pilar="social")
 
 @router.get("/survey/survey_registration.html")
 async def get_survey_registration(request: Request):
-    return templates.TemplateResponse("survey/survey_registration.html", {"request": request})
\ No newline at end of file
+    return PAGE_CACHE.response(request, "survey/survey_registration.html")
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""Benchmark setorial com agregados mantidos incrementalmente.
+
+Cada empresa conta uma vez no seu setor (mesma atividade/estado), com o seu
+questionário mais recente: ao inserir um novo questionário, a contribuição do
+anterior é removida e a do novo é somada, na mesma transação.
+
+Para reconstruir os agregados do zero (compactação periódica, por exemplo via
+cron, e uma vez ao implantar em uma base que já tem questionários):
+
+    python sector_benchmark.py
+"""
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import (
+    SessionLocal, Question, Company, SurveyInfo, SurveyAnswers,
+    SectorIndicatorAggregate, SectorMaturityAggregate
+)
+from answer_codec import READ_VECTORS, load_survey_answers
+from indicators import InvalidIndicator, parse_indicator
+from report.scoring import score_perguntas
+
+# histograma logarítmico: cada bucket cobre um fator de 5% nos valores
+BUCKET_GAMMA = 1.05
+BUCKET_OFFSET = 100000
+NIVEIS = range(1, 6)
+RESPOSTAS_VALIDAS = {"0", "1", "2"}
+
+def indicator_bucket(valor: float) -> int:
+    """Monotonic bucket index of a value in the logarithmic histogram."""
+    if valor == 0:
+        return 0
+    k = BUCKET_OFFSET + math.floor(math.log(abs(valor)) / math.log(BUCKET_GAMMA))
+    return k if valor > 0 else -k
+
+def percentile_rank(buckets: Dict[str, int], count: int, valor: float) -> Optional[float]:
+    """Percentage of the sector below `valor` (ties count as half)."""
+    if not count:
+        return None
+    key = indicator_bucket(valor)
+    below = sum(c for k, c in buckets.items() if int(k) < key)
+    same = buckets.get(str(key), 0)
+    return 100.0 * (below + 0.5 * same) / count
+
+def load_catalog(db: Session) -> Dict[int, Question]:
+    return {question.id: question for question in db.query(Question).all()}
+
+def survey_contribution(answers: Dict[int, Any], catalog: Dict[int, Question]) -> Tuple[Dict[int, float], Dict[Tuple[str, str], int]]:
+    """Indicator values and maturity levels that one survey adds to its sector.
+
+    Args:
+        answers (dict): {question_id: answer} of a survey.
+        catalog (dict): {question_id: Question}.
+
+    Returns:
+        tuple: ({question_id: valor}, {(eixo, tema): nivel}), with tema '' for the eixo level.
+    """
+    indicadores = {}
+    perguntas = []
+    for question_id, answer in answers.items():
+        question = catalog.get(question_id)
+        if question is None:
+            continue
+        if question.tipo == 'Indicador':
+            try:
+                indicadores[question_id] = parse_indicator(answer)
+            except InvalidIndicator:
+                continue
+        elif question.tipo == 'Pergunta' and str(answer).strip() in RESPOSTAS_VALIDAS:
+            perguntas.append((question.eixo_pergunta, question.tema, question.nivel, str(answer).strip()))
+    niveis_eixo, niveis_tema = score_perguntas(perguntas)
+    niveis = {(eixo, ''): nivel for eixo, nivel in niveis_eixo.items()}
+    niveis.update(niveis_tema)
+    return indicadores, niveis
+
+def _locked_row(db: Session, model, initial: Dict[str, Any], **keys):
+    row = db.query(model).filter_by(**keys).with_for_update().first()
+    if row is None:
+        try:
+            with db.begin_nested():
+                row = model(**keys, **initial)
+                db.add(row)
+        except IntegrityError:
+            # outra transação criou a mesma linha
+            row = db.query(model).filter_by(**keys).with_for_update().one()
+    return row
+
+def _existing_row(db: Session, model, initial: Dict[str, Any], **keys):
+    # para subtrair: uma linha que não existe nunca recebeu a contribuição
+    return db.query(model).filter_by(**keys).with_for_update().first()
+
+def apply_contribution(db: Session, atividade: str, estado: str, indicadores: Dict[int, float],
+                       niveis: Dict[Tuple[str, str], int], sign: int = 1):
+    locked_row = _locked_row if sign > 0 else _existing_row
+    # ordem fixa das linhas para evitar deadlock entre transações concorrentes
+    for question_id in sorted(indicadores):
+        valor = indicadores[question_id]
+        row = locked_row(db, SectorIndicatorAggregate, {'count': 0, 'total': 0.0, 'buckets': {}},
+                         atividade=atividade, estado=estado, question_id=question_id)
+        if row is None:
+            continue
+        buckets = dict(row.buckets or {})
+        key = str(indicator_bucket(valor))
+        buckets[key] = buckets.get(key, 0) + sign
+        if buckets[key] <= 0:
+            del buckets[key]
+        row.buckets = buckets
+        row.count = max(0, row.count + sign)
+        row.total = row.total + sign * valor
+    for eixo, tema in sorted(niveis):
+        nivel = niveis[(eixo, tema)]
+        row = locked_row(db, SectorMaturityAggregate, {f'nivel_{n}': 0 for n in NIVEIS},
+                         atividade=atividade, estado=estado, eixo=eixo, tema=tema)
+        if row is None:
+            continue
+        setattr(row, f'nivel_{nivel}', max(0, getattr(row, f'nivel_{nivel}') + sign))
+
+def survey_answers(db: Session, survey_id: int) -> Dict[int, Any]:
+    if READ_VECTORS:
+        answers = load_survey_answers(db, [survey_id])[survey_id]
+        if answers:
+            return answers
+    # questionário gravado antes dos vetores (ou ANSWER_STORAGE=rows)
+    return dict(db.query(SurveyAnswers.question_id, SurveyAnswers.answer).filter_by(survey_id=survey_id).all())
+
+def lock_company(db: Session, company: Company):
+    """Serialize concurrent surveys of the same company until the transaction commits.
+
+    Must be taken before the new `survey_info` is inserted, so the survey
+    seen as the previous one by `update_sector_aggregates` is the one whose
+    contribution is already in the aggregates.
+    """
+    db.query(Company).filter_by(id=company.id).with_for_update().one()
+
+def update_sector_aggregates(db: Session, company: Company, survey_id: int, answers: Dict[int, Any]) -> Tuple[Dict[int, float], Dict[Tuple[str, str], int]]:
+    """Replace the company's previous contribution to its sector with the new survey.
+
+    Must run in the same transaction that inserts the survey, after
+    `lock_company`; the caller commits.
+
+    Returns:
+        tuple: the new survey contribution, as returned by `survey_contribution`.
+    """
+    catalog = load_catalog(db)
+    previous_id = db.query(func.max(SurveyInfo.id)).filter(
+        SurveyInfo.company_id == company.id, SurveyInfo.id < survey_id
+    ).scalar()
+    if previous_id is not None:
+        apply_contribution(db, company.atividade, company.estado,
+                           *survey_contribution(survey_answers(db, previous_id), catalog), sign=-1)
+    contribution = survey_contribution(answers, catalog)
+    apply_contribution(db, company.atividade, company.estado, *contribution, sign=1)
+    return contribution
+
+def rebuild_sector_aggregates(db: Session):
+    """Recompute every sector aggregate from the latest survey of each company."""
+    db.query(SectorIndicatorAggregate).delete()
+    db.query(SectorMaturityAggregate).delete()
+    catalog = load_catalog(db)
+    latest = db.query(SurveyInfo.company_id, func.max(SurveyInfo.id).label('survey_id')).group_by(SurveyInfo.company_id).subquery()
+    rows = db.query(Company, latest.c.survey_id).join(latest, latest.c.company_id == Company.id).all()
+    for company, survey_id in rows:
+        apply_contribution(db, company.atividade, company.estado,
+                           *survey_contribution(survey_answers(db, survey_id), catalog), sign=1)
+    db.commit()
+
+def get_sector_benchmark(db: Session, atividade: str, estado: str, answers: Dict[int, Any]) -> Dict[str, Any]:
+    """Peer comparison of one survey against its sector aggregates.
+
+    Returns:
+        dict: sector, per-indicator percentiles and per eixo/tema maturity distributions.
+    """
+    catalog = load_catalog(db)
+    indicadores, niveis = survey_contribution(answers, catalog)
+    indicator_rows = {
+        row.question_id: row for row in
+        db.query(SectorIndicatorAggregate).filter_by(atividade=atividade, estado=estado).all()
+    }
+    maturity_rows = {
+        (row.eixo, row.tema): row for row in
+        db.query(SectorMaturityAggregate).filter_by(atividade=atividade, estado=estado).all()
+    }
+
+    indicadores_list: List[Dict[str, Any]] = []
+    for question_id in sorted(indicadores):
+        row = indicator_rows.get(question_id)
+        if row is None or not row.count:
+            continue
+        question = catalog[question_id]
+        indicadores_list.append({
+            'eixo': question.eixo_pergunta,
+            'item': question.pergunta,
+            'valor': indicadores[question_id],
+            'media': row.total / row.count,
+            'percentil': percentile_rank(row.buckets or {}, row.count, indicadores[question_id]),
+            'empresas': row.count,
+        })
+
+    maturidade_list: List[Dict[str, Any]] = []
+    for eixo, tema in sorted(niveis):
+        row = maturity_rows.get((eixo, tema))
+        if row is None:
+            continue
+        contagens = [getattr(row, f'nivel_{n}') for n in NIVEIS]
+        total = sum(contagens)
+        if not total:
+            continue
+        maturidade_list.append({
+            'eixo': eixo,
+            'tema': tema,
+            'nivel': niveis[(eixo, tema)],
+            'distribuicao': [100.0 * c / total for c in contagens],
+            'empresas': total,
+        })
+
+    return {
+        'setor': {'atividade': atividade, 'estado': estado},
+        'indicadores': indicadores_list,
+        'maturidade': maturidade_list,
+    }
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        rebuild_sector_aggregates(db)
+    finally:
+        db.close()
@@ -0,0 +1,99 @@
+"""Simulador de maturidade: e se estas perguntas tivessem outra resposta?
+
+O estado de pontuação do último questionário da empresa (`ScoringState`) fica
+em cache por questionário. Cada simulação aplica as mudanças a uma cópia desse
+estado, mexendo só nos contadores do eixo e do tema de cada pergunta alterada,
+e responde em milissegundos. Para cada eixo e tema devolve o nível simulado e
+o menor conjunto de perguntas que precisam virar "Sim" para chegar ao próximo.
+"""
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from database import Company, Question, SurveyInfo
+from metrics import stage_timer
+from models import SurveyMeta
+from report.scoring import Grupo, ScoringState
+from sector_benchmark import survey_answers
+
+SIMULATOR_CACHE_TTL = float(os.environ.get("SIMULATOR_CACHE_TTL", "600"))
+RESPOSTAS_VALIDAS = {"0", "1", "2"}
+
+# as respostas de um questionário gravado não mudam; o TTL só acompanha mudanças no catálogo
+simulator_states = TTLCache("simulator", maxsize=256, ttl=SIMULATOR_CACHE_TTL)
+
+class InvalidFlip(ValueError):
+    pass
+
+def latest_survey_id(db: Session, metadata: SurveyMeta) -> Optional[int]:
+    company = db.query(Company).filter_by(
+        empresa=metadata.empresa,
+        atividade=metadata.atividade,
+        estado=metadata.estado,
+        cidade=metadata.cidade,
+    ).first()
+    if company is None:
+        return None
+    return db.query(func.max(SurveyInfo.id)).filter(SurveyInfo.company_id == company.id).scalar()
+
+def _load_state(db: Session, survey_id: int) -> Tuple[ScoringState, Dict[int, str]]:
+    perguntas = db.query(Question.id, Question.eixo_pergunta, Question.tema, Question.nivel, Question.pergunta).filter(
+        Question.tipo == 'Pergunta'
+    ).all()
+    catalogo = {row.id: (row.eixo_pergunta, row.tema, row.nivel) for row in perguntas}
+    textos = {row.id: row.pergunta for row in perguntas}
+    return ScoringState(catalogo, survey_answers(db, survey_id)), textos
+
+def survey_state(db: Session, survey_id: int) -> Tuple[ScoringState, Dict[int, str]]:
+    """Scoring state of a survey and the text of each question; shared, so never modify it."""
+    return simulator_states.get_or_compute(survey_id, lambda: _load_state(db, survey_id))
+
+def _grupo(state: ScoringState, base: ScoringState, textos: Dict[int, str], grupo: Grupo) -> Dict[str, Any]:
+    eixo, tema = grupo
+    proximo = state.proximo_nivel(grupo)
+    return {
+        'eixo': eixo,
+        'tema': tema or None,
+        'nivel': state.nivel(grupo),
+        'nivel_original': base.nivel(grupo),
+        'proximo': None if proximo is None else {
+            'nivel': proximo[0],
+            'perguntas': [{
+                'question_id': question_id,
+                'nivel': state.catalogo[question_id][2],
+                'pergunta': textos[question_id],
+                'resposta': state.respostas.get(question_id),
+            } for question_id in proximo[1]],
+        },
+    }
+
+def simulate(db: Session, metadata: SurveyMeta, flips: Dict[int, Optional[str]]) -> Optional[Dict[str, Any]]:
+    """Maturity levels of the company's latest survey with some answers changed.
+
+    Args:
+        flips (dict): {question_id: "0" (Sim), "1" (Não), "2" (Não Aplicado) or None (sem resposta)}.
+
+    Returns:
+        dict: Simulated and original level of every eixo (tema None) and tema, with the
+        questions to answer "Sim" to reach the next level; None when the company has no surveys.
+    """
+    survey_id = latest_survey_id(db, metadata)
+    if survey_id is None:
+        return None
+    base, textos = survey_state(db, survey_id)
+    for question_id, resposta in flips.items():
+        if question_id not in base.catalogo:
+            raise InvalidFlip(f"Pergunta de maturidade desconhecida: {question_id}")
+        if resposta is not None and str(resposta).strip() not in RESPOSTAS_VALIDAS:
+            raise InvalidFlip(f"Resposta inválida para a pergunta {question_id}: {resposta!r}")
+    with stage_timer('simulator'):
+        state = base.copy()
+        for question_id, resposta in flips.items():
+            state.set_resposta(question_id, None if resposta is None else str(resposta).strip())
+        return {
+            'survey_id': survey_id,
+            'niveis': [_grupo(state, base, textos, grupo) for grupo in sorted(state.todos_grupos())],
+        }
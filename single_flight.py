@@ -0,0 +1,96 @@
+"""Execução única (single-flight) de trabalhos idênticos e concorrentes.
+
+No mesmo processo, chamadas com a mesma chave esperam a primeira e recebem o
+mesmo resultado. Entre workers, a chave vira um advisory lock de sessão do
+Postgres: o worker que chega depois espera o primeiro terminar e então executa
+`fn`, que deve reaproveitar o que o primeiro gravou (o questionário já inserido,
+o PDF já gerado) em vez de refazer o trabalho. Com SQLite o lock é um `flock`
+num arquivo local, o que basta para os processos de uma única máquina.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from sqlalchemy import func, select
+
+from database import engine
+from metrics import SINGLE_FLIGHT_SHARED
+
+def lock_id(key: str) -> int:
+    """64-bit signed id for pg_advisory_lock derived from a string key."""
+    return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big", signed=True)
+
+@contextmanager
+def _file_lock(key: str):
+    # SQLite: um nó só, então um flock num arquivo temporário coordena os processos da máquina
+    import fcntl
+    path = os.path.join(tempfile.gettempdir(), f"esg-flight-{lock_id(key) & 0xFFFFFFFFFFFFFFFF:016x}.lock")
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+@contextmanager
+def advisory_lock(key: str):
+    """Hold a Postgres session advisory lock on `key` (on a dedicated connection) for the block."""
+    if engine.dialect.name == "sqlite":
+        with _file_lock(key):
+            yield
+        return
+    with engine.connect() as conn:
+        conn.execute(select(func.pg_advisory_lock(lock_id(key))))
+        try:
+            yield
+        finally:
+            conn.execute(select(func.pg_advisory_unlock(lock_id(key))))
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+class SingleFlight:
+    """Run at most one `fn` per key at a time, sharing its result with concurrent callers."""
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): Flight name, used as the advisory lock namespace and the metric label.
+        """
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run `fn` or wait for the in-flight call with the same key.
+
+        Returns:
+            tuple: (result, shared), `shared` is True when another thread computed the result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            SINGLE_FLIGHT_SHARED.inc(flight=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            with advisory_lock(f"{self.name}:{key}"):
+                call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
@@ -1,4 +1,3 @@
-import requests
 import json
 
 content = {
@@ -243,7 +242,10 @@ content = {
     }
 }
 
-for data in ["01/06/2024", "01/07/2024","01/08/2024"]:
-    content["meta"]["data"] = data
-    response = requests.post("http://localhost:8000/submit-survey", data=content)
-    print(response.json())
+if __name__ == "__main__":
+    import requests
+
+    for data in ["01/06/2024", "01/07/2024","01/08/2024"]:
+        content["meta"]["data"] = data
+        response = requests.post("http://localhost:8000/submit-survey", data=content)
+        print(response.json())
@@ -0,0 +1 @@
+(function(){var root=document.getElementById('report');var chartId=0;function el(tag,text){var node=document.createElement(tag);if(text!==undefined){node.textContent=text;}root.appendChild(node);return node;}function capitalize(text){return text.charAt(0).toUpperCase()+text.slice(1);}function table(headers,rows){var node=el('table');var head=node.insertRow();headers.forEach(function(header){var th=document.createElement('th');th.textContent=header;head.appendChild(th);});rows.forEach(function(row){var tr=node.insertRow();row.forEach(function(cell){tr.insertCell().textContent=cell;});});}function list(items){var ul=el('ul');items.forEach(function(item){var li=document.createElement('li');li.textContent=item;ul.appendChild(li);});}function chart(traces,layout){var node=el('div');node.className='chart';node.id='chart-'+(chartId+=1);Plotly.newPlot(node,traces,Object.assign({margin:{t:30}},layout||{}),{responsive:true,displaylogo:false});}function lines(datas,series,ytitle){chart(Object.keys(series).map(function(name){return{x:datas,y:series[name],name:capitalize(name),type:'scatter',mode:'lines+markers',connectgaps:true};}),{xaxis:{title:'Data'},yaxis:{title:ytitle}});}function datasIso(datas){return datas.map(function(data){return data.split('/').reverse().join('-');});}function render(data){var datas=datasIso(data.series.datas);el('h1','Relatório ESG - '+data.empresa.nome_empresa);el('p','Data: '+data.empresa.data);el('p','Localização: '+data.empresa.localizacao);el('h2','Resumo de Maturidade ESG');table(['Aspecto','Nível de Maturidade','Descrição'],data.maturidade.map(function(m){return[capitalize(m.eixo),m.nivel,m.descricao];}));el('h2','Resumo de Recomendações');Object.keys(data.recomendacoes).forEach(function(eixo){el('p',capitalize(eixo)+':').style.fontWeight='bold';list(data.recomendacoes[eixo]);});el('h2','Produção');lines(datas,{producao:data.series.producao},'Produção '+data.empresa.unidproducao);var eixosIndicadores={};data.indicadores.forEach(function(i){(eixosIndicadores[i.eixo]=eixosIndicadores[i.eixo]||[]).push(i);});Object.keys(eixosIndicadores).forEach(function(eixo){el('h2','Indicadores '+capitalize(eixo));chart([{type:'bar',orientation:'h',x:eixosIndicadores[eixo].map(function(i){return i.valor;}),y:eixosIndicadores[eixo].map(function(i){return i.item;})}],{xaxis:{title:'Resultado'},yaxis:{automargin:true}});});if(data.benchmark){var setor=data.benchmark.setor;el('h2','Comparação com o Setor');el('p','Empresas da mesma atividade ('+setor.atividade+') e estado ('+setor.estado+').');if(data.benchmark.indicadores.length){table(['Aspecto','Indicador','Valor','Média do setor','Percentil no setor','Empresas'],data.benchmark.indicadores.map(function(i){return[capitalize(i.eixo),i.item,i.valor.toFixed(2),i.media.toFixed(2),i.percentil.toFixed(0)+'%',i.empresas];}));}}var final=data.maturidade_final;el('h2','Maturidade Final');el('p','Nível de Maturidade: '+final.nivel+'. Estágio: '+final.titulo);el('p',final.descricao);list(final.recomendacoes);data.maturidade.forEach(function(m){var temas=data.temas.filter(function(t){return t.eixo===m.eixo;});el('h2','Resultado de Maturidade dos Temas do Aspecto '+capitalize(m.eixo));chart([{type:'scatterpolar',fill:'toself',r:temas.map(function(t){return t.nivel;}),theta:temas.map(function(t){return t.tema;})}],{polar:{radialaxis:{range:[0,5]}},showlegend:false});});Object.keys(data.series.temas).forEach(function(eixo){el('h2','Temas de Maturidade '+capitalize(eixo)+' no tempo');lines(datas,data.series.temas[eixo],'Nível');});el('h2','Maturidade no tempo');lines(datas,data.series.maturidade,'Nível');Object.keys(data.series.indicadores).forEach(function(eixo){el('h2','Indicadores '+capitalize(eixo)+' no tempo');lines(datas,data.series.indicadores[eixo],'Valor');});}fetch('/report-data'+window.location.search).then(function(response){if(!response.ok){throw new Error(response.status);}return response.json();}).then(function(data){document.getElementById('report-status').remove();render(data);}).catch(function(){document.getElementById('report-status').textContent='Nenhum questionário encontrado para esta empresa.';});})();
@@ -0,0 +1,212 @@
+/* Formulário dos pilares montado a partir do esquema em #survey-schema (gerado por survey_form.py).
+   Todas as respostas ficam em um único item JSON do localStorage ("survey_answers"), lido por survey_end.html.
+   Cada alteração também é enviada ao servidor como delta (PATCH /drafts/{token}) para retomar o
+   questionário em outro dispositivo com ?draft=TOKEN; o token fica em "survey_draft".
+   Versão minificada servida pelas páginas: survey_form.min.js */
+(function () {
+    var STORAGE_KEY = 'survey_answers';
+    var DRAFT_KEY = 'survey_draft';
+    var AUTOSAVE_DELAY = 800;
+    var OPCOES = [['sim', '0', 'Sim'], ['nao', '1', 'Não'], ['np', '2', 'Não Aplicado']];
+    var schema = JSON.parse(document.getElementById('survey-schema').textContent);
+    var pending = {};
+    var timer = null;
+    var saving = null;
+
+    function loadAnswers() {
+        try {
+            return JSON.parse(localStorage.getItem(STORAGE_KEY)) || {};
+        } catch (e) {
+            return {};
+        }
+    }
+
+    function el(tag, attrs, text) {
+        var node = document.createElement(tag);
+        Object.keys(attrs).forEach(function (key) {
+            node.setAttribute(key, attrs[key]);
+        });
+        if (text !== undefined) {
+            node.textContent = text;
+        }
+        return node;
+    }
+
+    function heading(fragment, tag, text) {
+        fragment.appendChild(el('br', {}));
+        fragment.appendChild(el('br', {}));
+        fragment.appendChild(el(tag, {}, text));
+    }
+
+    function render() {
+        var saved = loadAnswers()[schema.eixo] || {};
+        var fragment = document.createDocumentFragment();
+        var numero = 0;
+        schema.secoes.forEach(function (secao) {
+            if (secao.secao) {
+                heading(fragment, 'p', secao.secao);
+            }
+            secao.perguntas.forEach(function (pergunta) {
+                numero += 1;
+                fragment.appendChild(el('p', {}, numero + '. ' + pergunta.texto));
+                OPCOES.forEach(function (opcao) {
+                    var id = pergunta.name + '_' + opcao[0];
+                    var input = el('input', {type: 'radio', id: id, name: pergunta.name, value: opcao[1]});
+                    input.checked = saved[pergunta.name] === opcao[1];
+                    fragment.appendChild(el('label', {'for': id}, opcao[2]));
+                    fragment.appendChild(document.createTextNode(' '));
+                    fragment.appendChild(input);
+                    fragment.appendChild(document.createTextNode(' '));
+                });
+            });
+        });
+        if (schema.indicadores.length) {
+            heading(fragment, 'h2', 'Indicadores');
+        }
+        schema.indicadores.forEach(function (indicador) {
+            var attrs = {type: 'number', id: indicador.name, name: indicador.name};
+            if (indicador.step) {
+                attrs.step = indicador.step;
+            }
+            var input = el('input', attrs);
+            if (saved[indicador.name] !== undefined && saved[indicador.name] !== null) {
+                input.value = saved[indicador.name];
+            }
+            var paragraph = el('p', {});
+            paragraph.appendChild(el('label', {'for': indicador.name}, indicador.texto + ':'));
+            paragraph.appendChild(document.createTextNode(' '));
+            paragraph.appendChild(input);
+            fragment.appendChild(paragraph);
+        });
+        document.getElementById('survey-fields').appendChild(fragment);
+    }
+
+    function collect() {
+        var form = document.getElementById('surveyConsentForm');
+        var values = {};
+        var complete = true;
+        schema.secoes.forEach(function (secao) {
+            secao.perguntas.forEach(function (pergunta) {
+                var checked = form.querySelector('input[name="' + pergunta.name + '"]:checked');
+                values[pergunta.name] = checked ? checked.value : null;
+                complete = complete && checked !== null;
+            });
+        });
+        schema.indicadores.forEach(function (indicador) {
+            var value = document.getElementById(indicador.name).value;
+            values[indicador.name] = value;
+            complete = complete && value !== '';
+        });
+        return complete ? values : null;
+    }
+
+    function sendDelta(keepalive) {
+        var names = Object.keys(pending);
+        if (!names.length) {
+            return Promise.resolve();
+        }
+        var delta = {};
+        delta[schema.eixo] = pending;
+        pending = {};
+        var token = localStorage.getItem(DRAFT_KEY);
+        var request = fetch(token ? '/drafts/' + token : '/drafts', {
+            method: token ? 'PATCH' : 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(delta),
+            keepalive: !!keepalive
+        }).then(function (response) {
+            if (response.status === 404) {
+                // rascunho expirado: o próximo envio cria outro com as respostas locais
+                localStorage.removeItem(DRAFT_KEY);
+            }
+            return response.ok ? response.json() : null;
+        }).then(function (body) {
+            if (body && body.token) {
+                localStorage.setItem(DRAFT_KEY, body.token);
+            }
+        }).catch(function () {
+            // sem conexão: devolve os campos para o próximo envio
+            names.forEach(function (name) {
+                if (!(name in pending)) {
+                    pending[name] = delta[schema.eixo][name];
+                }
+            });
+        });
+        return request;
+    }
+
+    function flush(keepalive) {
+        clearTimeout(timer);
+        // um envio por vez, para que o POST que cria o rascunho termine antes dos PATCH
+        saving = (saving || Promise.resolve()).then(function () {
+            return sendDelta(keepalive);
+        });
+        return saving;
+    }
+
+    function onChange(event) {
+        var input = event.target;
+        if (!input.name) {
+            return;
+        }
+        pending[input.name] = input.value === '' ? null : input.value;
+        clearTimeout(timer);
+        timer = setTimeout(flush, AUTOSAVE_DELAY);
+    }
+
+    function resume() {
+        var token = new URLSearchParams(window.location.search).get('draft');
+        if (!token) {
+            return;
+        }
+        fetch('/drafts/' + token).then(function (response) {
+            return response.ok ? response.json() : null;
+        }).then(function (draft) {
+            if (!draft) {
+                return;
+            }
+            localStorage.setItem(DRAFT_KEY, token);
+            Object.keys(draft.meta).forEach(function (key) {
+                localStorage.setItem(key, draft.meta[key]);
+            });
+            var answers = loadAnswers();
+            ['ambiental', 'social', 'governanca'].forEach(function (eixo) {
+                answers[eixo] = Object.assign(answers[eixo] || {}, draft[eixo]);
+            });
+            localStorage.setItem(STORAGE_KEY, JSON.stringify(answers));
+            var form = document.getElementById('surveyConsentForm');
+            Object.keys(draft[schema.eixo]).forEach(function (name) {
+                var value = draft[schema.eixo][name];
+                var input = form.querySelector('input[name="' + name + '"][type="number"]') ||
+                    form.querySelector('input[name="' + name + '"][value="' + value + '"]');
+                if (input && input.type === 'number') {
+                    input.value = value;
+                } else if (input) {
+                    input.checked = true;
+                }
+            });
+        });
+    }
+
+    window.goToPreviousPage = function () {
+        window.location.href = schema.anterior;
+    };
+
+    window.saveData = function () {
+        var values = collect();
+        if (values === null) {
+            alert('Para prosseguir, por favor, certifique-se de que todas as perguntas foram respondidas.');
+            return;
+        }
+        var answers = loadAnswers();
+        answers[schema.eixo] = values;
+        localStorage.setItem(STORAGE_KEY, JSON.stringify(answers));
+        flush(true).then(function () {
+            window.location.href = schema.proxima;
+        });
+    };
+
+    render();
+    document.getElementById('survey-fields').addEventListener('change', onChange);
+    resume();
+})();
@@ -0,0 +1,172 @@
+"""Build e servidor dos arquivos estáticos com nomes versionados e pré-comprimidos.
+
+O build copia `static/` para `static_build/` com o hash do conteúdo no nome
+(`css/custom.css` -> `css/custom.3f2a1b9c0d.css`), reescreve os `url()` dos
+CSS para os nomes versionados, grava versões `.gz` (e `.br`, se o pacote
+brotli estiver instalado) dos arquivos de texto e um `manifest.json` usado
+pelos templates através de `static_url`:
+
+    python static_assets.py
+
+Sem o build, o app continua servindo `static/` diretamente.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from mimetypes import guess_type
+from typing import Dict, Optional, Set, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+    print('Instalar brotli: pip install brotli, para gerar versões .br dos arquivos estáticos.')
+
+SOURCE_DIR = "static"
+BUILD_DIR = "static_build"
+MANIFEST_NAME = "manifest.json"
+STATIC_PREFIX = "/static/"
+HASH_LENGTH = 10
+COMPRESSIBLE = {'.css', '.js', '.svg', '.html', '.ttf', '.eot', '.json', '.txt', '.map'}
+# (encoding, sufixo) em ordem de preferência
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+FINGERPRINT = re.compile(r'\.[0-9a-f]{%d}\.[^./]+$' % HASH_LENGTH)
+
+def fingerprinted_name(relative_path: str, content: bytes) -> str:
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}"
+
+def rewrite_css_urls(css: str, css_path: str, manifest: Dict[str, str]) -> str:
+    """Point relative `url()` references of a CSS file to the fingerprinted names."""
+    base = os.path.dirname(css_path)
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2).strip()
+        if url.startswith(('data:', 'http:', 'https:', '//', '#')):
+            return match.group(0)
+        path, sep, suffix = url, '', ''
+        marker = re.search(r'[?#]', url)
+        if marker:
+            path, sep, suffix = url[:marker.start()], url[marker.start()], url[marker.start() + 1:]
+        target = os.path.normpath(os.path.join(base, path)).replace(os.sep, '/')
+        if target not in manifest:
+            return match.group(0)
+        new_path = os.path.relpath(manifest[target], base).replace(os.sep, '/')
+        return f"url({quote}{new_path}{sep}{suffix}{quote})"
+
+    return CSS_URL.sub(replace, css)
+
+def _write_compressed(path: str, content: bytes):
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if HAS_BROTLI:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+
+def build(source_dir: str = SOURCE_DIR, build_dir: str = BUILD_DIR) -> Dict[str, str]:
+    """Write fingerprinted and precompressed copies of `source_dir` into `build_dir`.
+
+    Returns:
+        dict: manifest {original relative path: fingerprinted relative path}.
+    """
+    files = []
+    for root, _, names in os.walk(source_dir):
+        for name in names:
+            full_path = os.path.join(root, name)
+            files.append(os.path.relpath(full_path, source_dir).replace(os.sep, '/'))
+
+    if os.path.isdir(build_dir):
+        shutil.rmtree(build_dir)
+
+    manifest: Dict[str, str] = {}
+    contents: Dict[str, bytes] = {}
+    # CSS por último, para que os url() já encontrem os nomes versionados
+    for relative_path in sorted(files, key=lambda p: (p.endswith('.css'), p)):
+        with open(os.path.join(source_dir, relative_path), 'rb') as f:
+            content = f.read()
+        if relative_path.endswith('.css'):
+            css = content.decode('utf-8', errors='surrogateescape')
+            content = rewrite_css_urls(css, relative_path, manifest).encode('utf-8', errors='surrogateescape')
+        manifest[relative_path] = fingerprinted_name(relative_path, content)
+        contents[relative_path] = content
+
+    for relative_path, content in contents.items():
+        output = os.path.join(build_dir, manifest[relative_path])
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'wb') as f:
+            f.write(content)
+        if os.path.splitext(relative_path)[1].lower() in COMPRESSIBLE:
+            _write_compressed(output, content)
+
+    with open(os.path.join(build_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def load_manifest(build_dir: str = BUILD_DIR) -> Dict[str, str]:
+    try:
+        with open(os.path.join(build_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+MANIFEST = load_manifest()
+
+def static_directory() -> str:
+    """Directory mounted at /static: the build output when it exists."""
+    return BUILD_DIR if MANIFEST else SOURCE_DIR
+
+def static_url(path: str) -> str:
+    """URL of a static asset, fingerprinted when the build manifest lists it."""
+    return STATIC_PREFIX + MANIFEST.get(path, path)
+
+def accepted_encodings(headers) -> Set[str]:
+    """Content codings listed in Accept-Encoding, leaving out the ones with q=0."""
+    accepted = set()
+    for token in headers.get('accept-encoding', '').split(','):
+        name, _, params = token.partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(name.strip().lower())
+    return accepted
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves `.br`/`.gz` siblings and caches fingerprinted files forever."""
+
+    @staticmethod
+    def negotiate(full_path: str, headers: Headers) -> Tuple[Optional[str], str]:
+        accepted = accepted_encodings(headers)
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and os.path.isfile(full_path + suffix):
+                return encoding, full_path + suffix
+        return None, full_path
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        encoding, path = self.negotiate(full_path, request_headers)
+        if encoding is not None:
+            stat_result = os.stat(path)
+        media_type = guess_type(full_path)[0] or 'text/plain'
+        response = FileResponse(path, status_code=status_code, stat_result=stat_result, media_type=media_type)
+        if encoding is not None:
+            response.headers['content-encoding'] = encoding
+        response.headers['vary'] = 'Accept-Encoding'
+        response.headers['cache-control'] = IMMUTABLE if FINGERPRINT.search(full_path) else REVALIDATE
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+if __name__ == "__main__":
+    manifest = build()
+    print(f"{len(manifest)} arquivos em {BUILD_DIR}/")
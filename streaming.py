@@ -0,0 +1,153 @@
+"""Respostas enviadas em pedaços: HTML com gzip incremental e arquivos com Range.
+
+Cada pedaço de HTML é comprimido e enviado com `Z_SYNC_FLUSH`, então o navegador
+recebe (e mostra) o início do documento enquanto o resto ainda é gerado.
+
+Arquivos (os PDFs do artifact store) respondem a `Range: bytes=...` com 206.
+Se o servidor ASGI oferece a extensão `http.response.zerocopysend`, o corpo
+sai do descritor do arquivo sem passar pelo Python (sendfile); senão é lido
+em blocos. Com um proxy na frente, `accel_redirect` delega o envio a ele.
+"""
+import os
+import re
+import zlib
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from static_assets import accepted_encodings
+
+GZIP_LEVEL = 6
+
+def gzip_stream(chunks: Iterable[str], level: int = GZIP_LEVEL) -> Iterator[bytes]:
+    """Gzip-encode text chunks, flushing after each one so nothing waits for the end."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: formato gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush(zlib.Z_FINISH)
+
+def encode_stream(chunks: Iterable[str]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield chunk.encode("utf-8")
+
+def streaming_html_response(request: Request, chunks: Iterable[str]) -> StreamingResponse:
+    """Stream HTML chunks, gzip-encoded when the client accepts it."""
+    headers = {
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+        # proxies como o nginx não devem acumular a resposta antes de repassá-la
+        "X-Accel-Buffering": "no",
+    }
+    if "gzip" in accepted_encodings(request.headers):
+        headers["Content-Encoding"] = "gzip"
+        body = gzip_stream(chunks)
+    else:
+        body = encode_stream(chunks)
+    return StreamingResponse(body, media_type="text/html; charset=utf-8", headers=headers)
+
+FILE_CHUNK = 64 * 1024
+SINGLE_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte of a single `Range` header, or None to send the whole file.
+
+    Multiple ranges are answered with the whole file, which RFC 9110 allows.
+    """
+    if not header:
+        return None
+    match = SINGLE_RANGE.fullmatch(header.strip())
+    if match is None or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        # sufixo: os últimos N bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - int(last)), size - 1
+    first, last = int(first), min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        raise RangeNotSatisfiable(header)
+    return first, last
+
+class FileRangeResponse(Response):
+    """Part of an open file, sent with zero-copy send when the server supports it.
+
+    The response owns `file` and closes it once the body is sent.
+    """
+
+    def __init__(self, file: BinaryIO, offset: int, count: int, status_code: int, headers: Dict[str, str], media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.file = file
+        self.offset = offset
+        self.count = count
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if scope["method"] == "HEAD" or self.count == 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": self.file.fileno(),
+                            "offset": self.offset, "count": self.count, "more_body": False})
+                return
+            f = anyio.wrap_file(self.file)
+            await f.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await f.read(min(FILE_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.file.close()
+
+def file_response(request: Optional[Request], path: str, filename: str, media_type: str,
+                  headers: Optional[Dict[str, str]] = None, accel_redirect: Optional[str] = None) -> Response:
+    """Send a stored file with Range support; the file name is its content hash, used as the ETag.
+
+    The file is opened here, so it can still be sent if the artifact store
+    evicts it before the response runs.
+
+    Raises:
+        FileNotFoundError: when the file was already removed.
+    """
+    etag = f'"{os.path.basename(path)}"'
+    headers = {
+        **(headers or {}),
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    if accel_redirect is not None:
+        # o proxy envia o arquivo (com Range e sendfile) a partir da location interna
+        return Response(headers={**headers, "X-Accel-Redirect": accel_redirect}, media_type=media_type)
+    file = open(path, "rb")
+    size = os.fstat(file.fileno()).st_size
+    range_header = request.headers.get("range") if request is not None else None
+    if_range = request.headers.get("if-range") if request is not None else None
+    if if_range is not None and if_range != etag:
+        range_header = None  # o arquivo mudou desde o primeiro pedaço: envia tudo
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        file.close()
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        first, last, status_code = 0, size - 1, 200
+    else:
+        first, last = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    headers["Content-Length"] = str(last - first + 1)
+    return FileRangeResponse(file, first, last - first + 1, status_code, headers, media_type)
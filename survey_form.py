@@ -0,0 +1,82 @@
+"""Formulários dos pilares gerados a partir dos modelos e do catálogo de perguntas.
+
+Os nomes dos campos e os ids vêm de `_name_mapping` dos modelos `Survey*`; eixo,
+tipo (Pergunta/Indicador) e ordem vêm de `questions.csv`; o texto exibido, a
+seção e o passo dos campos numéricos vêm de `survey_form.csv`. A página
+`survey/survey_pilar.html` recebe esse esquema em JSON e `js/survey_form.min.js`
+monta o formulário no navegador. O esquema é lido de novo quando um dos CSVs
+muda (`DATA_FILES`, observados também pelo cache de páginas).
+"""
+import csv
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from models import SurveyAmbiental, SurveyGovernanca, SurveySocial
+
+QUESTIONS_CSV = "questions.csv"
+FORM_CSV = "survey_form.csv"
+DATA_FILES = (QUESTIONS_CSV, FORM_CSV)
+
+PILARES: Dict[str, Dict[str, Any]] = {
+    "ambiental": {
+        "model": SurveyAmbiental,
+        "titulo": "Pilar Ambiental",
+        "anterior": "survey_registration.html",
+        "proxima": "survey_PilarSocial.html",
+    },
+    "social": {
+        "model": SurveySocial,
+        "titulo": "Pilar Social",
+        "anterior": "survey_PilarAmbiental.html",
+        "proxima": "survey_PilarGovernanca.html",
+    },
+    "governanca": {
+        "model": SurveyGovernanca,
+        "titulo": "Pilar Governança",
+        "anterior": "survey_PilarSocial.html",
+        "proxima": "survey_end.html",
+    },
+}
+
+def _read_csv(path: str) -> Dict[int, Dict[str, str]]:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return {int(row["id_pergunta"]): row for row in csv.DictReader(f)}
+
+def form_schema(pilar: str) -> Dict[str, Any]:
+    """Data-driven description of a pilar form, read again when `DATA_FILES` change.
+
+    Returns:
+        dict: eixo, titulo, anterior, proxima, `secoes` (list of {secao, perguntas})
+        with the radio questions in catalog order, and `indicadores` (numeric fields).
+    """
+    return _form_schema(pilar, tuple(os.stat(path).st_mtime for path in DATA_FILES))
+
+@lru_cache(maxsize=16)
+def _form_schema(pilar: str, mtimes: Tuple[float, ...]) -> Dict[str, Any]:
+    config = PILARES[pilar]
+    questions = _read_csv(QUESTIONS_CSV)
+    textos = _read_csv(FORM_CSV)
+    secoes: List[Dict[str, Any]] = []
+    indicadores: List[Dict[str, Any]] = []
+    for name, question_id in sorted(config["model"]._name_mapping.default.items(), key=lambda item: item[1]):
+        question = questions[question_id]
+        texto = textos.get(question_id, {})
+        campo = {"name": name, "id": question_id, "texto": texto.get("texto") or question["pergunta"]}
+        if question["tipo"] == "Indicador":
+            if texto.get("step"):
+                campo["step"] = texto["step"]
+            indicadores.append(campo)
+            continue
+        secao = texto.get("secao", "")
+        if not secoes or secoes[-1]["secao"] != secao:
+            secoes.append({"secao": secao, "perguntas": []})
+        secoes[-1]["perguntas"].append(campo)
+    return {
+        "eixo": pilar,
+        "titulo": config["titulo"],
+        "anterior": config["anterior"],
+        "proxima": config["proxima"],
+        "secoes": secoes,
+        "indicadores": indicadores,
+    }
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+# banco em memória: os testes não precisam do Postgres do docker-compose
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark.synthetic import load_question_catalog
+from database import Base, Question, SessionLocal, engine
+
+QUESTIONS_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "questions.csv")
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+# catálogo pequeno: dois temas de um eixo, dois níveis, e um indicador
+CATALOG = [
+    (1, 'ambiental', 'Água', 1, 'Pergunta'),
+    (2, 'ambiental', 'Água', 2, 'Pergunta'),
+    (3, 'ambiental', 'Energia', 1, 'Pergunta'),
+    (4, 'ambiental', 'Energia', 2, 'Pergunta'),
+    (5, 'ambiental', 'Água', 1, 'Indicador'),
+]
+
+@pytest.fixture
+def catalog(db):
+    for question_id, eixo, tema, nivel, tipo in CATALOG:
+        db.add(Question(id=question_id, eixo_pergunta=eixo, pergunta=f'Pergunta {question_id}', tema=tema,
+                        criterio='', tipo=tipo, nivel=nivel))
+    db.commit()
+    return CATALOG
+
+@pytest.fixture
+def questions(db):
+    """The real question catalog, from questions.csv."""
+    catalog = load_question_catalog(QUESTIONS_CSV)
+    db.add_all(Question(**question) for question in catalog)
+    db.commit()
+    return catalog
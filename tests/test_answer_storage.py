@@ -0,0 +1,53 @@
+import analytics
+import answer_codec
+import data_export
+import db_manager
+from database import SurveyAnswers, SurveyAnswerVector
+from models import SurveyMeta
+
+ANSWERS = [
+    {1: '1', 2: '1', 3: '0', 4: '1', 5: '12,5'},
+    {1: '0', 2: '1', 3: '2', 4: '0', 5: '3'},
+    {1: '0', 2: '0', 3: '1', 4: '1', 5: '0,25'},
+]
+
+def insert_surveys(db, atividade):
+    for i, answers in enumerate(ANSWERS):
+        meta = SurveyMeta(empresa=f'Empresa {i}', atividade=atividade, estado='ES', cidade='Vitória',
+                          producaomes='10', unidproducao='t', data='01/02/2024')
+        db_manager.insert_survey_answers(db, meta, [('ambiental', qid, answer) for qid, answer in answers.items()])
+
+def set_storage(monkeypatch, vectors_only):
+    for module in (db_manager, analytics, data_export):
+        monkeypatch.setattr(module, 'WRITE_ROWS', not vectors_only)
+    monkeypatch.setattr(db_manager, 'WRITE_VECTORS', vectors_only)
+
+def exported(db, atividade):
+    db.commit()  # sqlite:// é uma única conexão, compartilhada com a sessão aberta por iter_batches
+    rows = []
+    for batch in data_export.iter_batches(batch_size=7, atividade=atividade):
+        for row in batch:
+            row = dict(zip(data_export.COLUMN_NAMES, row))
+            if row['tipo'] == 'Indicador':
+                # "12,5" nas linhas, 12.5 nos vetores
+                row['answer'] = answer_codec.answer_text(float(row['answer'].replace(',', '.')))
+            for coluna in ('survey_id', 'company_id', 'atividade'):
+                del row[coluna]
+            rows.append(row)
+    return rows
+
+def test_vectors_storage_writes_no_rows_and_reads_like_rows(db, catalog, monkeypatch):
+    set_storage(monkeypatch, vectors_only=False)
+    insert_surveys(db, 'Linhas')
+    por_linhas = [analytics.blocking_questions(db, por_tema=por_tema, atividade='Linhas') for por_tema in (True, False)]
+    export_linhas = exported(db, 'Linhas')
+
+    set_storage(monkeypatch, vectors_only=True)
+    insert_surveys(db, 'Vetores')
+    assert db.query(SurveyAnswers).count() == len(ANSWERS) * len(catalog)
+    assert db.query(SurveyAnswerVector).count() == len(ANSWERS)
+    por_vetores = [analytics.blocking_questions(db, por_tema=por_tema, atividade='Vetores') for por_tema in (True, False)]
+
+    assert por_linhas[0]['items']
+    assert por_vetores == por_linhas
+    assert exported(db, 'Vetores') == export_linhas
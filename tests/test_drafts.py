@@ -0,0 +1,18 @@
+import pytest
+
+from drafts import FIELD_IDS, INDICATOR_IDS, DraftError, validate_delta
+from models import SurveyDraftDelta
+
+EIXO, CAMPO, INDICADOR = next(
+    (eixo, name, question_id) for eixo, mapping in FIELD_IDS.items()
+    for name, question_id in mapping.items() if question_id in INDICATOR_IDS
+)
+
+def test_draft_indicator_accepts_decimal_comma():
+    _, answers, _ = validate_delta(SurveyDraftDelta(**{EIXO: {CAMPO: "12,5"}}))
+    assert answers == {str(INDICADOR): "12,5"}
+
+@pytest.mark.parametrize("valor", ["nan", "inf", "abc"])
+def test_draft_indicator_rejects_what_submit_rejects(valor):
+    with pytest.raises(DraftError):
+        validate_delta(SurveyDraftDelta(**{EIXO: {CAMPO: valor}}))
@@ -0,0 +1,49 @@
+import pytest
+
+import db_manager
+from answer_codec import survey_from_answers
+from database import Company, SectorMaturityAggregate, SurveyAnswers, SurveyDraft, SurveyInfo, SurveyMaturity
+from db_manager import find_survey_by_idempotency_key, insert_once, insert_survey_data
+from drafts import INDICATOR_IDS, QUESTION_FIELDS, promote_draft
+
+META = {'empresa': 'Empresa', 'atividade': 'Indústria', 'estado': 'ES', 'cidade': 'Vitória',
+        'producaomes': '10', 'unidproducao': 't', 'data': '01/02/2024'}
+# todas as perguntas do formulário respondidas, como um rascunho completo
+ANSWERS = {question_id: '12' if question_id in INDICATOR_IDS else '0' for question_id in QUESTION_FIELDS}
+
+def counts(db):
+    return {model.__name__: db.query(model).count()
+            for model in (Company, SurveyInfo, SurveyAnswers, SurveyMaturity, SectorMaturityAggregate)}
+
+def submit(db, key):
+    survey = survey_from_answers(META, ANSWERS)
+    return insert_once(db, key, lambda: insert_survey_data(survey, db, key))
+
+def test_repeated_idempotency_key_returns_the_first_survey(db, questions):
+    first = submit(db, 'chave-1')
+    antes = counts(db)
+    assert submit(db, 'chave-1').id == first.id
+    assert counts(db) == antes
+    assert submit(db, 'chave-2').id != first.id
+
+def test_submit_fallback_after_draft_promotion_inserts_nothing(db, questions):
+    db.add(SurveyDraft(token='rascunho', meta=META, answers={str(k): v for k, v in ANSWERS.items()}))
+    db.commit()
+    _, promoted = promote_draft(db, 'rascunho', None, 'chave-cliente')
+    antes = counts(db)
+    # o cliente não recebeu a resposta e reenvia o questionário inteiro com a mesma chave
+    assert submit(db, 'chave-cliente').id == promoted.id
+    # ou repete o envio do rascunho, já apagado
+    assert promote_draft(db, 'rascunho', None, 'chave-cliente')[1].id == promoted.id
+    assert counts(db) == antes
+    assert db.get(SurveyDraft, 'rascunho') is None
+
+def test_failed_insert_leaves_no_survey_or_key(db, questions, monkeypatch):
+    def falha(*args, **kwargs):
+        raise RuntimeError('falha depois de gravar as respostas')
+    monkeypatch.setattr(db_manager, 'store_survey_maturity', falha)
+    with pytest.raises(RuntimeError):
+        submit(db, 'chave-1')
+    db.rollback()
+    assert find_survey_by_idempotency_key(db, 'chave-1') is None
+    assert counts(db) == dict.fromkeys(counts(db), 0)
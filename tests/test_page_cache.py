@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("jinja2")
+from page_cache import PageCache
+
+def write(path, text, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.utime(path, (mtime, mtime))
+
+def test_page_is_rendered_again_when_a_dependency_changes(tmp_path):
+    write(tmp_path / "base.html", "<main>{% block corpo %}{% endblock %}</main>", 1000)
+    write(tmp_path / "page.html", '{% extends "base.html" %}{% block corpo %}{{ dados() }}{% endblock %}', 1000)
+    dados = tmp_path / "dados.csv"
+    write(dados, "v1", 1000)
+    cache = PageCache(str(tmp_path))
+    cache.templates.env.globals["dados"] = lambda: dados.read_text()
+    cache.watch("page.html", str(dados))
+
+    assert cache.get("page.html").bodies[None] == b"<main>v1</main>"
+    # template estendido mudou
+    write(tmp_path / "base.html", "<section>{% block corpo %}{% endblock %}</section>", 2000)
+    assert cache.get("page.html").bodies[None] == b"<section>v1</section>"
+    # arquivo de dados mudou
+    write(dados, "v2", 3000)
+    assert cache.get("page.html").bodies[None] == b"<section>v2</section>"
+    assert cache.get("page.html") is cache.get("page.html")
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+import pytest
+
+from answer_codec import FLOAT_FIELDS
+from benchmark.synthetic import EIXO_MODELS, SyntheticGenerator
+from db_manager import insert_survey_data
+from models import Survey
+
+report_service = pytest.importorskip("report_service")
+
+def test_report_data_accepts_indicator_with_decimal_comma(db, questions):
+    generator = SyntheticGenerator(seed=1, catalog=questions)
+    payload = generator.generate_payload(generator.generate_companies(1)[0], datetime(2024, 2, 1))
+    # indicador declarado como texto no modelo: chega ao banco como foi digitado
+    indicador = next(question for question in questions
+                     if question["tipo"] == "Indicador" and question["id"] not in FLOAT_FIELDS)
+    eixo = indicador["eixo_pergunta"]
+    nome = next(name for name, question_id in EIXO_MODELS[eixo]._name_mapping.default.items() if question_id == indicador["id"])
+    payload[eixo][nome] = "12,5"
+    survey = Survey(**payload)
+    insert_survey_data(survey, db)
+
+    surveys, question_df = report_service.get_all_surveys(survey.meta, db)
+    data = report_service.build_single_data_from_survey(surveys[-1], question_df)
+    assert 12.5 in [i.valor for i in data.indicadores if i.item == indicador["pergunta"]]
@@ -0,0 +1,11 @@
+from models import SurveyMeta
+from report_jobs import claim_report_job, enqueue_report_job
+
+def test_enqueued_meta_round_trips_to_survey_meta(db):
+    meta = SurveyMeta(empresa="Empresa", atividade="Indústria", estado="ES", cidade="Vitória",
+                      producaomes="10", unidproducao="t", data="01/02/2024")
+    job = enqueue_report_job(db, meta.model_dump(), ["resumo_maturidade"], ["social"])
+    claimed = claim_report_job(db, "worker-1")
+    assert claimed.id == job.id
+    assert SurveyMeta(**claimed.meta) == meta
+    assert claimed.sections == ["resumo_maturidade"]
@@ -0,0 +1,46 @@
+from database import SectorIndicatorAggregate, SectorMaturityAggregate
+from db_manager import insert_survey_answers
+from models import SurveyMeta
+from sector_benchmark import NIVEIS, rebuild_sector_aggregates
+
+def insert(db, empresa, answers):
+    meta = SurveyMeta(empresa=empresa, atividade='Indústria', estado='ES', cidade='Vitória',
+                      producaomes='10', unidproducao='t', data='01/02/2024')
+    insert_survey_answers(db, meta, [('ambiental', qid, answer) for qid, answer in answers.items()])
+
+def aggregates(db):
+    # linhas zeradas (contribuição retirada) equivalem a linhas ausentes
+    indicadores = {
+        (row.atividade, row.estado, row.question_id): (row.count, round(row.total, 9), row.buckets)
+        for row in db.query(SectorIndicatorAggregate) if row.count
+    }
+    maturidade = {
+        (row.atividade, row.estado, row.eixo, row.tema): tuple(getattr(row, f'nivel_{n}') for n in NIVEIS)
+        for row in db.query(SectorMaturityAggregate) if any(getattr(row, f'nivel_{n}') for n in NIVEIS)
+    }
+    return indicadores, maturidade
+
+def test_new_survey_replaces_the_previous_contribution(db, catalog):
+    insert(db, 'Empresa A', {1: '1', 2: '1', 3: '0', 4: '1', 5: '10'})
+    insert(db, 'Empresa B', {1: '0', 2: '0', 3: '0', 4: '1', 5: '3,5'})
+    insert(db, 'Empresa A', {1: '0', 2: '1', 3: '0', 4: '0', 5: '250'})
+    incremental = aggregates(db)
+
+    rebuild_sector_aggregates(db)
+    assert incremental == aggregates(db)
+    indicadores, _ = incremental
+    assert indicadores[('Indústria', 'ES', 5)][:2] == (2, 253.5)
+
+def test_missing_previous_rows_are_not_subtracted(db, catalog):
+    insert(db, 'Empresa A', {1: '1', 2: '1', 3: '0', 4: '1', 5: '10'})
+    # agregados criados depois do primeiro questionário, sem rebuild
+    db.query(SectorIndicatorAggregate).delete()
+    db.query(SectorMaturityAggregate).delete()
+    db.commit()
+    insert(db, 'Empresa A', {1: '0', 2: '1', 3: '0', 4: '0', 5: '250'})
+
+    assert all(row.count >= 0 and row.total >= 0 for row in db.query(SectorIndicatorAggregate))
+    assert all(getattr(row, f'nivel_{n}') >= 0 for row in db.query(SectorMaturityAggregate) for n in NIVEIS)
+    incremental = aggregates(db)
+    rebuild_sector_aggregates(db)
+    assert incremental == aggregates(db)
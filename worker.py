@@ -0,0 +1,99 @@
+"""Worker da fila de relatórios (`report_jobs`).
+
+Roda fora do servidor web, em quantos processos e máquinas forem necessários:
+
+    python worker.py --concurrency 2
+
+Cada processo reivindica um trabalho por vez com `claim_report_job`, gera o
+PDF com `report_service.generate_report_once` (que chama
+`report_generation_wrapper`) e renova o heartbeat em uma thread enquanto gera.
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+from pydantic import ValidationError
+
+from database import Base, SessionLocal, engine
+from models import SurveyMeta
+from report_jobs import (
+    REPORT_JOB_VISIBILITY_SECONDS, claim_report_job, complete_report_job, fail_report_job, heartbeat
+)
+
+POLL_SECONDS = float(os.environ.get("REPORT_WORKER_POLL_SECONDS", "2"))
+HEARTBEAT_SECONDS = REPORT_JOB_VISIBILITY_SECONDS / 4
+
+def _keep_alive(job_id: int, worker_id: str, stop: threading.Event):
+    db = SessionLocal()
+    try:
+        while not stop.wait(HEARTBEAT_SECONDS):
+            if not heartbeat(db, job_id, worker_id):
+                print(f"{worker_id}: trabalho {job_id} foi reivindicado por outro worker")
+                return
+    finally:
+        db.close()
+
+def run_job(worker_id: str) -> bool:
+    """Claim and run one job; False when the queue has nothing runnable."""
+    import report_service
+
+    db = SessionLocal()
+    try:
+        job = claim_report_job(db, worker_id)
+        if job is None:
+            return False
+        stop = threading.Event()
+        beat = threading.Thread(target=_keep_alive, args=(job.id, worker_id, stop), daemon=True)
+        beat.start()
+        try:
+            meta = SurveyMeta(**job.meta)
+            pdf_path = report_service.generate_report_once(meta, db, job.sections, job.eixos)
+        except (ValidationError, report_service.UnknownSection) as e:
+            # meta inválido ou seção desconhecida: repetir não adianta; qualquer outro erro volta para a fila
+            db.rollback()
+            fail_report_job(db, job, worker_id, str(e), retry=False)
+        except Exception:
+            db.rollback()
+            status = fail_report_job(db, job, worker_id, traceback.format_exc(limit=5))
+            print(f"{worker_id}: trabalho {job.id} falhou (tentativa {job.attempts}), agora {status}")
+        else:
+            pdf_bytes, image_count = report_service.report_size(pdf_path) if pdf_path else (None, None)
+            complete_report_job(db, job.id, worker_id, pdf_path, pdf_bytes, image_count)
+        finally:
+            stop.set()
+            beat.join()
+        return True
+    finally:
+        db.close()
+
+def work(worker_id: str, stop: threading.Event):
+    while not stop.is_set():
+        if not run_job(worker_id):
+            stop.wait(POLL_SECONDS)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Processa a fila de relatórios.")
+    parser.add_argument("--concurrency", type=int, default=1, help="threads de trabalho neste processo")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=work, args=(f"{prefix}:{uuid.uuid4().hex[:6]}", stop), daemon=True)
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        # termina o trabalho em andamento; os não iniciados ficam na fila
+        stop.set()
+        for thread in threads:
+            thread.join()